@@ -0,0 +1,101 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from battery import BatteryState, BatteryStatus
+
+logger = logging.getLogger("adaptive_polling")
+
+SECONDS_PER_HOUR = 3600
+
+
+@dataclass
+class PollingPolicy:
+    """Bounds of the adaptive battery polling interval, in seconds."""
+
+    min_interval: float = 1
+    active_interval: float = 30  # upper bound while charging or discharging
+    steady_interval: float = 300  # Full, Not charging or Unknown
+    settle_period: float = 10  # poll at min_interval this long after a state change
+    lead_fraction: float = 0.5  # wake after this part of the time to a threshold
+    discharge_thresholds: tuple[int, ...] = ()  # capacities needing a fast reaction
+    charge_thresholds: tuple[int, ...] = ()
+    report_period: float = SECONDS_PER_HOUR  # how often wakeup counts are logged
+
+
+def seconds_to_threshold(status: BatteryStatus, threshold: int) -> Optional[float]:
+    """Estimate when the battery crosses `threshold` percent at the current draw."""
+    if status.power_now <= 0 or status.energy_full <= 0:
+        return None
+
+    threshold_energy = status.energy_full * threshold / 100
+    if status.state == BatteryState.DISCHARGING:
+        energy_left = status.energy_now - threshold_energy
+    elif status.state == BatteryState.CHARGING:
+        energy_left = threshold_energy - status.energy_now
+    else:
+        return None
+
+    if energy_left <= 0:
+        return None  # already crossed
+    return energy_left / status.power_now * SECONDS_PER_HOUR
+
+
+class AdaptivePoller:
+    """Chooses how long the power monitor may sleep and counts its wakeups.
+
+    Polls rarely while the battery is steady, fast right after a state change
+    and increasingly often as the next notification threshold approaches.
+    """
+
+    def __init__(self, policy: PollingPolicy):
+        self.policy = policy
+        self.wakeups: dict[str, int] = {}
+        self._last_state: Optional[BatteryState] = None
+        self._state_changed_at = 0.0
+        self._report_started_at = time.monotonic()
+
+    def next_interval(self, status: BatteryStatus) -> float:
+        """Return the number of seconds until the battery should be read again."""
+        policy = self.policy
+        now = time.monotonic()
+
+        if status.state != self._last_state:
+            self._last_state = status.state
+            self._state_changed_at = now
+
+        if now - self._state_changed_at < policy.settle_period:
+            return policy.min_interval
+
+        if status.state == BatteryState.DISCHARGING:
+            thresholds = policy.discharge_thresholds
+        elif status.state == BatteryState.CHARGING:
+            thresholds = policy.charge_thresholds
+        else:
+            return policy.steady_interval
+
+        interval = policy.active_interval
+        for threshold in thresholds:
+            seconds = seconds_to_threshold(status, threshold)
+            if seconds is not None:
+                interval = min(interval, seconds * policy.lead_fraction)
+
+        return max(interval, policy.min_interval)
+
+    def record_wakeup(self, reason: str, interval: float) -> None:
+        """Count a wakeup and periodically log how many were taken."""
+        self.wakeups[reason] = self.wakeups.get(reason, 0) + 1
+        logger.debug("Woke up by %s (interval %.1f s)", reason, interval)
+
+        elapsed = time.monotonic() - self._report_started_at
+        if elapsed >= self.policy.report_period:
+            logger.info(
+                "%s wakeups in the last %.0f s (%s); fixed 1 s polling would take %.0f",
+                sum(self.wakeups.values()),
+                elapsed,
+                ", ".join(f"{count} {name}" for name, count in self.wakeups.items()),
+                elapsed,
+            )
+            self.wakeups = {}
+            self._report_started_at = time.monotonic()
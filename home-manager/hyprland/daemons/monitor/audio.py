@@ -1,36 +1,53 @@
+import asyncio
 import logging
 import subprocess
 from dataclasses import dataclass
 from math import ceil
 from pathlib import Path
-from time import sleep
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 
+from audio_backends import DEVICE_TYPES, AudioBackend, AudioEvent, PactlBackend
+from debounce import Debouncer
+from decoders import Decoder
 from pydantic import BaseModel, TypeAdapter, field_validator
-from utils import send_notification, update_eww
+from utils import publish_state, send_notification, update_eww
 
 logger = logging.getLogger("audio_monitor")
 
 EWW_CONFIG_PATH = Path("~/Config-Files/hyprland/eww").expanduser()
 BLOCKS = ["▁", "▂", "▃", "▄", "▅", "▆", "▇", "█"]
+AUDIO_BACKEND = "pulse"  # "pulse" (native protocol) or "pactl"
+PROJECT_DEVICES = True  # decode only the device fields that are displayed
 
 
-class Volume(BaseModel):
+class VolumeLevel(BaseModel):
+    """The part of a channel's volume that is displayed."""
+
+    value_percent: str
+
+
+class Volume(VolumeLevel):
     """Volume information for an audio device."""
 
     value: int
-    value_percent: str
     db: str
 
 
-class AudioDevice(BaseModel):
-    """Information about an audio device."""
+class DeviceSummary(BaseModel):
+    """The fields of an audio device read by the formatters and notifications."""
 
-    state: str
+    index: int
     name: str
     description: str
-    channel_map: list[str]
     mute: bool
+    volume: Dict[str, VolumeLevel]
+
+
+class AudioDevice(DeviceSummary):
+    """Information about an audio device."""
+
+    state: str
+    channel_map: list[str]
     volume: Dict[str, Volume]
 
     @field_validator("channel_map", mode="before")
@@ -41,51 +58,136 @@ class AudioDevice(BaseModel):
         return value
 
 
+DEVICES = TypeAdapter(list[AudioDevice])
+DEVICE_SUMMARIES = TypeAdapter(list[DeviceSummary])
+
+
 @dataclass
 class AudioState:
     """State of the audio devices."""
 
-    sink: AudioDevice
-    source: AudioDevice
+    sink: DeviceSummary
+    source: DeviceSummary
+
 
+async def open_backend(name: str = AUDIO_BACKEND) -> AudioBackend:
+    """Open the configured backend, falling back to `pactl` if it is unavailable."""
+    if name == "pulse":
+        from pulse import PulseBackend  # pylint: disable=import-outside-toplevel
 
-def get_audio_devices() -> List[AudioDevice]:
-    """Get the list of audio devices."""
-    sources = subprocess.run(
-        ["pactl", "--format=json", "list", "sources"],
-        capture_output=True,
-        text=True,
-        check=True,
-    ).stdout
-    sinks = subprocess.run(
-        ["pactl", "--format=json", "list", "sinks"],
-        capture_output=True,
-        text=True,
-        check=True,
-    ).stdout
+        try:
+            return await PulseBackend.connect()
+        except (OSError, ConnectionError) as e:
+            logger.warning("Native PulseAudio backend unavailable (%s), using pactl", e)
+    return PactlBackend()
 
-    parse_devices = TypeAdapter(list[AudioDevice]).validate_json
-    return parse_devices(sources) + parse_devices(sinks)
 
+class AudioModel:
+    """Cached audio devices, updated incrementally from subscribe events.
 
-def get_default_device(device_type) -> str:
-    """Get the default audio device of the specified type."""
-    cmd = ["pactl", f"get-default-{device_type}"]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    return result.stdout.strip()
+    A device event re-reads and validates only the affected devices; a server
+    event re-reads only the default device names. Each event therefore costs
+    at most one backend query, and events about streams, clients or modules
+    cost none. Events applied together as a burst share those queries.
 
+    With `project`, devices are decoded as summaries holding only the fields
+    that are displayed.
+    """
 
-def update_eww_variables(audio: AudioState) -> None:
-    """Update the Eww variables with the audio device information."""
+    def __init__(self, backend: AudioBackend, project: bool = PROJECT_DEVICES):
+        self.backend = backend
+        adapter = DEVICE_SUMMARIES if project else DEVICES
+        self.decoders: Dict[str, Decoder[list[DeviceSummary]]] = {
+            device_type: Decoder(adapter, device_type) for device_type in DEVICE_TYPES
+        }
+        self.devices: Dict[str, Dict[int, DeviceSummary]] = {
+            device_type: {} for device_type in DEVICE_TYPES
+        }
+        self.defaults: Dict[str, str] = {}
+
+    async def load(self) -> None:
+        """Read all devices and the defaults from scratch."""
+        self.defaults, *_ = await asyncio.gather(
+            self.backend.get_defaults(),
+            *(self.reload(device_type) for device_type in DEVICE_TYPES),
+        )
+
+    async def reload(self, device_type: str) -> None:
+        """Re-read every device of the specified type."""
+        payload = await self.backend.list_devices(device_type)
+        devices = self.decoders[device_type].decode(payload)
+        self.devices[device_type] = {device.index: device for device in devices}
+
+    async def refresh(self, device_type: str, indexes: Set[int]) -> None:
+        """Re-read the given devices, dropping the ones that no longer exist."""
+        payload = await self.backend.list_devices(device_type, indexes)
+        devices = self.devices[device_type]
+        for device in self.decoders[device_type].decode(payload):
+            if device.index in indexes:
+                devices[device.index] = device
+                indexes = indexes - {device.index}
+        for index in indexes:
+            devices.pop(index, None)
+
+    async def apply(self, events: List[AudioEvent]) -> bool:
+        """Update the model from a burst of events.
+
+        Returns:
+            bool: whether anything relevant was re-read
+        """
+        latest: Dict[str, Dict[int, str]] = {t: {} for t in DEVICE_TYPES}
+        server_changed = False
+        for event in events:
+            if event.facility in DEVICE_TYPES:
+                latest[event.facility][event.index] = event.kind
+            elif event.facility == "server":
+                server_changed = True
+
+        for device_type, kinds in latest.items():
+            for index, kind in kinds.items():
+                if kind == "remove":
+                    self.devices[device_type].pop(index, None)
+            changed = {index for index, kind in kinds.items() if kind != "remove"}
+            if changed:
+                await self.refresh(device_type, changed)
+
+        if server_changed:
+            self.defaults = await self.backend.get_defaults()
+            for device_type in DEVICE_TYPES:
+                if self.default(device_type) is None:
+                    await self.reload(device_type)
+
+        return server_changed or any(latest.values())
+
+    def default(self, device_type: str) -> Optional[DeviceSummary]:
+        name = self.defaults.get(device_type)
+        return next(
+            (d for d in self.devices[device_type].values() if d.name == name), None
+        )
+
+    def state(self) -> AudioState:
+        """Return the state of the default devices."""
+        sink, source = self.default("sink"), self.default("source")
+        if source is None or sink is None:
+            raise ValueError("Could not find default audio devices.")
+        return AudioState(sink=sink, source=source)
+
+
+def update_eww_variables(audio: AudioState, since: Optional[float] = None) -> None:
+    """Update the Eww variables and the state snapshot with the audio devices."""
     update_eww(
         {
             "sink-settings": f"♫ {format_device_info(audio.sink)}",
             "source-settings": f"🎙 {format_device_info(audio.source)}",
-        }
+        },
+        since,
+    )
+    publish_state(
+        "audio", {"sink": audio.sink.model_dump(), "source": audio.source.model_dump()}
     )
 
 
-def format_device_info(device: Optional[AudioDevice]) -> str:
+def format_device_info(device: Optional[DeviceSummary]) -> str:
     """Format the audio device information for display."""
     if device is None:
         return "N/A"
@@ -106,60 +208,42 @@ def format_device_info(device: Optional[AudioDevice]) -> str:
     return f"{cropped_description}: [{volume_string}]"
 
 
-def get_sound_settings() -> AudioState:
-    """Get the current sound settings"""
-    default_source = get_default_device("source")
-    default_sink = get_default_device("sink")
-
-    audio_devices = get_audio_devices()
-
-    source = next(
-        (device for device in audio_devices if device.name == default_source),
-        None,
-    )
-
-    sink = next(
-        (device for device in audio_devices if device.name == default_sink),
-        None,
-    )
-
-    if source is None or sink is None:
-        raise ValueError("Could not find default audio devices.")
-
-    return AudioState(sink=sink, source=source)  # type: ignore
+async def read_events(backend: AudioBackend, debouncer: Debouncer[AudioEvent]) -> None:
+    """Feed backend events into the debouncer until the subscription ends."""
+    try:
+        await backend.subscribe(debouncer.put)
+    finally:
+        debouncer.close()
 
 
-def audio_monitor() -> None:
+async def audio_monitor(backend: Optional[AudioBackend] = None) -> None:
     """Monitor audio devices for changes."""
-    process = subprocess.Popen(
-        ["pactl", "subscribe"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1,
-    )
+    if backend is None:
+        backend = await open_backend()
 
     logger.info("Monitoring for audio changes...")
+    model = AudioModel(backend)
+    debouncer: Debouncer[AudioEvent] = Debouncer()
+    reader = asyncio.create_task(read_events(backend, debouncer))
     try:
-        audio = get_sound_settings()
-    except (ValueError, subprocess.CalledProcessError) as e:
-        logger.error("Error getting audio devices: %s", e)
-        sleep(2)
-        audio = get_sound_settings()
-
-    update_eww_variables(audio)
-
-    try:
-        while True:
-            line = process.stdout.readline()  # type: ignore
-            if not line:
-                break
-
-            if "change" not in line:
-                continue
-
+        try:
+            await model.load()
+            audio = model.state()
+        except (ValueError, OSError, subprocess.CalledProcessError) as e:
+            logger.error("Error getting audio devices: %s", e)
+            await asyncio.sleep(2)
+            await model.load()
+            audio = model.state()
+
+        update_eww_variables(audio)
+
+        async for events in debouncer.bursts():
             try:
-                new_audio = get_sound_settings()
+                if not await model.apply(events):
+                    continue
+                new_audio = model.state()
+                if len(events) > 1:
+                    logger.debug("Refresh absorbed %s audio events", len(events))
 
                 if new_audio != audio:
                     if new_audio.source.name != audio.source.name:
@@ -168,6 +252,7 @@ def audio_monitor() -> None:
                             5000,
                             "Audio source device changed",
                             new_audio.source.description,
+                            tag="audio-source",
                         )
                         logger.info("Audio source device changed: %s", new_audio.source)
 
@@ -177,21 +262,38 @@ def audio_monitor() -> None:
                             5000,
                             "Audio sink device changed",
                             new_audio.sink.description,
+                            tag="audio-sink",
                         )
                         logger.info("Audio sink device changed: %s", new_audio.sink)
 
                     audio = new_audio
-                    update_eww_variables(audio)
+                    update_eww_variables(audio, since=events[0].received)
 
-            except subprocess.CalledProcessError as e:
+            except (ValueError, OSError, subprocess.CalledProcessError) as e:
                 logger.error("Error while updating audio devices: %s", e)
 
-    except KeyboardInterrupt:
+        await reader  # re-raise why the subscription ended
+
+    except asyncio.CancelledError:
         logger.info("Monitoring stopped.")
+        raise
 
     finally:
-        process.terminate()
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+        logger.info(
+            "Coalesced %s audio events into %s refreshes (largest burst: %s)",
+            debouncer.stats.events,
+            debouncer.stats.bursts,
+            debouncer.stats.largest_burst,
+        )
+        logger.info(
+            "Validated %s device lists, reused %s unchanged ones",
+            sum(decoder.stats.validated for decoder in model.decoders.values()),
+            sum(decoder.stats.cached for decoder in model.decoders.values()),
+        )
+        await backend.close()
 
 
 if __name__ == "__main__":
-    audio_monitor()
+    asyncio.run(audio_monitor())
@@ -0,0 +1,100 @@
+import json
+import logging
+import re
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Protocol, Set, Union
+
+from processes import CHILDREN, run_command, run_command_bytes
+
+logger = logging.getLogger("audio_backends")
+
+DEVICE_TYPES = ("sink", "source")
+SUBSCRIBE_EVENT = re.compile(
+    r"Event '(?P<kind>[\w-]+)' on (?P<facility>[\w-]+) #(?P<index>-?\d+)"
+)
+
+# Raw JSON as printed by pactl, or the equivalent already parsed list
+DevicePayload = Union[bytes, List[dict]]
+
+
+@dataclass
+class AudioEvent:
+    """A sound server event, e.g. "Event 'change' on sink #52"."""
+
+    kind: str  # new, change or remove
+    facility: str  # sink, source, server, sink-input, ...
+    index: int
+    received: float = field(default_factory=time.monotonic, compare=False)
+
+
+class AudioBackend(Protocol):
+    """Source of sound server events and device descriptions.
+
+    Devices are described by the output of `pactl --format=json list sinks`,
+    either raw or as parsed dictionaries of the same shape.
+    """
+
+    async def get_defaults(self) -> Dict[str, str]:
+        """Get the names of the default sink and source."""
+
+    async def list_devices(
+        self, device_type: str, indexes: Optional[Set[int]] = None
+    ) -> DevicePayload:
+        """Describe the devices of a type.
+
+        When `indexes` is given, only those devices are needed, but the
+        backend may describe others as well.
+        """
+
+    async def subscribe(self, on_event: Callable[[AudioEvent], None]) -> None:
+        """Deliver events to `on_event` until the subscription ends."""
+
+    async def close(self) -> None:
+        """Release the connection to the sound server."""
+
+
+def parse_event(line: str) -> Optional[AudioEvent]:
+    """Parse a `pactl subscribe` line into an event."""
+    match = SUBSCRIBE_EVENT.search(line)
+    if match is None:
+        return None
+    return AudioEvent(match["kind"], match["facility"], int(match["index"]))
+
+
+class PactlBackend:
+    """Backend shelling out to `pactl` for both events and queries."""
+
+    async def get_defaults(self) -> Dict[str, str]:
+        info = json.loads(await run_command(["pactl", "--format=json", "info"]))
+        return {
+            "sink": info["default_sink_name"],
+            "source": info["default_source_name"],
+        }
+
+    async def list_devices(
+        self, device_type: str, indexes: Optional[Set[int]] = None
+    ) -> DevicePayload:
+        # pactl cannot filter, and the raw bytes can skip validation entirely
+        # when nothing changed, so always hand over the whole list
+        return await run_command_bytes(
+            ["pactl", "--format=json", "list", f"{device_type}s"]
+        )
+
+    async def subscribe(self, on_event: Callable[[AudioEvent], None]) -> None:
+        process = await CHILDREN.spawn(
+            ["pactl", "subscribe"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            while line := (await process.stdout.readline()).decode():  # type: ignore
+                event = parse_event(line)
+                if event is not None:
+                    on_event(event)
+        finally:
+            await CHILDREN.terminate(process)
+
+    async def close(self) -> None:
+        pass
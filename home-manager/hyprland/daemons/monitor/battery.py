@@ -0,0 +1,188 @@
+import logging
+import os
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger("battery")
+
+POWER_SUPPLY_DIR = Path("/sys/class/power_supply")
+UEVENT_BUFFER_SIZE = 4096
+
+
+class BatteryState(Enum):
+    CHARGING = "Charging"
+    DISCHARGING = "Discharging"
+    FULL = "Full"
+    NOT_CHARGING = "Not charging"
+    UNKNOWN = "Unknown"
+
+
+@dataclass
+class BatteryStatus:
+    state: BatteryState
+    capacity: int
+    power_now: int
+    energy_now: int
+    energy_full: int
+
+
+STATES = {state.value.encode(): state for state in BatteryState}
+
+STATUS_KEY = b"\nPOWER_SUPPLY_STATUS="
+CAPACITY_KEY = b"\nPOWER_SUPPLY_CAPACITY="
+POWER_NOW_KEY = b"\nPOWER_SUPPLY_POWER_NOW="
+ENERGY_NOW_KEY = b"\nPOWER_SUPPLY_ENERGY_NOW="
+ENERGY_FULL_KEY = b"\nPOWER_SUPPLY_ENERGY_FULL="
+# Batteries reporting charge (µAh) and current (µA) instead of energy and power
+CURRENT_NOW_KEY = b"\nPOWER_SUPPLY_CURRENT_NOW="
+CHARGE_NOW_KEY = b"\nPOWER_SUPPLY_CHARGE_NOW="
+CHARGE_FULL_KEY = b"\nPOWER_SUPPLY_CHARGE_FULL="
+VOLTAGE_NOW_KEY = b"\nPOWER_SUPPLY_VOLTAGE_NOW="
+VOLTAGE_MIN_DESIGN_KEY = b"\nPOWER_SUPPLY_VOLTAGE_MIN_DESIGN="
+
+
+def find_value(buffer: bytearray, length: int, key: bytes) -> Optional[memoryview]:
+    """Locate the value of `key` in a uevent buffer without copying it."""
+    start = buffer.find(key, 0, length)
+    if start == -1:
+        return None
+    start += len(key)
+    end = buffer.find(b"\n", start, length)
+    return memoryview(buffer)[start : end if end != -1 else length]
+
+
+def find_int(buffer: bytearray, length: int, key: bytes) -> Optional[int]:
+    value = find_value(buffer, length, key)
+    return int(value) if value is not None else None
+
+
+def discover_batteries(root: Path = POWER_SUPPLY_DIR) -> list[Path]:
+    """Find system batteries, skipping peripheral ones such as mice."""
+    batteries = []
+    for supply in sorted(root.iterdir()):
+        try:
+            if (supply / "type").read_text().strip() != "Battery":
+                continue
+            scope = supply / "scope"
+            if scope.exists() and scope.read_text().strip() == "Device":
+                continue
+        except OSError:
+            continue
+        batteries.append(supply)
+    return batteries
+
+
+class UeventReader:
+    """Snapshot reader of one battery's `uevent` attribute.
+
+    All fields come from a single read, so they describe the same moment.
+    The descriptor stays open and is re-read with `pread`, which makes sysfs
+    regenerate the attribute on every call.
+    """
+
+    def __init__(self, battery_dir: Path):
+        self.battery_dir = battery_dir
+        self._fd = os.open(battery_dir / "uevent", os.O_RDONLY | os.O_CLOEXEC)
+        self._buffer = bytearray(UEVENT_BUFFER_SIZE)
+
+    def read(self) -> BatteryStatus:
+        """Read the current battery status."""
+        buffer = self._buffer
+        buffer[0] = ord("\n")  # lets every key be matched as "\nKEY="
+        length = 1 + os.preadv(self._fd, [memoryview(buffer)[1:]], 0)
+
+        status = find_value(buffer, length, STATUS_KEY)
+        capacity = find_int(buffer, length, CAPACITY_KEY)
+        power_now = find_int(buffer, length, POWER_NOW_KEY)
+        energy_now = find_int(buffer, length, ENERGY_NOW_KEY)
+        energy_full = find_int(buffer, length, ENERGY_FULL_KEY)
+
+        if energy_now is None or energy_full is None:
+            # µAh * µV / 10^6 = µWh
+            voltage = find_int(buffer, length, VOLTAGE_MIN_DESIGN_KEY) or 0
+            energy_now = (find_int(buffer, length, CHARGE_NOW_KEY) or 0) * voltage
+            energy_now //= 1_000_000
+            energy_full = (find_int(buffer, length, CHARGE_FULL_KEY) or 0) * voltage
+            energy_full //= 1_000_000
+
+        if power_now is None:
+            current = find_int(buffer, length, CURRENT_NOW_KEY) or 0
+            voltage = find_int(buffer, length, VOLTAGE_NOW_KEY) or 0
+            power_now = current * voltage // 1_000_000
+
+        if capacity is None:
+            capacity = energy_now * 100 // energy_full if energy_full else 0
+
+        state = BatteryState.UNKNOWN
+        if status is not None:
+            state = STATES.get(bytes(status), BatteryState.UNKNOWN)
+
+        return BatteryStatus(
+            state=state,
+            capacity=capacity,
+            power_now=abs(power_now),
+            energy_now=energy_now,
+            energy_full=energy_full,
+        )
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def combine_statuses(statuses: list[BatteryStatus]) -> BatteryStatus:
+    """Merge the statuses of several batteries into one."""
+    if len(statuses) == 1:
+        return statuses[0]
+
+    states = {status.state for status in statuses}
+    for state in (BatteryState.CHARGING, BatteryState.DISCHARGING, BatteryState.FULL):
+        if state in states:
+            break
+    else:
+        state = states.pop() if len(states) == 1 else BatteryState.UNKNOWN
+
+    energy_now = sum(status.energy_now for status in statuses)
+    energy_full = sum(status.energy_full for status in statuses)
+    return BatteryStatus(
+        state=state,
+        capacity=energy_now * 100 // energy_full if energy_full else 0,
+        power_now=sum(status.power_now for status in statuses),
+        energy_now=energy_now,
+        energy_full=energy_full,
+    )
+
+
+class BatteryReader:
+    """Reads all system batteries, re-discovering them when one disappears."""
+
+    def __init__(self, root: Path = POWER_SUPPLY_DIR):
+        self.root = root
+        self._readers: list[UeventReader] = []
+
+    def read(self) -> BatteryStatus:
+        """Read the combined status of all batteries."""
+        if not self._readers:
+            self._open()
+
+        try:
+            return combine_statuses([reader.read() for reader in self._readers])
+        except OSError:
+            # A battery was removed or replaced; rediscover on the next read
+            self.close()
+            raise
+
+    def _open(self) -> None:
+        self._readers = [UeventReader(path) for path in discover_batteries(self.root)]
+        if not self._readers:
+            raise FileNotFoundError(f"No battery found in {self.root}")
+        logger.info(
+            "Reading batteries: %s",
+            ", ".join(r.battery_dir.name for r in self._readers),
+        )
+
+    def close(self) -> None:
+        for reader in self._readers:
+            reader.close()
+        self._readers = []
@@ -0,0 +1,193 @@
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from battery import BatteryState, BatteryStatus
+
+logger = logging.getLogger("battery_history")
+
+HISTORY_FILE = Path("~/.local/share/sysmonitor/battery-history.bin").expanduser()
+CAPACITY = 16384  # samples, 512 KiB on disk
+MIN_SPACING = 10  # seconds between stored samples of the same state
+SMOOTHING_TIME = 300  # seconds, time constant of the smoothed power draw
+
+MAGIC = b"BATH"
+VERSION = 1
+HEADER = struct.Struct("<4sIIII12x")  # magic, version, capacity, head, count
+SAMPLE = struct.Struct("<dqqB7x")  # timestamp, energy_now, power_now, state
+
+STATE_CODES = {state: code for code, state in enumerate(BatteryState)}
+STATES = list(BatteryState)
+
+
+@dataclass
+class Sample:
+    timestamp: float
+    energy_now: int  # µWh
+    power_now: int  # µW
+    state: BatteryState
+
+
+class BatteryHistory:
+    """Fixed-size ring buffer of battery samples, memory-mapped to a file.
+
+    Memory use depends only on `capacity`, and the history survives
+    restarts. Also keeps an exponentially smoothed power draw, which gives
+    steadier time estimates than a single `power_now` reading.
+    """
+
+    def __init__(self, path: Path = HISTORY_FILE, capacity: int = CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        size = HEADER.size + capacity * SAMPLE.size
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, version, stored_capacity, self._head, self._count = HEADER.unpack_from(
+            self._map
+        )
+        if (magic, version, stored_capacity) != (MAGIC, VERSION, capacity):
+            logger.info("Starting a new battery history in %s", path)
+            self._head = self._count = 0
+            self._write_header()
+
+        self._smoothed_draw: Optional[float] = None
+        self._smoothed_sample: Optional[Sample] = None
+        for sample in self.samples(since=time.time() - 5 * SMOOTHING_TIME):
+            self._smooth(sample)
+
+    def _write_header(self) -> None:
+        HEADER.pack_into(
+            self._map, 0, MAGIC, VERSION, self.capacity, self._head, self._count
+        )
+
+    def _read(self, index: int) -> Sample:
+        timestamp, energy_now, power_now, state = SAMPLE.unpack_from(
+            self._map, HEADER.size + index * SAMPLE.size
+        )
+        return Sample(timestamp, energy_now, power_now, STATES[state])
+
+    def last(self) -> Optional[Sample]:
+        """Return the most recent sample."""
+        if not self._count:
+            return None
+        return self._read((self._head - 1) % self.capacity)
+
+    def samples(self, since: float = 0) -> Iterator[Sample]:
+        """Iterate over stored samples newer than `since`, oldest first."""
+        start = (self._head - self._count) % self.capacity
+        for offset in range(self._count):
+            sample = self._read((start + offset) % self.capacity)
+            if sample.timestamp >= since:
+                yield sample
+
+    def append(self, status: BatteryStatus, timestamp: Optional[float] = None) -> None:
+        """Record a battery reading.
+
+        Every reading feeds the smoothed draw, but one is only stored if it
+        changes the state or comes at least MIN_SPACING after the last one.
+        """
+        sample = Sample(
+            timestamp if timestamp is not None else time.time(),
+            status.energy_now,
+            status.power_now,
+            status.state,
+        )
+        self._smooth(sample)
+
+        last = self.last()
+        if (
+            last is not None
+            and last.state == sample.state
+            and 0 <= sample.timestamp - last.timestamp < MIN_SPACING
+        ):
+            return
+
+        SAMPLE.pack_into(
+            self._map,
+            HEADER.size + self._head * SAMPLE.size,
+            sample.timestamp,
+            sample.energy_now,
+            sample.power_now,
+            STATE_CODES[sample.state],
+        )
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        self._write_header()
+
+    def _smooth(self, sample: Sample) -> None:
+        previous, self._smoothed_sample = self._smoothed_sample, sample
+
+        if previous is None or previous.state != sample.state:
+            self._smoothed_draw = float(sample.power_now)
+            return
+
+        # Irregularly sampled EWMA: older estimates fade with elapsed time
+        elapsed = max(sample.timestamp - previous.timestamp, 0)
+        alpha = 1 - math.exp(-elapsed / SMOOTHING_TIME)
+        draw = self._smoothed_draw if self._smoothed_draw is not None else 0.0
+        self._smoothed_draw = draw + alpha * (sample.power_now - draw)
+
+    def smoothed_draw(self) -> Optional[int]:
+        """Exponentially smoothed power draw in µW for the current state."""
+        if self._smoothed_draw is None:
+            return None
+        return round(self._smoothed_draw)
+
+    def energy_used(self, since: float, until: Optional[float] = None) -> int:
+        """Energy in µWh drained from the battery between two timestamps."""
+        until = until if until is not None else math.inf
+        used = 0
+        previous: Optional[Sample] = None
+        for sample in self.samples(since):
+            if sample.timestamp > until:
+                break
+            if previous is not None and sample.energy_now < previous.energy_now:
+                used += previous.energy_now - sample.energy_now
+            previous = sample
+        return used
+
+    def session_start(self) -> Optional[float]:
+        """Timestamp at which the current uninterrupted discharge began."""
+        start = None
+        for sample in self.samples():
+            if sample.state != BatteryState.DISCHARGING:
+                start = None
+            elif start is None:
+                start = sample.timestamp
+        return start
+
+    def session_energy_used(self) -> int:
+        """Energy in µWh used since the charger was last unplugged."""
+        start = self.session_start()
+        return self.energy_used(start) if start is not None else 0
+
+    def daily_energy_used(self) -> dict[date, int]:
+        """Energy in µWh drained per local calendar day."""
+        days: dict[date, int] = {}
+        previous: Optional[Sample] = None
+        for sample in self.samples():
+            if previous is not None and sample.energy_now < previous.energy_now:
+                day = datetime.fromtimestamp(sample.timestamp).date()
+                days[day] = days.get(day, 0) + previous.energy_now - sample.energy_now
+            previous = sample
+        return days
+
+    def close(self) -> None:
+        self._map.flush()
+        self._map.close()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the uevent battery reader against five separate reads.
+
+Uses the first system battery, or a fake sysfs directory when there is none:
+
+    python3 bench/battery_reader.py [iterations]
+"""
+
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from battery import (  # pylint: disable=wrong-import-position
+    BatteryState,
+    BatteryStatus,
+    UeventReader,
+    discover_batteries,
+)
+
+FAKE_ATTRIBUTES = {
+    "type": "Battery",
+    "status": "Discharging",
+    "capacity": "57",
+    "power_now": "8123000",
+    "energy_now": "31520000",
+    "energy_full": "55280000",
+}
+
+
+def read_battery_status_five_files(battery_dir: Path) -> BatteryStatus:
+    """The previous reader: one open/read/close per attribute."""
+    return BatteryStatus(
+        state=BatteryState((battery_dir / "status").read_text().strip()),
+        capacity=int((battery_dir / "capacity").read_text().strip()),
+        power_now=int((battery_dir / "power_now").read_text().strip()),
+        energy_now=int((battery_dir / "energy_now").read_text().strip()),
+        energy_full=int((battery_dir / "energy_full").read_text().strip()),
+    )
+
+
+def make_fake_battery(root: Path) -> Path:
+    battery_dir = root / "BAT0"
+    battery_dir.mkdir()
+    for name, value in FAKE_ATTRIBUTES.items():
+        (battery_dir / name).write_text(f"{value}\n")
+    (battery_dir / "uevent").write_text(
+        "POWER_SUPPLY_NAME=BAT0\n"
+        "POWER_SUPPLY_TYPE=Battery\n"
+        f"POWER_SUPPLY_STATUS={FAKE_ATTRIBUTES['status']}\n"
+        "POWER_SUPPLY_PRESENT=1\n"
+        "POWER_SUPPLY_TECHNOLOGY=Li-poly\n"
+        "POWER_SUPPLY_CYCLE_COUNT=112\n"
+        "POWER_SUPPLY_VOLTAGE_MIN_DESIGN=15400000\n"
+        "POWER_SUPPLY_VOLTAGE_NOW=16301000\n"
+        f"POWER_SUPPLY_POWER_NOW={FAKE_ATTRIBUTES['power_now']}\n"
+        "POWER_SUPPLY_ENERGY_FULL_DESIGN=57000000\n"
+        f"POWER_SUPPLY_ENERGY_FULL={FAKE_ATTRIBUTES['energy_full']}\n"
+        f"POWER_SUPPLY_ENERGY_NOW={FAKE_ATTRIBUTES['energy_now']}\n"
+        f"POWER_SUPPLY_CAPACITY={FAKE_ATTRIBUTES['capacity']}\n"
+        "POWER_SUPPLY_CAPACITY_LEVEL=Normal\n"
+        "POWER_SUPPLY_MODEL_NAME=5B10W13975\n"
+        "POWER_SUPPLY_MANUFACTURER=SMP\n"
+        "POWER_SUPPLY_SERIAL_NUMBER=  123\n"
+    )
+    return battery_dir
+
+
+def run(battery_dir: Path, iterations: int) -> None:
+    reader = UeventReader(battery_dir)
+    print(f"Battery: {battery_dir}")
+    print(f"  five files: {read_battery_status_five_files(battery_dir)}")
+    print(f"  uevent:     {reader.read()}")
+
+    for name, func in (
+        ("five files", lambda: read_battery_status_five_files(battery_dir)),
+        ("uevent pread", reader.read),
+    ):
+        seconds = min(timeit.repeat(func, number=iterations, repeat=5))
+        print(f"{name:>14}: {seconds / iterations * 1e6:8.2f} µs/read")
+
+    reader.close()
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    try:
+        batteries = discover_batteries()
+    except OSError:
+        batteries = []
+
+    if batteries:
+        run(batteries[0], iterations)
+        return
+
+    with tempfile.TemporaryDirectory() as root:
+        run(make_fake_battery(Path(root)), iterations)
+
+
+if __name__ == "__main__":
+    main()
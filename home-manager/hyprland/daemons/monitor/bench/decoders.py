@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the pactl and mullvad JSON decoders.
+
+Compares the previous path (json.loads, then a TypeAdapter built per call)
+with prebuilt adapters parsing bytes, the projected summaries and the
+payload cache, on the payloads in bench/payloads:
+
+    python3 bench/decoders.py [iterations]
+"""
+
+import json
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# pylint: disable=wrong-import-position
+from audio import DEVICE_SUMMARIES, DEVICES, AudioDevice
+from decoders import Decoder
+from pydantic import TypeAdapter
+from vpn import STATUS_SUMMARIES, STATUSES, MullvadStatus
+
+PAYLOADS = Path(__file__).resolve().parent / "payloads"
+
+
+def decode_devices_previously(payload: bytes) -> list:
+    return TypeAdapter(list[AudioDevice]).validate_python(json.loads(payload))
+
+
+def decode_status_previously(payload: bytes) -> object:
+    return TypeAdapter(MullvadStatus).validate_python(json.loads(payload))
+
+
+def benchmark(
+    title: str, payloads: list[bytes], cases: Dict[str, Callable], iterations: int
+) -> None:
+    print(f"{title} ({len(payloads)} payloads, {sum(map(len, payloads))} bytes)")
+    baseline = None
+    for name, decode in cases.items():
+        seconds = min(
+            timeit.repeat(
+                lambda: [decode(payload) for payload in payloads],
+                number=iterations,
+                repeat=5,
+            )
+        )
+        per_round = seconds / iterations * 1e6
+        baseline = baseline or per_round
+        print(f"{name:>22}: {per_round:9.2f} µs  ({baseline / per_round:5.1f}x)")
+    print()
+
+
+def cached(adapter: TypeAdapter) -> Callable:
+    """Decode with one cache per payload, as each device type has its own."""
+    decoders: Dict[bytes, Decoder] = {}
+
+    def decode(payload: bytes) -> object:
+        if payload not in decoders:
+            decoders[payload] = Decoder(adapter)
+        return decoders[payload].decode(payload)
+
+    return decode
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    devices = [
+        (PAYLOADS / "pactl-sinks.json").read_bytes(),
+        (PAYLOADS / "pactl-sources.json").read_bytes(),
+    ]
+    assert [
+        [device.model_dump() for device in decode_devices_previously(payload)]
+        for payload in devices
+    ] == [
+        [device.model_dump() for device in DEVICES.validate_json(payload)]
+        for payload in devices
+    ]
+    benchmark(
+        "pactl list",
+        devices,
+        {
+            "previous": decode_devices_previously,
+            "prebuilt, from bytes": DEVICES.validate_json,
+            "projected": DEVICE_SUMMARIES.validate_json,
+            "projected, unchanged": cached(DEVICE_SUMMARIES),
+        },
+        iterations,
+    )
+
+    statuses = (PAYLOADS / "mullvad-status.jsonl").read_bytes().splitlines()
+    benchmark(
+        "mullvad status",
+        statuses,
+        {
+            "previous": decode_status_previously,
+            "prebuilt, from bytes": STATUSES.validate_json,
+            "projected": STATUS_SUMMARIES.validate_json,
+            "projected, unchanged": cached(STATUS_SUMMARIES),
+        },
+        iterations,
+    )
+
+
+if __name__ == "__main__":
+    main()
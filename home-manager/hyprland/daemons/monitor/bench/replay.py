@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Trace-replay benchmark of the audio, VPN and power monitors.
+
+Every scenario runs the real monitor in a fresh Python process, with the
+stand-in `pactl`, `mullvad`, `notify-send` and `eww` of bench/bin first on
+PATH, and replays a recorded trace as fast as the monitor consumes it:
+
+    audio  `pactl subscribe` events (bench/traces) and `pactl --format=json`
+           info and device lists (bench/traces, bench/payloads)
+    vpn    a `mullvad status --json listen` stream (bench/payloads)
+    power  a discharge and charge cycle of a fake sysfs battery, announced
+           by power_supply uevents (bench/traces/battery.jsonl)
+
+It reports events per second, the monitor's CPU time, the subprocesses it
+spawned and its peak RSS, and compares them with bench/baseline.json:
+
+    python3 bench/replay.py [--runs N] [--update-baseline] [scenario ...]
+
+The exit status is 1 when a scenario is worse than the baseline by more
+than the metric's tolerance. Baselines depend on the machine, so record
+one with --update-baseline before comparing changes.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+MONITOR_DIR = BENCH_DIR.parent
+TRACES = BENCH_DIR / "traces"
+PAYLOADS = BENCH_DIR / "payloads"
+BASELINE = BENCH_DIR / "baseline.json"
+
+sys.path.insert(0, str(MONITOR_DIR))
+
+# metric: (sign of a regression, relative tolerance)
+TOLERANCES = {
+    "events_per_second": (-1, 0.3),
+    "cpu_seconds": (1, 0.3),
+    "spawns": (1, 0.1),
+    "peak_rss_kib": (1, 0.1),
+}
+UEVENT = (
+    b"change@/devices/LNXSYSTM:00/LNXSYBUS:00/PNP0C0A:00/power_supply/BAT0\0"
+    b"ACTION=change\0SUBSYSTEM=power_supply\0POWER_SUPPLY_NAME=BAT0\0"
+)
+
+
+@dataclass
+class Result:
+    events: int
+    events_per_second: float
+    cpu_seconds: float
+    spawns: int
+    peak_rss_kib: int
+
+
+def repeat_lines(source: Path, target: Path, repeat: int) -> int:
+    """Write `repeat` copies of a line-oriented trace; return its line count."""
+    lines = source.read_bytes().splitlines(keepends=True)
+    target.write_bytes(b"".join(lines) * repeat)
+    return len(lines) * repeat
+
+
+def prepare_audio(traces: Path, repeat: int) -> int:
+    for name in ("pactl-sinks.json", "pactl-sources.json"):
+        (traces / name).write_bytes((PAYLOADS / name).read_bytes())
+    (traces / "pactl-info.json").write_bytes((TRACES / "pactl-info.json").read_bytes())
+    return repeat_lines(
+        TRACES / "pactl-subscribe.txt", traces / "pactl-subscribe.txt", repeat
+    )
+
+
+async def replay_audio(traces: Path) -> None:
+    from audio import audio_monitor
+    from audio_backends import PactlBackend
+
+    await audio_monitor(PactlBackend())
+
+
+def prepare_vpn(traces: Path, repeat: int) -> int:
+    return repeat_lines(
+        PAYLOADS / "mullvad-status.jsonl", traces / "mullvad-listen.jsonl", repeat
+    )
+
+
+async def replay_vpn(traces: Path) -> None:
+    from vpn import CliBackend, vpn_monitor
+
+    await vpn_monitor(CliBackend())
+
+
+def prepare_power(traces: Path, repeat: int) -> int:
+    return repeat_lines(TRACES / "battery.jsonl", traces / "battery.jsonl", repeat)
+
+
+def write_battery(battery_dir: Path, row: dict) -> None:
+    (battery_dir / "uevent").write_text(
+        "POWER_SUPPLY_NAME=BAT0\n"
+        "POWER_SUPPLY_TYPE=Battery\n"
+        f"POWER_SUPPLY_STATUS={row['status']}\n"
+        "POWER_SUPPLY_PRESENT=1\n"
+        f"POWER_SUPPLY_POWER_NOW={row['power_now']}\n"
+        f"POWER_SUPPLY_ENERGY_FULL={row['energy_full']}\n"
+        f"POWER_SUPPLY_ENERGY_NOW={row['energy_now']}\n"
+        f"POWER_SUPPLY_CAPACITY={row['capacity']}\n"
+    )
+
+
+async def replay_power(traces: Path) -> None:
+    from power import power_monitor
+    from state import STATE
+    from uevents import FakeUeventSource
+
+    rows = [json.loads(line) for line in (traces / "battery.jsonl").open()]
+    battery_dir = traces / "power_supply" / "BAT0"
+    battery_dir.mkdir(parents=True)
+    (battery_dir / "type").write_text("Battery\n")
+    write_battery(battery_dir, rows[0])
+
+    events = FakeUeventSource()
+    published = asyncio.Event()
+    stop_listening = STATE.listen(
+        lambda topic, _: published.set() if topic == "power" else None
+    )
+    monitor = asyncio.create_task(
+        power_monitor(
+            events,
+            power_supply_dir=battery_dir.parent,
+            history_file=traces / "battery-history.bin",
+        )
+    )
+    try:
+        await published.wait()
+        for row in rows[1:]:
+            published.clear()
+            write_battery(battery_dir, row)
+            events.feed(UEVENT)
+            await published.wait()
+    finally:
+        stop_listening()
+        monitor.cancel()
+        await asyncio.gather(monitor, return_exceptions=True)
+
+
+SCENARIOS: Dict[str, tuple] = {
+    # name: (prepare the traces, replay them, default repetitions of the trace)
+    "audio": (prepare_audio, replay_audio, 20),
+    "vpn": (prepare_vpn, replay_vpn, 100),
+    "power": (prepare_power, replay_power, 3),
+}
+
+
+async def run_child(replay: Callable[[Path], Awaitable[None]], traces: Path) -> None:
+    from notifications import NOTIFIER
+    from publisher import PUBLISHER
+
+    await replay(traces)
+    await NOTIFIER.drain()
+    await PUBLISHER.flush()
+
+
+def child(name: str, repeat: int) -> None:
+    """Run one scenario in this process and print its Result as JSON."""
+    prepare, replay, _ = SCENARIOS[name]
+    logging.basicConfig(level=logging.INFO, handlers=[logging.NullHandler()])
+
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as directory:
+        traces = Path(directory)
+        spawn_log = traces / "spawns.log"
+        spawn_log.touch()
+        os.environ.update(BENCH_TRACES=str(traces), BENCH_SPAWN_LOG=str(spawn_log))
+        events = prepare(traces, repeat)
+
+        started = time.perf_counter()
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        asyncio.run(run_child(replay, traces))
+        elapsed = time.perf_counter() - started
+        end = resource.getrusage(resource.RUSAGE_SELF)
+
+        result = Result(
+            events=events,
+            events_per_second=round(events / elapsed, 1),
+            cpu_seconds=round(
+                end.ru_utime - usage.ru_utime + end.ru_stime - usage.ru_stime, 4
+            ),
+            spawns=len(spawn_log.read_text().splitlines()),
+            peak_rss_kib=end.ru_maxrss,
+        )
+    print(json.dumps(asdict(result)))
+
+
+def measure(name: str, repeat: int, runs: int) -> Result:
+    """Run a scenario `runs` times in fresh processes; return the medians."""
+    env = dict(os.environ)
+    env["PATH"] = f"{BENCH_DIR / 'bin'}{os.pathsep}{env.get('PATH', '')}"
+    env.pop("DBUS_SESSION_BUS_ADDRESS", None)  # notify through the stand-in
+    env["MULLVAD_RPC_SOCKET_PATH"] = "/nonexistent"
+
+    results: List[Result] = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", name, "--repeat", str(repeat)],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results.append(Result(**json.loads(output.splitlines()[-1])))
+
+    return Result(
+        **{
+            field: statistics.median(getattr(result, field) for result in results)
+            for field in asdict(results[0])
+        }
+    )
+
+
+def regressions(name: str, result: Result, baseline: dict) -> List[str]:
+    found = []
+    for metric, (sign, tolerance) in TOLERANCES.items():
+        if metric not in baseline:
+            continue
+        base, value = baseline[metric], getattr(result, metric)
+        if sign * (value - base) > tolerance * base:
+            found.append(f"{name}: {metric} {value} vs baseline {base}")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS))
+    parser.add_argument("--runs", type=int, default=3, help="runs per scenario")
+    parser.add_argument("--repeat", type=int, help="repetitions of each trace")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.repeat or SCENARIOS[args.child][2])
+        return
+
+    baselines = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    failures: List[str] = []
+    print(
+        f"{'':8}{'events':>8}{'events/s':>12}{'CPU s':>9}{'spawns':>8}{'RSS KiB':>10}"
+    )
+    for name in args.scenarios:
+        result = measure(name, args.repeat or SCENARIOS[name][2], args.runs)
+        print(
+            f"{name:8}{result.events:>8}{result.events_per_second:>12.0f}"
+            f"{result.cpu_seconds:>9.3f}{result.spawns:>8}{result.peak_rss_kib:>10}"
+        )
+        if args.update_baseline:
+            baselines[name] = asdict(result)
+        elif name in baselines:
+            failures += regressions(name, result, baselines[name])
+
+    if args.update_baseline:
+        BASELINE.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"Baseline written to {BASELINE}")
+    elif failures:
+        print("Regressions:", *failures, sep="\n  ")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""Blue-light filter lowering the screen temperature in the evening.
+
+Runs as a monitor of sysmonitor, or on its own:
+
+    python3 blue_light.py
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+from bisect import bisect_right
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from processes import CHILDREN, run_command
+from scheduler import SCHEDULER
+from utils import publish_state
+
+logger = logging.getLogger("blue_light_monitor")
+
+# descent parameters
+DESCENT_HOUR_START = 16
+INITIAL_TEMP = 6000
+MINIMUM_TEMP = 1000
+
+TEMP_DECREASE_PER_STEP = 0.9  # percentage
+STEP_INTERVAL = 30  # minutes
+DESCENT_STEPS = 14
+
+# solar schedule: set both to start the descent at local sunset
+LATITUDE: Optional[float] = None  # degrees north
+LONGITUDE: Optional[float] = None  # degrees east
+SUNSET_OFFSET = 0  # minutes after sunset the descent starts, may be negative
+SUN_TABLE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser()
+    / "blue-light-filter"
+)
+
+# transition parameters
+TRANSITION_FPS = 1.0  # highest rate of temperature changes while interpolating
+MIN_TEMP_CHANGE = 10  # kelvin, smaller changes are not worth an IPC call
+HYPRCTL_TIMEOUT = 2  # seconds
+STOP_TIMEOUT = 2  # seconds to wait for hyprsunset to exit before killing it
+SLACK = 0.5  # seconds a change of temperature may come late
+
+
+def descent(start: int) -> dict[tuple[int, int], int | None]:
+    """Points of the temperature descent starting `start` minutes after midnight.
+
+    The descent is cut short at midnight.
+    """
+    return {
+        divmod(minute, 60): max(
+            int(INITIAL_TEMP * TEMP_DECREASE_PER_STEP**step), MINIMUM_TEMP
+        )
+        for step in range(DESCENT_STEPS)
+        if (minute := start + step * STEP_INTERVAL) < 24 * 60
+    }
+
+
+MORNING: dict[tuple[int, int], int | None] = {
+    (5, 0): 5500,
+    (6, 0): None,
+}
+
+SCHEDULE: dict[tuple[int, int], int | None] = {
+    **MORNING,
+    **descent(DESCENT_HOUR_START * 60),
+}
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class HyprsunsetController:
+    """Owns a single hyprsunset instance and retunes it over its IPC.
+
+    hyprsunset is started once, when the filter is first needed, and its
+    temperature is changed with `hyprctl hyprsunset temperature N` instead of
+    starting another instance. It is stopped while no filter is wanted. If
+    it exits on its own (e.g. Hyprland restarted), it is reaped and started
+    again on the next change.
+    """
+
+    def __init__(self):
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self.temperature: Optional[int] = None
+
+    async def set_temperature(self, temp: int) -> None:
+        """Set the temperature of the screen."""
+        if not self.running():
+            await self._start(temp)
+            return
+        if temp == self.temperature:
+            return
+
+        try:
+            await run_command(
+                ["hyprctl", "hyprsunset", "temperature", str(temp)], HYPRCTL_TIMEOUT
+            )
+        except (OSError, subprocess.CalledProcessError, TimeoutError) as e:
+            logger.warning("Could not retune hyprsunset (%s); restarting it", e)
+            await self.stop()
+            await self._start(temp)
+            return
+        self.temperature = temp
+
+    def running(self) -> bool:
+        """Whether hyprsunset runs; forgets it if it has exited."""
+        if self._process is not None and self._process.returncode is not None:
+            logger.warning("hyprsunset exited with status %s", self._process.returncode)
+            self._process = None
+            self.temperature = None
+        return self._process is not None
+
+    async def _start(self, temp: int) -> None:
+        try:
+            self._process = await CHILDREN.spawn(
+                ["hyprsunset", "--temperature", str(temp)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            logger.error("Could not start hyprsunset: %s", e)
+            return
+        self.temperature = temp
+
+    async def stop(self) -> None:
+        """Stop hyprsunset, removing the filter, and reap it."""
+        process, self._process = self._process, None
+        self.temperature = None
+        if process is None:
+            return
+
+        await CHILDREN.terminate(process, STOP_TIMEOUT)
+
+
+class Schedule:
+    """Daily temperature schedule over sorted time points.
+
+    The entry in force at any moment is found by bisecting the points, so the
+    answer only depends on the time of day: right after midnight and before
+    the first point, the last point of the previous day is in force.
+    Consecutive points at most `transition` apart are interpolated linearly.
+    """
+
+    def __init__(
+        self,
+        points: dict[tuple[int, int], int | None],
+        transition: timedelta = timedelta(minutes=STEP_INTERVAL),
+    ):
+        entries = sorted((h * 3600 + m * 60, temp) for (h, m), temp in points.items())
+        self.times = [time_point for time_point, _ in entries]
+        self.temps = [temp for _, temp in entries]
+        self.transition = transition.total_seconds()
+
+    def _segment(self, seconds: float) -> tuple[int | None, int | None, float, float]:
+        """The entry in force and the next one, and when each begins.
+
+        Times are in seconds since the start of today, so the start may be
+        negative and the end past midnight.
+        """
+        index = bisect_right(self.times, seconds) - 1  # -1: yesterday's last
+        start = self.times[index] - (SECONDS_PER_DAY if index < 0 else 0)
+        following = (index + 1) % len(self.times)
+        last = index == len(self.times) - 1
+        end = self.times[following] + (SECONDS_PER_DAY if last else 0)
+        return self.temps[index], self.temps[following], start, end
+
+    def _interpolated(self, temp, following, start: float, end: float) -> bool:
+        return (
+            temp is not None
+            and following is not None
+            and end - start <= self.transition
+        )
+
+    def temperature_at(self, now: datetime) -> Optional[int]:
+        """The temperature for `now`, or None for no filter."""
+        seconds = seconds_of_day(now)
+        temp, following, start, end = self._segment(seconds)
+        if not self._interpolated(temp, following, start, end):
+            return temp
+        return round(temp + (following - temp) * (seconds - start) / (end - start))
+
+    def next_wakeup(self, now: datetime) -> datetime:
+        """When the temperature should next be re-evaluated.
+
+        That is the next point, or during a transition the moment the
+        temperature will have moved by MIN_TEMP_CHANGE, but at most
+        TRANSITION_FPS times a second.
+        """
+        temp, following, start, end = self._segment(seconds_of_day(now))
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        next_point = midnight + timedelta(seconds=end)
+        if not self._interpolated(temp, following, start, end) or temp == following:
+            return next_point
+
+        slope = abs(following - temp) / (end - start)  # kelvin per second
+        frame = max(1 / TRANSITION_FPS, MIN_TEMP_CHANGE / slope)
+        return min(now + timedelta(seconds=frame), next_point)
+
+
+def seconds_of_day(now: datetime) -> float:
+    return now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+
+
+def compute_sun_table(latitude: float, longitude: float, year: int) -> Any:
+    """Sunrise and sunset of every day of a year, in minutes after UTC midnight.
+
+    Uses the NOAA approximation of the solar position for all days at once.
+    Days without a sunrise or a sunset (polar day or night) are NaN.
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    days = (date(year + 1, 1, 1) - date(year, 1, 1)).days
+    gamma = 2 * np.pi / days * np.arange(days)  # fractional year at noon
+    equation_of_time = 229.18 * (
+        0.000075
+        + 0.001868 * np.cos(gamma)
+        - 0.032077 * np.sin(gamma)
+        - 0.014615 * np.cos(2 * gamma)
+        - 0.040849 * np.sin(2 * gamma)
+    )
+    declination = (
+        0.006918
+        - 0.399912 * np.cos(gamma)
+        + 0.070257 * np.sin(gamma)
+        - 0.006758 * np.cos(2 * gamma)
+        + 0.000907 * np.sin(2 * gamma)
+        - 0.002697 * np.cos(3 * gamma)
+        + 0.00148 * np.sin(3 * gamma)
+    )
+    phi = np.radians(latitude)
+    cos_hour_angle = np.cos(np.radians(90.833)) / (
+        np.cos(phi) * np.cos(declination)
+    ) - np.tan(phi) * np.tan(declination)
+    with np.errstate(invalid="ignore"):
+        hour_angle = np.degrees(np.arccos(cos_hour_angle))  # NaN beyond ±1
+
+    noon = 720 - 4 * longitude - equation_of_time
+    return np.stack([noon - 4 * hour_angle, noon + 4 * hour_angle], axis=1).astype(
+        np.float32
+    )
+
+
+def load_sun_table(latitude: float, longitude: float, year: int) -> Any:
+    """The sun table of a year, computed once and then loaded from disk."""
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    path = SUN_TABLE_DIR / f"sun-{latitude:.3f}_{longitude:.3f}-{year}.npy"
+    try:
+        return np.load(path)
+    except (OSError, ValueError):
+        pass
+
+    table = compute_sun_table(latitude, longitude, year)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".partial.npy")
+        np.save(partial, table)
+        os.replace(partial, path)
+    except OSError as e:
+        logger.warning("Could not cache the sun table in %s: %s", path, e)
+    return table
+
+
+class SolarSchedules:
+    """Daily schedules whose descent starts at the day's local sunset."""
+
+    def __init__(self, latitude: float, longitude: float):
+        self.latitude = latitude
+        self.longitude = longitude
+        self._tables: Dict[int, Any] = {}
+
+    def sunset(self, day: date) -> Optional[datetime]:
+        """Local time of the sunset, or None if the sun does not set."""
+        if day.year not in self._tables:
+            self._tables[day.year] = load_sun_table(
+                self.latitude, self.longitude, day.year
+            )
+        minutes = float(self._tables[day.year][day.timetuple().tm_yday - 1, 1])
+        if minutes != minutes:  # NaN
+            return None
+
+        midnight = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        return datetime.fromtimestamp(midnight.timestamp() + minutes * 60)
+
+    def __call__(self, day: date) -> "Schedule":
+        sunset = self.sunset(day)
+        if sunset is None:
+            return Schedule(SCHEDULE)
+        start = sunset + timedelta(minutes=SUNSET_OFFSET)
+        if start.date() != day:
+            return Schedule(SCHEDULE)
+        return Schedule({**MORNING, **descent(start.hour * 60 + start.minute)})
+
+
+def open_schedules() -> Callable[[date], "Schedule"]:
+    """The solar schedules if a location is configured and NumPy is available."""
+    fixed = Schedule(SCHEDULE)
+    if LATITUDE is None or LONGITUDE is None:
+        return lambda day: fixed
+
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        logger.warning("NumPy is not available; using the fixed schedule")
+        return lambda day: fixed
+
+    schedules = SolarSchedules(LATITUDE, LONGITUDE)
+    logger.info("Starting the descent at sunset (%s)", schedules.sunset(date.today()))
+    return schedules
+
+
+async def set_filter(controller: HyprsunsetController, temp: int | None) -> None:
+    """Set the filter based on the given temperature."""
+    if temp is not None:
+        if temp != controller.temperature:
+            logger.info("Setting temperature to %s", temp)
+        await controller.set_temperature(temp)
+
+    elif controller.running():
+        logger.info("No filter; stopping hyprsunset")
+        await controller.stop()
+
+
+async def blue_light_monitor(
+    schedules: Optional[Callable[[date], Schedule]] = None,
+) -> None:
+    """Keep the screen temperature on schedule, stopping hyprsunset on exit.
+
+    The wakeups are absolute wall-clock deadlines on the shared scheduler, so
+    time spent suspended counts, and setting the clock or resuming from
+    suspend re-reads the schedule right away.
+    """
+    if schedules is None:
+        schedules = open_schedules()
+    controller = HyprsunsetController()
+    logger.info("Filtering blue light...")
+    try:
+        while True:
+            # Always apply the entry for now, however long the sleep took
+            now = datetime.now()
+            schedule = schedules(now.date())
+            await set_filter(controller, schedule.temperature_at(now))
+            wakeup = schedule.next_wakeup(now)
+            publish_state(
+                "blue-light",
+                {
+                    "temperature": controller.temperature,
+                    "next_change": wakeup.isoformat(timespec="seconds"),
+                },
+            )
+            if not await SCHEDULER.sleep_until(
+                wakeup.timestamp(), SLACK, name="blue-light"
+            ):
+                logger.info("The clock changed; re-reading the schedule")
+    finally:
+        await controller.stop()
+
+
+async def main() -> None:
+    """Run the filter on its own until SIGTERM or SIGINT arrives."""
+    loop = asyncio.get_running_loop()
+    monitor = asyncio.create_task(blue_light_monitor())
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, monitor.cancel)
+    try:
+        await monitor
+    except asyncio.CancelledError:
+        pass
+    finally:
+        SCHEDULER.close()
+        await CHILDREN.shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
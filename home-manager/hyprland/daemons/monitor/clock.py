@@ -0,0 +1,27 @@
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+
+from scheduler import SCHEDULER
+from utils import update_eww
+
+logger = logging.getLogger("clock_monitor")
+
+TIME_FORMAT = "%a %_d.%_m. %k:%M"  # as `date "+%a %_d.%_m. %k:%M"`
+SLACK = 0.5  # seconds the displayed minute may change late
+
+
+async def clock_monitor() -> None:
+    """Publish the current time at the start of every minute."""
+    logger.info("Publishing the time...")
+    minutes = SCHEDULER.every(60, align=True, slack=SLACK, name="clock")
+    async with aclosing(minutes):
+        async for now in minutes:
+            update_eww(
+                {"current-time": time.strftime(TIME_FORMAT, time.localtime(now))}
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(clock_monitor())
@@ -0,0 +1,68 @@
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncIterator, Generic, TypeVar
+
+T = TypeVar("T")
+
+QUIET_PERIOD = 0.05  # seconds without events that end a burst
+MAX_DELAY = 0.2  # seconds after which a running burst is delivered anyway
+
+_CLOSED = object()
+
+
+@dataclass
+class DebounceStats:
+    """How many events were coalesced into how many bursts."""
+
+    events: int = 0
+    bursts: int = 0
+    largest_burst: int = 0
+
+
+class Debouncer(Generic[T]):
+    """Collapses bursts of events into lists delivered after a quiet period.
+
+    A burst ends once no event arrives for `quiet` seconds, but is delivered
+    at most `max_delay` seconds after its first event even if events keep
+    coming, so a held key still produces regular updates.
+    """
+
+    def __init__(self, quiet: float = QUIET_PERIOD, max_delay: float = MAX_DELAY):
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self.stats = DebounceStats()
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def put(self, event: T) -> None:
+        """Add an event to the current burst."""
+        self._queue.put_nowait(event)
+
+    def close(self) -> None:
+        """Deliver the pending burst and stop."""
+        self._queue.put_nowait(_CLOSED)
+
+    async def bursts(self) -> AsyncIterator[list[T]]:
+        """Yield the events of each burst, in arrival order."""
+        loop = asyncio.get_running_loop()
+        closed = False
+        while not closed:
+            event = await self._queue.get()
+            if event is _CLOSED:
+                return
+
+            burst = [event]
+            deadline = loop.time() + self.max_delay
+            while (timeout := min(self.quiet, deadline - loop.time())) > 0:
+                try:
+                    event = await asyncio.wait_for(self._queue.get(), timeout)
+                except TimeoutError:
+                    break
+                if event is _CLOSED:
+                    closed = True
+                    break
+                burst.append(event)
+
+            self.stats.events += len(burst)
+            self.stats.bursts += 1
+            self.stats.largest_burst = max(self.stats.largest_burst, len(burst))
+            yield burst
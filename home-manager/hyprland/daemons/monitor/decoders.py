@@ -0,0 +1,62 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Generic, Optional, TypeVar, Union
+
+from metrics import VALIDATION_TIME
+from pydantic import TypeAdapter
+
+T = TypeVar("T")
+
+
+@dataclass
+class DecoderStats:
+    """How many payloads were validated and how many were served from cache."""
+
+    validated: int = 0
+    cached: int = 0
+
+
+class Decoder(Generic[T]):
+    """Validates payloads with a prebuilt TypeAdapter.
+
+    JSON is parsed straight from bytes by pydantic-core. A JSON payload that
+    is byte-identical to the previous one returns the previous result without
+    being parsed again, so callers must treat decoded values as read-only.
+    The previous payload is kept and compared directly: for payloads of a few
+    kilobytes a memcmp is far cheaper than hashing them.
+    """
+
+    def __init__(self, adapter: TypeAdapter[T], name: str = "payload"):
+        self.adapter = adapter
+        self.name = name
+        self.stats = DecoderStats()
+        self._payload: Optional[bytes] = None
+        self._value: Optional[T] = None
+
+    def decode(self, payload: Union[bytes, str, Any]) -> T:
+        """Decode raw JSON, or validate already parsed Python data."""
+        started = time.perf_counter()
+        if isinstance(payload, str):
+            payload = payload.encode()
+        if not isinstance(payload, (bytes, bytearray, memoryview)):
+            value = self.adapter.validate_python(payload)
+            self._observe("validated", started)
+            return value
+
+        if payload == self._payload:
+            self._observe("cached", started)
+            return self._value  # type: ignore
+
+        value = self.adapter.validate_json(payload)
+        self._payload, self._value = bytes(payload), value
+        self._observe("validated", started)
+        return value
+
+    def _observe(self, result: str, started: float) -> None:
+        if result == "cached":
+            self.stats.cached += 1
+        else:
+            self.stats.validated += 1
+        VALIDATION_TIME.observe(
+            time.perf_counter() - started, model=self.name, result=result
+        )
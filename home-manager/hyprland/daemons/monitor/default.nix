@@ -3,9 +3,13 @@
 pkgs.mkShell {
   buildInputs = [
     pkgs.python312
-    (pkgs.python312.withPackages (ps: [ ps.pydantic ]))
+    (pkgs.python312.withPackages (ps: [ ps.pydantic ps.jeepney ps.grpcio ps.numpy ]))
+    pkgs.libpulseaudio
+    pkgs.util-linux # setpriv, for the children's parent-death signal
   ];
 
+  LD_LIBRARY_PATH = "${pkgs.libpulseaudio}/lib";
+
   shellHook = ''
     python3.12 ~/.config/hypr/daemons/monitor/sysmonitor.py > ~/.local/share/sysmonitor.log.txt
     exit 0
@@ -0,0 +1,78 @@
+"""Stand-in sound server for the audio monitor.
+
+Plays a script of events and device changes, so the audio monitor can be
+exercised without PipeWire or PulseAudio in tests/test_audio.py.
+"""
+
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set
+
+from audio_backends import DEVICE_TYPES, AudioEvent
+
+
+@dataclass
+class ScriptStep:
+    """One scripted change of a FakeAudioBackend.
+
+    `device` replaces the description of the event's device before the event
+    is delivered (a `remove` event deletes it), `defaults` replaces the
+    default device names.
+    """
+
+    delay: float
+    event: AudioEvent
+    device: Optional[dict] = None
+    defaults: Optional[Dict[str, str]] = None
+
+
+class FakeAudioBackend:
+    """Scripted backend for exercising the audio monitor without a sound server.
+
+    Plays `script` once when subscribed and counts the queries it answers.
+    """
+
+    def __init__(
+        self,
+        devices: Dict[str, List[dict]],
+        defaults: Dict[str, str],
+        script: List[ScriptStep],
+    ):
+        self.devices = {
+            device_type: {device["index"]: device for device in devices[device_type]}
+            for device_type in DEVICE_TYPES
+        }
+        self.defaults = dict(defaults)
+        self.script = script
+        self.queries: Counter[str] = Counter()
+
+    async def get_defaults(self) -> Dict[str, str]:
+        self.queries["defaults"] += 1
+        return dict(self.defaults)
+
+    async def list_devices(
+        self, device_type: str, indexes: Optional[Set[int]] = None
+    ) -> List[dict]:
+        self.queries[device_type] += 1
+        return [
+            device
+            for index, device in self.devices[device_type].items()
+            if indexes is None or index in indexes
+        ]
+
+    async def subscribe(self, on_event: Callable[[AudioEvent], None]) -> None:
+        for step in self.script:
+            await asyncio.sleep(step.delay)
+            event = step.event
+            if event.facility in DEVICE_TYPES:
+                if event.kind == "remove":
+                    self.devices[event.facility].pop(event.index, None)
+                elif step.device is not None:
+                    self.devices[event.facility][event.index] = step.device
+            if step.defaults is not None:
+                self.defaults = dict(step.defaults)
+            on_event(event)
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Stand-in Mullvad daemon serving the management interface on a unix socket.
+
+Replays tunnel state transitions so the gRPC client can be exercised without
+a Mullvad installation:
+
+    python3 fake_mullvad.py /tmp/mullvad-vpn
+"""
+
+import asyncio
+import logging
+import sys
+from dataclasses import dataclass
+from typing import List, Optional
+
+import grpc
+import protobuf_wire as wire
+from mullvad_rpc import SERVICE, encode_daemon_event, encode_tunnel_state
+from vpn import (
+    ConnectedDetails,
+    ConnectedStatus,
+    ConnectingStatus,
+    DisconnectedDetails,
+    DisconnectedStatus,
+    DisconnectingStatus,
+    Endpoint,
+    ErrorCause,
+    ErrorDetails,
+    ErrorStatus,
+    Location,
+    MullvadStatus,
+)
+
+logger = logging.getLogger("fake_mullvad")
+
+SETTINGS_EVENT = wire.encode([(2, b"")])  # a DaemonEvent clients should skip
+
+
+@dataclass
+class Transition:
+    """A state change after `delay` seconds; no status sends a settings event."""
+
+    delay: float
+    status: Optional[MullvadStatus]
+
+
+GOTHENBURG = Location(
+    ipv4="185.213.154.69",
+    ipv6=None,
+    country="Sweden",
+    city="Gothenburg",
+    latitude=57.70887,
+    longitude=11.97456,
+    mullvad_exit_ip=True,
+    hostname="se-got-wg-001",
+    bridge_hostname=None,
+    entry_hostname=None,
+    obfuscator_hostname=None,
+)
+DISCONNECTED = DisconnectedStatus(
+    state="disconnected",
+    details=DisconnectedDetails(location=None, locked_down=False),
+)
+CONNECTED = ConnectedStatus(
+    state="connected",
+    details=ConnectedDetails(
+        endpoint=Endpoint(
+            address="185.213.154.66:51820",
+            protocol="udp",
+            tunnel_type="wireguard",
+            quantum_resistant=True,
+            proxy=None,
+            obfuscation=None,
+            entry_endpoint=None,
+            tunnel_interface="wg0-mullvad",
+            daita=False,
+        ),
+        location=GOTHENBURG,
+        feature_indicators=["QuantumResistance"],
+    ),
+)
+DEFAULT_TRANSITIONS = [
+    Transition(1, ConnectingStatus(state="connecting")),
+    Transition(0.5, CONNECTED),
+    Transition(2, None),
+    Transition(1, DisconnectingStatus(state="disconnecting")),
+    Transition(0.2, DISCONNECTED),
+    Transition(0.1, CONNECTED),  # recovers right after a disconnect
+    Transition(
+        2,
+        ErrorStatus(
+            state="error",
+            details=ErrorDetails(
+                cause=ErrorCause(reason="is_offline"), block_failure=None
+            ),
+        ),
+    ),
+    Transition(1, DISCONNECTED),
+]
+
+
+class FakeManagementService:
+    """Management interface answering GetTunnelState and EventsListen.
+
+    Starts in `initial` and replays `transitions` to every subscriber,
+    forever if `repeat` is set. Counts the calls it answers.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        transitions: List[Transition] = DEFAULT_TRANSITIONS,
+        initial: MullvadStatus = DISCONNECTED,
+        repeat: bool = False,
+    ):
+        self.socket_path = socket_path
+        self.transitions = transitions
+        self.state = initial
+        self.repeat = repeat
+        self.queries = 0
+        self.subscriptions = 0
+        self._subscribers: List[asyncio.Queue] = []
+        self._server: Optional[grpc.aio.Server] = None
+        self._replay: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        handler = grpc.method_handlers_generic_handler(
+            SERVICE,
+            {
+                "GetTunnelState": grpc.unary_unary_rpc_method_handler(
+                    self._get_tunnel_state, response_serializer=encode_tunnel_state
+                ),
+                "EventsListen": grpc.unary_stream_rpc_method_handler(
+                    self._events_listen
+                ),
+            },
+        )
+        self._server = grpc.aio.server()
+        self._server.add_generic_rpc_handlers((handler,))
+        self._server.add_insecure_port(f"unix:{self.socket_path}")
+        await self._server.start()
+        self._replay = asyncio.create_task(self._play())
+        logger.info("Serving on %s", self.socket_path)
+
+    async def stop(self) -> None:
+        if self._replay is not None:
+            self._replay.cancel()
+            await asyncio.gather(self._replay, return_exceptions=True)
+        if self._server is not None:
+            await self._server.stop(grace=None)
+
+    async def __aenter__(self) -> "FakeManagementService":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.stop()
+
+    async def _play(self) -> None:
+        while True:
+            for transition in self.transitions:
+                await asyncio.sleep(transition.delay)
+                if transition.status is None:
+                    event = SETTINGS_EVENT
+                else:
+                    self.state = transition.status
+                    event = encode_daemon_event(transition.status)
+                    logger.info("State: %s", transition.status.state)
+                for subscriber in self._subscribers:
+                    subscriber.put_nowait(event)
+            if not self.repeat:
+                return
+
+    async def _get_tunnel_state(self, _request: bytes, _context) -> MullvadStatus:
+        self.queries += 1
+        return self.state
+
+    async def _events_listen(self, _request: bytes, _context):
+        self.subscriptions += 1
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.remove(queue)
+
+
+async def main(socket_path: str) -> None:
+    async with FakeManagementService(socket_path, repeat=True):
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "/tmp/mullvad-vpn"))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Fake org.freedesktop.Notifications service on a private D-Bus bus.
+
+Lets the notification backend be exercised without a desktop session:
+
+    python3 fake_notifyd.py
+    DBUS_SESSION_BUS_ADDRESS=<printed address> python3 sysmonitor.py
+"""
+
+import logging
+import subprocess
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from jeepney import HeaderFields, MessageType, new_error, new_method_return
+from jeepney.bus_messages import message_bus
+from jeepney.io.blocking import DBusConnection, open_dbus_connection
+
+logger = logging.getLogger("fake_notifyd")
+
+BUS_NAME = "org.freedesktop.Notifications"
+INTERFACE = "org.freedesktop.Notifications"
+
+
+@dataclass
+class ReceivedNotification:
+    """A notification received by the fake service."""
+
+    id: int
+    replaces_id: int
+    app_name: str
+    summary: str
+    body: str
+    hints: dict
+    timeout: int
+
+
+class FakeNotificationService:
+    """Notification server running on its own private bus.
+
+    Starts a dedicated `dbus-daemon`, claims org.freedesktop.Notifications on
+    it and records every Notify call. Point clients at `address`.
+    """
+
+    def __init__(self):
+        self.address: Optional[str] = None
+        self.notifications: list[ReceivedNotification] = []
+        self._bus_process: Optional[subprocess.Popen] = None
+        self._connection: Optional[DBusConnection] = None
+        self._thread: Optional[threading.Thread] = None
+        self._next_id = 1
+
+    def start(self) -> str:
+        """Start the private bus and the service; return the bus address."""
+        self._bus_process = subprocess.Popen(
+            ["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.address = self._bus_process.stdout.readline().strip()  # type: ignore
+
+        self._connection = open_dbus_connection(self.address)
+        self._connection.send_and_get_reply(message_bus.RequestName(BUS_NAME))
+
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self.address
+
+    def stop(self) -> None:
+        """Stop the service and its private bus."""
+        if self._bus_process is not None:
+            self._bus_process.terminate()
+            self._bus_process.wait()
+            self._bus_process = None
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self) -> "FakeNotificationService":
+        self.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+    def _serve(self) -> None:
+        connection = self._connection
+        while connection is not None:
+            try:
+                message = connection.receive()
+            except (OSError, ValueError):
+                return
+
+            header = message.header
+            if header.message_type != MessageType.method_call:
+                continue
+
+            if header.fields.get(HeaderFields.interface) != INTERFACE:
+                continue
+
+            connection.send(
+                self._handle(message, header.fields.get(HeaderFields.member))
+            )
+
+    def _handle(self, message, member: Optional[str]):
+        if member == "Notify":
+            app_name, replaces_id, _, summary, body, _, hints, timeout = message.body
+            notification_id = replaces_id or self._next_id
+            if not replaces_id:
+                self._next_id += 1
+
+            self.notifications.append(
+                ReceivedNotification(
+                    notification_id,
+                    replaces_id,
+                    app_name,
+                    summary,
+                    body,
+                    hints,
+                    timeout,
+                )
+            )
+            logger.info("Notify #%s: %s - %s", notification_id, summary, body)
+            return new_method_return(message, "u", (notification_id,))
+
+        if member == "GetCapabilities":
+            return new_method_return(message, "as", (["body"],))
+
+        if member == "GetServerInformation":
+            return new_method_return(
+                message, "ssss", ("fake_notifyd", "sysmonitor", "0", "1.2")
+            )
+
+        if member == "CloseNotification":
+            return new_method_return(message)
+
+        return new_error(message, "org.freedesktop.DBus.Error.UnknownMethod")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    service = FakeNotificationService()
+    print(service.start(), flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
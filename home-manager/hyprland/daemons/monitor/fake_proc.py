@@ -0,0 +1,58 @@
+"""Stand-in /proc and /sys trees for the storage monitor.
+
+Copies fixtures/ into a temporary directory and advances the disk counters
+on demand, so disk throughput can be exercised deterministically in
+tests/test_storage.py.
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+from storage import SECTOR_SIZE
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+class FakeProc:
+    """Temporary copy of the fixture trees with writable disk counters.
+
+    `proc_root` and `sys_root` can be handed to the storage monitor in place
+    of /proc and /sys. The diskstats file is rewritten in place, so readers
+    holding it open see the new counters, just like with the real file.
+    """
+
+    def __init__(self, fixtures: Path = FIXTURES):
+        self._dir = tempfile.TemporaryDirectory(prefix="fake_proc-")
+        self.root = Path(self._dir.name)
+        shutil.copytree(fixtures, self.root, dirs_exist_ok=True)
+        self.proc_root = self.root / "proc"
+        self.sys_root = self.root / "sys"
+
+    @property
+    def diskstats(self) -> Path:
+        return self.proc_root / "diskstats"
+
+    def advance(self, disk: str, read_bytes: int = 0, written_bytes: int = 0) -> None:
+        """Account extra reads and writes to a device."""
+        lines = []
+        for line in self.diskstats.read_text().splitlines():
+            fields = line.split()
+            if fields[2] == disk:
+                fields[5] = str(int(fields[5]) + read_bytes // SECTOR_SIZE)
+                fields[9] = str(int(fields[9]) + written_bytes // SECTOR_SIZE)
+                line = " ".join(fields)
+            lines.append(line)
+
+        with open(self.diskstats, "r+") as diskstats:
+            diskstats.write("\n".join(lines) + "\n")
+            diskstats.truncate()
+
+    def close(self) -> None:
+        self._dir.cleanup()
+
+    def __enter__(self) -> "FakeProc":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,301 @@
+"""Latency and cost metrics of the monitors, in the Prometheus text format.
+
+Served over HTTP on a unix socket, so they can be scraped or read with
+
+    curl --unix-socket $XDG_RUNTIME_DIR/sysmonitor-metrics.sock http://localhost/metrics
+
+Work is attributed to the monitor running it through CURRENT_MONITOR, which
+the supervisor sets for each monitor's task and asyncio copies into every
+task and callback the monitor starts.
+"""
+
+import abc
+import asyncio
+import logging
+import math
+import os
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("metrics")
+
+SOCKET_PATH = (
+    Path(os.environ.get("XDG_RUNTIME_DIR", "/tmp")) / "sysmonitor-metrics.sock"
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)  # seconds
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5)
+VALIDATION_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 5e-3, 0.01)
+
+CURRENT_MONITOR: ContextVar[str] = ContextVar("monitor", default="sysmonitor")
+
+Labels = Tuple[str, ...]
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = (f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    @abc.abstractmethod
+    def samples(self) -> Iterator[str]:
+        """The sample lines of the metric, without the HELP and TYPE header."""
+
+    def render(self) -> str:
+        header = (
+            f"# HELP {self.name} {self.description}\n# TYPE {self.name} {self.kind}\n"
+        )
+        return header + "".join(f"{sample}\n" for sample in self.samples())
+
+
+class Counter(Metric):
+    """A value that only goes up, e.g. the number of spawned processes."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        super().__init__(name, description, labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self.values.items()):
+            labels = format_labels(self.label_names, key)
+            yield f"{self.name}{labels} {format_value(value)}"
+
+
+class Gauge(Metric):
+    """A value read when the metrics are rendered, e.g. running processes."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self.function: Callable[[], float] = lambda: 0
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.function = function
+
+    def samples(self) -> Iterator[str]:
+        yield f"{self.name} {format_value(self.function())}"
+
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DURATION_BUCKETS,
+    ):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.counts: Dict[Labels, List[int]] = {}  # per bucket, not cumulative
+        self.sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self.counts.setdefault(key, [0] * (len(self.buckets) + 1))
+        index = next(
+            (i for i, bound in enumerate(self.buckets) if value <= bound),
+            len(self.buckets),
+        )
+        counts[index] += 1
+        self.sums[key] = self.sums.get(key, 0) + value
+
+    def samples(self) -> Iterator[str]:
+        names = (*self.label_names, "le")
+        for key, counts in sorted(self.counts.items()):
+            total = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                total += count
+                labels = format_labels(names, (*key, format_value(bound)))
+                yield f"{self.name}_bucket{labels} {total}"
+            labels = format_labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {format_value(self.sums[key])}"
+            yield f"{self.name}_count{labels} {total}"
+
+
+class Registry:
+    """The metrics rendered together on one page."""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def counter(
+        self, name: str, description: str, labels: Sequence[str] = ()
+    ) -> Counter:
+        counter = Counter(name, description, labels)
+        self.metrics.append(counter)
+        return counter
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        gauge = Gauge(name, description)
+        self.metrics.append(gauge)
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DURATION_BUCKETS,
+    ) -> Histogram:
+        histogram = Histogram(name, description, labels, buckets)
+        self.metrics.append(histogram)
+        return histogram
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self.metrics)
+
+
+METRICS = Registry()
+
+EVENT_LATENCY = METRICS.histogram(
+    "sysmonitor_event_to_publish_seconds",
+    "Time from a monitor noticing a change to eww receiving it.",
+    ["monitor"],
+    LATENCY_BUCKETS,
+)
+SUBPROCESS_SPAWNS = METRICS.counter(
+    "sysmonitor_subprocess_spawns_total",
+    "Subprocesses started.",
+    ["monitor", "command"],
+)
+SUBPROCESS_DURATION = METRICS.histogram(
+    "sysmonitor_subprocess_duration_seconds",
+    "Wall time from spawning a subprocess to reaping it.",
+    ["monitor", "command"],
+)
+VALIDATION_TIME = METRICS.histogram(
+    "sysmonitor_validation_seconds",
+    "Time spent decoding and validating payloads.",
+    ["model", "result"],
+    VALIDATION_BUCKETS,
+)
+EWW_UPDATES = METRICS.counter(
+    "sysmonitor_eww_updates_total",
+    "Batches of eww variables published.",
+    ["mode", "result"],
+)
+EWW_VARIABLES = METRICS.counter(
+    "sysmonitor_eww_variables_total",
+    "Eww variable changes published.",
+    ["monitor"],
+)
+NOTIFICATIONS_SENT = METRICS.counter(
+    "sysmonitor_notifications_total",
+    "Desktop notifications sent.",
+    ["monitor", "transport"],
+)
+CHILDREN_RUNNING = METRICS.gauge(
+    "sysmonitor_children",
+    "Child processes started and not yet reaped.",
+)
+CHILDREN_ZOMBIES = METRICS.gauge(
+    "sysmonitor_zombie_children",
+    "Child processes that exited and were not reaped.",
+)
+CHILDREN_KILLED = METRICS.counter(
+    "sysmonitor_children_killed_total",
+    "Child processes that ignored SIGTERM and were killed.",
+    ["monitor", "command"],
+)
+CHILDREN_LEAKED = METRICS.counter(
+    "sysmonitor_children_leaked_total",
+    "Process groups of children left alive after the child was reaped.",
+    ["monitor", "command"],
+)
+RESTARTS = METRICS.counter(
+    "sysmonitor_monitor_restarts_total",
+    "Monitor runs that ended and were restarted.",
+    ["monitor", "outcome"],
+)
+
+
+def current_monitor() -> str:
+    return CURRENT_MONITOR.get()
+
+
+class MetricsServer:
+    """Minimal HTTP/1.0 server answering GET /metrics on a unix socket."""
+
+    def __init__(self, registry: Registry = METRICS, path: Path = SOCKET_PATH):
+        self.registry = registry
+        self.path = path
+        self._server: Optional[asyncio.Server] = None
+
+    async def start(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(self._serve, self.path)
+        logger.info("Serving metrics on %s", self.path)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        self.path.unlink(missing_ok=True)
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request = (await reader.readline()).decode(errors="replace").split()
+            while (await reader.readline()).strip():
+                pass  # headers
+            if (
+                len(request) >= 2
+                and request[0] == "GET"
+                and request[1]
+                in (
+                    "/",
+                    "/metrics",
+                )
+            ):
+                status, content_type = "200 OK", CONTENT_TYPE
+                body = self.registry.render().encode()
+            else:
+                status, content_type = "404 Not Found", "text/plain"
+                body = b"Not found\n"
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import subprocess
+from typing import Optional
+
+from jeepney import DBusAddress, DBusErrorResponse, HeaderFields, new_method_call
+from jeepney.io.asyncio import DBusConnection, open_dbus_connection
+from jeepney.wrappers import unwrap_msg
+from metrics import NOTIFICATIONS_SENT, current_monitor
+from processes import run_command
+
+logger = logging.getLogger("notifications")
+
+APP_NAME = "sysmonitor"
+NOTIFY_TIMEOUT = 2  # seconds to wait for the notification daemon
+URGENCY_LEVELS = {"low": 0, "normal": 1, "critical": 2}
+
+NOTIFICATIONS = DBusAddress(
+    "/org/freedesktop/Notifications",
+    bus_name="org.freedesktop.Notifications",
+    interface="org.freedesktop.Notifications",
+)
+
+
+class Notifier:
+    """Notification client talking to org.freedesktop.Notifications directly.
+
+    A single session-bus connection is kept open for the lifetime of the
+    daemon. Notifications sent with the same tag reuse the id returned by the
+    previous one as `replaces_id`, so the bubble is updated in place instead
+    of stacking. If the bus is unavailable, `notify-send` is used instead.
+    Notifications are delivered in the background so a stuck notification
+    daemon never stalls the caller.
+    """
+
+    def __init__(self, bus: str = "SESSION"):
+        self.bus = bus
+        self._connection: Optional[DBusConnection] = None
+        self._replaces: dict[str, int] = {}
+        self._lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+
+    def notify(
+        self, urgency: str, timeout: int, title: str, body: str, tag: Optional[str]
+    ) -> None:
+        """Queue a notification, replacing the previous one with the same tag."""
+        task = asyncio.create_task(self._notify(urgency, timeout, title, body, tag))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _notify(
+        self, urgency: str, timeout: int, title: str, body: str, tag: Optional[str]
+    ) -> None:
+        async with self._lock:
+            try:
+                notification_id = await asyncio.wait_for(
+                    self._notify_dbus(urgency, timeout, title, body, tag),
+                    NOTIFY_TIMEOUT,
+                )
+            except (
+                DBusErrorResponse,
+                EOFError,
+                KeyError,
+                OSError,
+                TimeoutError,
+                ValueError,
+            ) as e:
+                logger.warning("D-Bus notification failed, using notify-send: %s", e)
+                await self.close()
+                await notify_send(urgency, timeout, title, body)
+                NOTIFICATIONS_SENT.inc(
+                    monitor=current_monitor(), transport="notify-send"
+                )
+                return
+
+            NOTIFICATIONS_SENT.inc(monitor=current_monitor(), transport="dbus")
+            if tag is not None:
+                self._replaces[tag] = notification_id
+
+    async def _notify_dbus(
+        self, urgency: str, timeout: int, title: str, body: str, tag: Optional[str]
+    ) -> int:
+        if self._connection is None:
+            self._connection = await open_dbus_connection(self.bus)
+
+        message = new_method_call(
+            NOTIFICATIONS,
+            "Notify",
+            "susssasa{sv}i",
+            (
+                APP_NAME,
+                self._replaces.get(tag, 0) if tag is not None else 0,
+                "",
+                title,
+                body,
+                [],
+                {"urgency": ("y", URGENCY_LEVELS.get(urgency, 1))},
+                timeout,
+            ),
+        )
+        serial = next(self._connection.outgoing_serial)
+        await self._connection.send(message, serial=serial)
+
+        # Skip bus signals (e.g. NameAcquired) until our reply arrives
+        while True:
+            reply = await self._connection.receive()
+            if reply.header.fields.get(HeaderFields.reply_serial) == serial:
+                return unwrap_msg(reply)[0]
+
+    async def close(self) -> None:
+        """Close the bus connection; it is reopened on the next notification."""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            try:
+                await connection.close()
+            except OSError:
+                pass
+
+    async def drain(self) -> None:
+        """Wait for queued notifications and close the connection."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.close()
+
+
+async def notify_send(urgency: str, timeout: int, title: str, body: str) -> None:
+    """Send a notification using notify-send."""
+    try:
+        await run_command(
+            ["notify-send", "-u", urgency, "-t", str(timeout), title, body],
+            timeout=NOTIFY_TIMEOUT,
+        )
+    except (OSError, subprocess.CalledProcessError, TimeoutError) as e:
+        logger.error("Error sending notification %r: %s", title, e)
+
+
+NOTIFIER = Notifier()
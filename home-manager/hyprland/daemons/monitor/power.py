@@ -1,39 +1,33 @@
+import asyncio
 import logging
 import time
-from dataclasses import dataclass
-from enum import Enum
+from dataclasses import asdict
 from pathlib import Path
 from typing import Optional, Tuple
 
-from utils import send_notification, update_eww
+from adaptive_polling import AdaptivePoller, PollingPolicy
+from battery import POWER_SUPPLY_DIR, BatteryReader, BatteryState, BatteryStatus
+from battery_history import HISTORY_FILE, BatteryHistory
+from scheduler import SCHEDULER
+from uevents import UeventSource, open_uevent_source, wait_for_subsystem
+from utils import provide_state, publish_state, send_notification, update_eww
 
 logger = logging.getLogger("power_monitor")
 
-BAT_DIR = Path("/sys/class/power_supply/BAT0/")
-STATUS_FILE = BAT_DIR / "status"
-CAPACITY_FILE = BAT_DIR / "capacity"
-POWER_NOW_FILE = BAT_DIR / "power_now"
-ENERGY_NOW_FILE = BAT_DIR / "energy_now"
-ENERGY_FULL_FILE = BAT_DIR / "energy_full"
 SCRIPT_DIR = Path(__file__).parent.resolve()
 EWW_CONFIG = Path("~/Config-Files/hyprland/eww").expanduser()
 
+LOW_CAPACITY = 20  # percent
+CRITICAL_CAPACITY = 10  # percent
+FULL_CAPACITY = 85  # percent
+FULL_RESET_CAPACITY = 80  # percent
 
-class BatteryState(Enum):
-    CHARGING = "Charging"
-    DISCHARGING = "Discharging"
-    FULL = "Full"
-    NOT_CHARGING = "Not charging"
-    UNKNOWN = "Unknown"
-
-
-@dataclass
-class BatteryStatus:
-    state: BatteryState
-    capacity: int
-    power_now: int
-    energy_now: int
-    energy_full: int
+USE_UEVENTS = True  # re-read the battery as soon as the kernel reports a change
+ERROR_DELAY = 5  # seconds
+POLLING_POLICY = PollingPolicy(
+    discharge_thresholds=(LOW_CAPACITY, CRITICAL_CAPACITY),
+    charge_thresholds=(FULL_CAPACITY,),
+)
 
 
 class NotificationManager:
@@ -57,7 +51,7 @@ class NotificationManager:
     ) -> None:
         """Send notification if cooldown period has passed"""
         if self.can_send_notification():
-            send_notification(urgency, timeout, title, message)
+            send_notification(urgency, timeout, title, message, tag="battery")
             self.last_notification_time = time.time()
             logger.info("Notification sent: %s - %s", title, message)
 
@@ -90,7 +84,10 @@ class NotificationManager:
         if current_status.state != BatteryState.DISCHARGING:
             return
 
-        if current_status.capacity <= 10 and not self.critical_battery_notified:
+        if (
+            current_status.capacity <= CRITICAL_CAPACITY
+            and not self.critical_battery_notified
+        ):
             self.send_notification_with_cooldown(
                 "critical",
                 20000,
@@ -99,7 +96,7 @@ class NotificationManager:
             )
             self.critical_battery_notified = True
             self.low_battery_notified = True
-        elif current_status.capacity <= 20 and not self.low_battery_notified:
+        elif current_status.capacity <= LOW_CAPACITY and not self.low_battery_notified:
             self.send_notification_with_cooldown(
                 "normal",
                 10000,
@@ -107,14 +104,14 @@ class NotificationManager:
                 f"Battery is at {current_status.capacity}%",
             )
             self.low_battery_notified = True
-        elif current_status.capacity > 20:
+        elif current_status.capacity > LOW_CAPACITY:
             self.low_battery_notified = False
             self.critical_battery_notified = False
 
     def handle_full_battery(self, current_status: BatteryStatus) -> None:
         """Handle notifications for full or near-full battery"""
         if (
-            current_status.capacity >= 85
+            current_status.capacity >= FULL_CAPACITY
             and current_status.state == BatteryState.CHARGING
             and not self.full_battery_notified
         ):
@@ -125,7 +122,7 @@ class NotificationManager:
                 f"Current capacity: {current_status.capacity}%",
             )
             self.full_battery_notified = True
-        elif current_status.capacity < 80:
+        elif current_status.capacity < FULL_RESET_CAPACITY:
             self.full_battery_notified = False
 
     def update(self, current_status: BatteryStatus) -> None:
@@ -136,10 +133,6 @@ class NotificationManager:
         self.prev_status = current_status
 
 
-def read_file(file_path: Path) -> str:
-    return file_path.read_text().strip()
-
-
 def prepend_zero_if_single_digit(number: int) -> str:
     return f"0{number}" if 0 <= number <= 9 else str(number)
 
@@ -156,22 +149,29 @@ def format_time(hours: int, minutes: int) -> str:
     )
 
 
-def get_status_report(status: BatteryStatus) -> str:
-    power_watts = status.power_now / 1_000_000  # Convert microwatts to watts
+def get_status_report(status: BatteryStatus, power_draw: Optional[int] = None) -> str:
+    """Format the battery status for eww.
+
+    Args:
+        status (BatteryStatus): current battery status
+        power_draw (Optional[int]): smoothed draw in µW to use instead of `power_now`
+    """
+    power_now = power_draw if power_draw else status.power_now
+    power_watts = power_now / 1_000_000  # Convert microwatts to watts
 
     if status.state == BatteryState.CHARGING:
-        if status.power_now == 0:
+        if power_now == 0:
             return f"{status.state.value}, {status.capacity}%"
         hours, minutes = calculate_remaining_time(
-            status.energy_full - status.energy_now, status.power_now
+            status.energy_full - status.energy_now, power_now
         )
         time_formatted = format_time(hours, minutes)
         return f"{status.state.value}, {time_formatted} to fully charged, {status.capacity}%, +{power_watts:.2f}W"
 
     elif status.state == BatteryState.DISCHARGING:
-        if status.power_now == 0:
+        if power_now == 0:
             return f"{status.state.value}, {status.capacity}%"
-        hours, minutes = calculate_remaining_time(status.energy_now, status.power_now)
+        hours, minutes = calculate_remaining_time(status.energy_now, power_now)
         time_formatted = format_time(hours, minutes)
         return f"{status.state.value}, {time_formatted} remaining, {status.capacity}%, -{power_watts:.2f}W"
 
@@ -179,34 +179,119 @@ def get_status_report(status: BatteryStatus) -> str:
         return f"{status.state.value}, {status.capacity}%, {power_watts:.2f}W"
 
 
-def read_battery_status() -> BatteryStatus:
-    """Read current battery status from system files"""
-    return BatteryStatus(
-        state=BatteryState(read_file(STATUS_FILE)),
-        capacity=int(read_file(CAPACITY_FILE)),
-        power_now=int(read_file(POWER_NOW_FILE)),
-        energy_now=int(read_file(ENERGY_NOW_FILE)),
-        energy_full=int(read_file(ENERGY_FULL_FILE)),
-    )
-
-
-def power_monitor() -> None:
+def open_history(path: Path = HISTORY_FILE) -> Optional[BatteryHistory]:
+    """Open the persistent battery history, or return None if it is unavailable."""
+    try:
+        return BatteryHistory(path)
+    except (OSError, ValueError) as e:
+        logger.warning("Battery history unavailable: %s", e)
+        return None
+
+
+def energy_report(history: BatteryHistory) -> dict:
+    """Energy drained this discharge session and on each day in the history."""
+    return {
+        "session_started": history.session_start(),
+        "session_energy_used": history.session_energy_used(),
+        "daily_energy_used": {
+            day.isoformat(): used
+            for day, used in sorted(history.daily_energy_used().items())
+        },
+    }
+
+
+async def wait_for_change(events: Optional[UeventSource], timeout: float) -> str:
+    """Wait until the battery state may have changed; return what woke us."""
+    timer = asyncio.create_task(SCHEDULER.sleep(timeout, name="power"))
+    if events is None:
+        await timer
+        return "timer"
+
+    change = asyncio.create_task(wait_for_subsystem(events, "power_supply"))
+    try:
+        await asyncio.wait([timer, change], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        timer.cancel()
+        change.cancel()
+    return "uevent" if change.done() and not change.cancelled() else "timer"
+
+
+async def power_monitor(
+    events: Optional[UeventSource] = None,
+    policy: PollingPolicy = POLLING_POLICY,
+    power_supply_dir: Path = POWER_SUPPLY_DIR,
+    history_file: Path = HISTORY_FILE,
+) -> None:
+    """Monitor the battery, re-reading it on power_supply uevents.
+
+    Between uevents the battery is polled at an adaptive interval.
+
+    Args:
+        events (Optional[UeventSource]): uevent source to use instead of the
+            kernel netlink socket, e.g. a FakeUeventSource
+        policy (PollingPolicy): bounds of the adaptive polling interval
+        power_supply_dir (Path): where to look for batteries, e.g. a fake sysfs
+        history_file (Path): where the battery history is kept
+    """
     logger.info("Monitoring for power changes...")
     notification_manager = NotificationManager()
+    battery = BatteryReader(power_supply_dir)
+    poller = AdaptivePoller(policy)
+    history = open_history(history_file)
+    # Scanning the whole history takes tens of milliseconds, too much for
+    # every reading, so the energy figures are only computed when asked for
+    withdraw_energy = (
+        provide_state("battery-energy", lambda: energy_report(history))
+        if history is not None
+        else None
+    )
+
+    if events is None and USE_UEVENTS:
+        events = open_uevent_source()
 
-    while True:
-        try:
-            current_status = read_battery_status()
-            if current_status:
+    since: Optional[float] = None  # when the last wakeup happened
+    try:
+        while True:
+            try:
+                current_status = battery.read()
                 notification_manager.update(current_status)
-                status_report = get_status_report(current_status)
-                update_eww({"battery-info": status_report})
+
+                power_draw = None
+                if history is not None:
+                    history.append(current_status)
+                    power_draw = history.smoothed_draw()
+
+                status_report = get_status_report(current_status, power_draw)
+                update_eww({"battery-info": status_report}, since)
                 logger.info("Status report: %s", status_report)
-            time.sleep(1)
-        except Exception as e:  # pylint: disable=broad-except
-            logger.error("Error in monitor loop: %s", e)
-            time.sleep(5)
+
+                interval = poller.next_interval(current_status)
+                publish_state(
+                    "power",
+                    {
+                        **asdict(current_status),
+                        "state": current_status.state.value,
+                        "smoothed_draw": power_draw,
+                        "report": status_report,
+                        "next_read_in": interval,
+                    },
+                )
+                reason = await wait_for_change(events, interval)
+                since = time.monotonic()
+                poller.record_wakeup(reason, interval)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Error in monitor loop: %s", e)
+                await asyncio.sleep(ERROR_DELAY)
+
+    finally:
+        battery.close()
+        if withdraw_energy is not None:
+            withdraw_energy()
+        if history is not None:
+            history.close()
+        if events is not None:
+            events.close()
 
 
 if __name__ == "__main__":
-    power_monitor()
+    asyncio.run(power_monitor())
@@ -0,0 +1,353 @@
+"""Child processes of the daemon.
+
+Every subprocess is started through CHILDREN, which
+
+- puts it in a process group of its own, so stopping it also stops whatever
+  it started, and signals meant for the daemon's group do not reach it;
+- asks the kernel to send it SIGTERM when the daemon dies
+  (PR_SET_PDEATHSIG), so listeners do not outlive a daemon that was killed.
+  The daemon has threads (libpulse's mainloop, grpc), so no Python may run
+  in the forked child: util-linux's setpriv sets the signal and execs the
+  program instead. The extra exec makes a spawn slower, so short-lived
+  commands skip it;
+- watches it through a pidfd on the event loop and signals it through the
+  pidfd, which cannot hit a process that reused its PID. When the pidfd
+  reports the exit, the child is dropped and whatever is left of its
+  process group is killed; reaping stays with asyncio's child watcher;
+- stops, reaps and accounts for every child still running at shutdown.
+"""
+
+import asyncio
+import atexit
+import errno
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import time
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from metrics import (
+    CHILDREN_KILLED,
+    CHILDREN_LEAKED,
+    CHILDREN_RUNNING,
+    CHILDREN_ZOMBIES,
+    SUBPROCESS_DURATION,
+    SUBPROCESS_SPAWNS,
+    current_monitor,
+)
+
+logger = logging.getLogger("processes")
+
+STOP_TIMEOUT = 2  # seconds a child gets to exit after SIGTERM before SIGKILL
+ZOMBIE_SCAN_INTERVAL = 60  # seconds a count of zombies from /proc is reused
+PROC_ROOT = "/proc"
+SETPRIV = shutil.which("setpriv")
+
+
+def with_death_signal(cmd: List[str]) -> List[str]:
+    """Prefix a command with setpriv so it gets SIGTERM when the daemon dies.
+
+    The program is resolved here, so a missing one still raises
+    FileNotFoundError instead of making setpriv fail. Without setpriv the
+    command is returned unchanged.
+
+    Raises:
+        FileNotFoundError: the program is not on PATH
+    """
+    program = shutil.which(cmd[0])
+    if program is None:
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), cmd[0])
+    if SETPRIV is None:
+        logger.warning("setpriv not found; %s will outlive a killed daemon", cmd[0])
+        return cmd
+    return [SETPRIV, "--pdeathsig", "TERM", "--", program, *cmd[1:]]
+
+
+def process_stats(proc_root: str = PROC_ROOT) -> Iterator[Tuple[int, List[bytes]]]:
+    """PID and /proc/<pid>/stat fields after the command of every process.
+
+    The fields start with the state, the parent's PID and the process group.
+    """
+    for entry in os.scandir(proc_root):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(os.path.join(entry.path, "stat"), "rb") as stat:
+                # the command may contain spaces and parentheses
+                fields = stat.read().rsplit(b")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        yield int(entry.name), fields
+
+
+def count_zombies(parent: int, proc_root: str = PROC_ROOT) -> int:
+    """Number of children of `parent` that exited and were not reaped."""
+    return sum(
+        1
+        for _, fields in process_stats(proc_root)
+        if fields[0] == b"Z" and int(fields[1]) == parent
+    )
+
+
+def group_members(pgid: int, proc_root: str = PROC_ROOT) -> List[int]:
+    """PIDs of the live processes in a process group."""
+    return [
+        pid
+        for pid, fields in process_stats(proc_root)
+        if fields[0] != b"Z" and int(fields[2]) == pgid
+    ]
+
+
+def group_alive(pgid: int) -> bool:
+    """Whether any process is left in a process group."""
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@dataclass(eq=False)
+class Child:
+    command: str  # name of the program
+    monitor: str  # monitor that started it
+    process: asyncio.subprocess.Process
+    pidfd: Optional[int]
+    started: float  # monotonic
+
+
+@dataclass
+class ChildStats:
+    """Counters of the daemon's child processes."""
+
+    running: int = 0  # started and not yet reaped
+    spawned: int = 0
+    reaped: int = 0
+    killed: int = 0  # ignored SIGTERM and had to be killed
+    leaked: int = 0  # process groups left alive after their leader was reaped
+    zombies: int = 0  # exited children of the daemon that nobody reaped
+
+
+class ChildRegistry:
+    """Starts, watches and stops the daemon's child processes.
+
+    Must be used from within the running event loop.
+    """
+
+    def __init__(self):
+        self._children: Dict[int, Child] = {}
+        self._stats = ChildStats()
+        self._zombies_counted: Optional[float] = None  # monotonic
+        CHILDREN_RUNNING.set_function(lambda: len(self._children))
+        CHILDREN_ZOMBIES.set_function(self.zombies)
+
+    async def spawn(
+        self, cmd: List[str], die_with_daemon: bool = True, **kwargs
+    ) -> asyncio.subprocess.Process:
+        """Start a program like `asyncio.create_subprocess_exec`.
+
+        Args:
+            cmd (List[str]): program and its arguments
+            die_with_daemon (bool): send the child SIGTERM if the daemon dies
+            kwargs: passed on to `asyncio.create_subprocess_exec`, e.g. stdout
+
+        Raises:
+            OSError: the program could not be started
+        """
+        monitor = current_monitor()
+        command = os.path.basename(cmd[0])
+        if die_with_daemon:
+            cmd = with_death_signal(cmd)
+        process = await asyncio.create_subprocess_exec(*cmd, process_group=0, **kwargs)
+        SUBPROCESS_SPAWNS.inc(monitor=monitor, command=command)
+        self._stats.spawned += 1
+
+        child = Child(command, monitor, process, None, time.monotonic())
+        self._children[process.pid] = child
+        try:
+            child.pidfd = os.pidfd_open(process.pid)
+            asyncio.get_running_loop().add_reader(child.pidfd, self._forget, child)
+        except OSError as e:
+            # The child was reaped already, or the kernel has no pidfds
+            logger.debug("Not watching %s (%s): %s", command, process.pid, e)
+            asyncio.ensure_future(process.wait()).add_done_callback(
+                lambda _: self._forget(child)
+            )
+        return process
+
+    def _forget(self, child: Child) -> None:
+        """Drop a child that exited and stop what is left of its process group."""
+        if self._children.pop(child.process.pid, None) is None:
+            return
+        self._stats.reaped += 1
+        logger.debug(
+            "%s (%s) of %s exited after %.3f s",
+            child.command,
+            child.process.pid,
+            child.monitor,
+            time.monotonic() - child.started,
+        )
+        if child.pidfd is not None:
+            asyncio.get_running_loop().remove_reader(child.pidfd)
+            os.close(child.pidfd)
+            child.pidfd = None
+
+        # Zombies, including the leader until asyncio reaps it, still count
+        # as members, so an occupied group is confirmed by scanning /proc
+        if group_alive(child.process.pid) and group_members(child.process.pid):
+            self._stats.leaked += 1
+            CHILDREN_LEAKED.inc(monitor=child.monitor, command=child.command)
+            logger.warning(
+                "%s (%s) exited leaving its process group behind; killing it",
+                child.command,
+                child.process.pid,
+            )
+            with suppress(ProcessLookupError):
+                os.killpg(child.process.pid, signal.SIGKILL)
+
+    def _signal(self, process: asyncio.subprocess.Process, signum: int) -> None:
+        """Signal a child and the rest of its process group, each once."""
+        child = self._children.get(process.pid)
+        if child is None or child.pidfd is None:
+            # Without a pidfd, the group is the only safe way to reach the
+            # leader: its ID stays taken while any member is alive
+            with suppress(ProcessLookupError):
+                os.killpg(process.pid, signum)
+            return
+
+        with suppress(ProcessLookupError):
+            signal.pidfd_send_signal(child.pidfd, signum)
+        for pid in group_members(process.pid):
+            if pid != process.pid:
+                with suppress(ProcessLookupError):
+                    os.kill(pid, signum)
+
+    async def terminate(
+        self, process: asyncio.subprocess.Process, timeout: float = STOP_TIMEOUT
+    ) -> None:
+        """Stop a child with SIGTERM, then SIGKILL after `timeout`, and reap it."""
+        if process.returncode is None:
+            self._signal(process, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(process.wait(), timeout)
+            except TimeoutError:
+                self._stats.killed += 1
+                child = self._children.get(process.pid)
+                CHILDREN_KILLED.inc(
+                    monitor=child.monitor if child else current_monitor(),
+                    command=child.command if child else "unknown",
+                )
+                self._signal(process, signal.SIGKILL)
+        await process.wait()
+
+    async def kill(self, process: asyncio.subprocess.Process) -> None:
+        """Stop a child with SIGKILL right away and reap it."""
+        if process.returncode is None:
+            self._signal(process, signal.SIGKILL)
+        await process.wait()
+
+    async def shutdown(self, timeout: float = STOP_TIMEOUT) -> None:
+        """Stop and reap every child left running."""
+        children = list(self._children.values())
+        if children:
+            logger.warning(
+                "Stopping %d children left running: %s",
+                len(children),
+                ", ".join(f"{c.command} ({c.process.pid})" for c in children),
+            )
+            await asyncio.gather(
+                *(self.terminate(c.process, timeout) for c in children),
+                return_exceptions=True,
+            )
+
+    def kill_all(self) -> None:
+        """Kill the process groups of all children, without an event loop."""
+        for pid in list(self._children):
+            with suppress(ProcessLookupError, PermissionError):
+                os.killpg(pid, signal.SIGKILL)
+
+    def zombies(self) -> int:
+        """Number of unreaped children of the daemon.
+
+        Scanning /proc costs a read per process on the system, so the count
+        is reused for ZOMBIE_SCAN_INTERVAL however often it is asked for.
+        """
+        now = time.monotonic()
+        if (
+            self._zombies_counted is None
+            or now - self._zombies_counted >= ZOMBIE_SCAN_INTERVAL
+        ):
+            self._stats.zombies = count_zombies(os.getpid())
+            self._zombies_counted = now
+        return self._stats.zombies
+
+    def stats(self) -> ChildStats:
+        """Return a snapshot of the counters."""
+        return ChildStats(
+            running=len(self._children),
+            spawned=self._stats.spawned,
+            reaped=self._stats.reaped,
+            killed=self._stats.killed,
+            leaked=self._stats.leaked,
+            zombies=self.zombies(),
+        )
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        logger.info(
+            "%d children running, %d spawned, %d reaped, %d killed, %d leaked, "
+            "%d zombies",
+            stats.running,
+            stats.spawned,
+            stats.reaped,
+            stats.killed,
+            stats.leaked,
+            stats.zombies,
+        )
+
+
+CHILDREN = ChildRegistry()
+# Last resort for exits that skip the shutdown, e.g. an unhandled exception
+atexit.register(CHILDREN.kill_all)
+
+
+async def run_command_bytes(cmd: list[str], timeout: Optional[float] = None) -> bytes:
+    """Run a command without blocking the event loop and return its raw stdout.
+
+    Args:
+        cmd (list[str]): program and its arguments
+        timeout (Optional[float]): seconds to wait before killing the command
+
+    Raises:
+        subprocess.CalledProcessError: the command exited with a non-zero status
+        TimeoutError: the command did not finish in time
+    """
+    labels = {"monitor": current_monitor(), "command": os.path.basename(cmd[0])}
+    started = time.perf_counter()
+    process = await CHILDREN.spawn(
+        cmd, die_with_daemon=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except (TimeoutError, asyncio.CancelledError):
+        await CHILDREN.kill(process)
+        raise
+    finally:
+        SUBPROCESS_DURATION.observe(time.perf_counter() - started, **labels)
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, cmd, stdout.decode(), stderr.decode()
+        )
+    return stdout
+
+
+async def run_command(cmd: list[str], timeout: Optional[float] = None) -> str:
+    """Like `run_command_bytes`, but return stdout decoded to text."""
+    return (await run_command_bytes(cmd, timeout)).decode()
@@ -0,0 +1,135 @@
+"""Minimal protobuf wire-format reader and writer.
+
+Just enough to exchange a handful of messages without generated code:
+a message decodes to a mapping from field number to the values it carried,
+in order. Length-delimited values stay bytes; callers decode nested
+messages and strings themselves since the wire format does not say which
+is which.
+"""
+
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+FIXED32 = 5
+
+Value = Union[int, bytes]
+Fields = Dict[int, List[Value]]
+
+
+def read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """Read a varint at `offset`; return its value and the following offset."""
+    result = shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError("Truncated varint")
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, offset
+        shift += 7
+
+
+def decode(data: bytes) -> Fields:
+    """Split a message into its fields."""
+    fields: Fields = {}
+    offset = 0
+    while offset < len(data):
+        key, offset = read_varint(data, offset)
+        number, wire_type = key >> 3, key & 0x7
+        value: Value
+        if wire_type == VARINT:
+            value, offset = read_varint(data, offset)
+        elif wire_type == LENGTH_DELIMITED:
+            length, offset = read_varint(data, offset)
+            value = bytes(data[offset : offset + length])
+            if len(value) != length:
+                raise ValueError("Truncated length-delimited field")
+            offset += length
+        elif wire_type == FIXED64:
+            value = int.from_bytes(data[offset : offset + 8], "little")
+            offset += 8
+        elif wire_type == FIXED32:
+            value = int.from_bytes(data[offset : offset + 4], "little")
+            offset += 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+        fields.setdefault(number, []).append(value)
+    return fields
+
+
+def last(fields: Fields, number: int) -> Optional[Value]:
+    """The last value of a singular field, as protobuf parsers pick it."""
+    values = fields.get(number)
+    return values[-1] if values else None
+
+
+def message(fields: Fields, number: int) -> Optional[Fields]:
+    value = last(fields, number)
+    return decode(value) if isinstance(value, bytes) else None
+
+
+def varints(fields: Fields, number: int) -> List[int]:
+    """All values of a repeated integer field, packed or not."""
+    result: List[int] = []
+    for value in fields.get(number, []):
+        if isinstance(value, int):
+            result.append(value)
+            continue
+        offset = 0
+        while offset < len(value):
+            item, offset = read_varint(value, offset)
+            result.append(item)
+    return result
+
+
+def string(fields: Fields, number: int) -> Optional[str]:
+    value = last(fields, number)
+    return value.decode() if isinstance(value, bytes) else None
+
+
+def integer(fields: Fields, number: int) -> int:
+    value = last(fields, number)
+    return value if isinstance(value, int) else 0
+
+
+def double(fields: Fields, number: int) -> float:
+    value = last(fields, number)
+    if not isinstance(value, int):
+        return 0.0
+    return struct.unpack("<d", value.to_bytes(8, "little"))[0]
+
+
+def write_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def encode_field(number: int, value: Union[int, float, str, bytes]) -> bytes:
+    """Encode one field; ints become varints and floats doubles."""
+    if isinstance(value, bool) or isinstance(value, int):
+        return write_varint(number << 3 | VARINT) + write_varint(int(value))
+    if isinstance(value, float):
+        return write_varint(number << 3 | FIXED64) + struct.pack("<d", value)
+    if isinstance(value, str):
+        value = value.encode()
+    return (
+        write_varint(number << 3 | LENGTH_DELIMITED) + write_varint(len(value)) + value
+    )
+
+
+def encode(fields: Iterable[Tuple[int, Union[int, float, str, bytes, None]]]) -> bytes:
+    """Encode a message from (number, value) pairs, skipping None values."""
+    return b"".join(
+        encode_field(number, value) for number, value in fields if value is not None
+    )
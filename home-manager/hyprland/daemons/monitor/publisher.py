@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import subprocess
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+
+from metrics import EVENT_LATENCY, EWW_UPDATES, EWW_VARIABLES, current_monitor
+from processes import run_command
+from state import STATE, StateStore
+
+logger = logging.getLogger("eww_publisher")
+
+BATCH_WINDOW = 0.05  # seconds
+RETRY_DELAY = 1  # seconds before resending a batch that `eww update` failed
+MAX_RETRY_DELAY = 60  # seconds, the retry delay doubles up to this
+OUTPUT_MODE = "stream"  # "stream" for eww's deflisten, "update" for `eww update`
+
+
+@dataclass
+class PublisherStats:
+    """Counters describing how much work the publisher saved."""
+
+    received: int = 0  # variable updates handed to the publisher
+    suppressed: int = 0  # updates dropped because the value did not change
+    merged: int = 0  # updates that joined an already pending batch
+    calls: int = 0  # `eww update` processes actually spawned
+    failures: int = 0  # `eww update` calls that failed
+    lines: int = 0  # batches handed to the state store for `deflisten`
+
+
+class EwwPublisher:
+    """Coalescing, de-duplicating publisher of eww variables.
+
+    Remembers the last value sent for every variable and drops updates that
+    would not change anything. Changes arriving within `window` seconds of
+    each other are sent together: in "update" mode as a single
+    `eww update k1=v1 k2=v2 ...` call, in "stream" mode as one change of the
+    "eww" state topic, which eww reads with `deflisten` from the query server
+    without anything being spawned. A batch that `eww update` fails to
+    deliver is queued again, under any newer values, and retried with a
+    growing delay.
+    Must be used from within the running event loop.
+    """
+
+    def __init__(
+        self,
+        window: float = BATCH_WINDOW,
+        output: str = OUTPUT_MODE,
+        store: StateStore = STATE,
+    ):
+        self.window = window
+        self.output = output
+        self.store = store
+        self._sent: dict[str, str] = {}
+        self._pending: dict[str, str] = {}
+        self._since: Dict[str, float] = {}  # earliest pending event by monitor
+        self._stats = PublisherStats()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._sending: dict[str, str] = {}  # batch of the running `eww update`
+        self._retry_delay = RETRY_DELAY
+        self._flush_lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+
+    def publish(self, to_update: dict[str, str], since: Optional[float] = None) -> None:
+        """Queue variable updates, dropping the ones that change nothing.
+
+        Args:
+            to_update (dict[str, str]): dictionary of [variable name]:[value] pairs to update
+            since (Optional[float]): monotonic time of the event behind the update
+        """
+        monitor = current_monitor()
+        for key, value in to_update.items():
+            self._stats.received += 1
+
+            # What eww shows once the batch on its way, if any, is sent
+            delivered = self._sending.get(key, self._sent.get(key))
+            if self._pending.get(key, delivered) == value:
+                self._stats.suppressed += 1
+                continue
+
+            if delivered == value:
+                # Reverted to the published value before the batch went out
+                del self._pending[key]
+                self._stats.suppressed += 1
+                continue
+
+            if self._pending:
+                self._stats.merged += 1
+            self._pending[key] = value
+            EWW_VARIABLES.inc(monitor=monitor)
+            if since is not None:
+                self._since[monitor] = min(since, self._since.get(monitor, since))
+
+        if self._pending and self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.window, self._start_flush
+            )
+
+    def _start_flush(self) -> None:
+        self._flush_handle = None
+        task = asyncio.create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> None:
+        """Send all pending updates as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        # Batches are sent one at a time so they reach eww in order
+        async with self._flush_lock:
+            batch, self._pending = self._pending, {}
+            since, self._since = self._since, {}
+            if not batch:
+                return
+
+            if self.output == "stream":
+                self.store.update("eww", batch)
+                self._stats.lines += 1
+                self._sent.update(batch)
+                self._observe(since)
+                return
+
+            self._sending = batch
+            try:
+                await run_command(
+                    [
+                        "eww",
+                        "update",
+                        *(f"{key}={value}" for key, value in batch.items()),
+                    ]
+                )
+            except (OSError, subprocess.CalledProcessError) as e:
+                logger.error(
+                    "Error updating eww variables %s, retrying in %s s: %s",
+                    list(batch),
+                    self._retry_delay,
+                    e,
+                )
+                self._stats.failures += 1
+                EWW_UPDATES.inc(mode=self.output, result="failed")
+                self._requeue(batch, since)
+                return
+            finally:
+                self._sending = {}
+
+            self._retry_delay = RETRY_DELAY
+            self._stats.calls += 1
+            self._sent.update(batch)
+            self._observe(since)
+
+    def _requeue(self, batch: dict[str, str], since: Dict[str, float]) -> None:
+        """Queue a failed batch again; values published since then win."""
+        for key in batch:
+            # eww may or may not have the old values, so nothing is suppressed
+            self._sent.pop(key, None)
+        self._pending = {**batch, **self._pending}
+        for monitor, started in since.items():
+            self._since[monitor] = min(started, self._since.get(monitor, started))
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = asyncio.get_running_loop().call_later(
+            self._retry_delay, self._start_flush
+        )
+        self._retry_delay = min(self._retry_delay * 2, MAX_RETRY_DELAY)
+
+    def _observe(self, since: Dict[str, float]) -> None:
+        EWW_UPDATES.inc(mode=self.output, result="ok")
+        now = time.monotonic()
+        for monitor, started in since.items():
+            EVENT_LATENCY.observe(now - started, monitor=monitor)
+
+    def stats(self) -> PublisherStats:
+        """Return a snapshot of the publisher counters."""
+        return replace(self._stats)
+
+
+PUBLISHER = EwwPublisher()
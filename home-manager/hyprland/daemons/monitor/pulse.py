@@ -0,0 +1,378 @@
+import asyncio
+import ctypes
+import logging
+from ctypes import (
+    CFUNCTYPE,
+    POINTER,
+    Structure,
+    c_char_p,
+    c_double,
+    c_int,
+    c_uint8,
+    c_uint32,
+    c_uint64,
+    c_void_p,
+)
+from typing import Callable, Dict, List, Optional, Set
+
+from audio_backends import AudioEvent
+
+logger = logging.getLogger("pulse")
+
+LIBPULSE = "libpulse.so.0"
+CLIENT_NAME = b"sysmonitor"
+CONNECT_TIMEOUT = 5  # seconds
+QUERY_TIMEOUT = 5  # seconds
+
+CHANNELS_MAX = 32
+VOLUME_NORM = 0x10000
+INVALID_INDEX = 0xFFFFFFFF
+
+CONTEXT_READY = 4
+CONTEXT_FAILED = 5
+CONTEXT_TERMINATED = 6
+
+SUBSCRIPTION_MASK = 0x01 | 0x02 | 0x80  # sinks, sources and the server
+FACILITY_MASK = 0x0F
+KIND_MASK = 0x30
+FACILITIES = {
+    0: "sink",
+    1: "source",
+    2: "sink-input",
+    3: "source-output",
+    4: "module",
+    5: "client",
+    6: "sample-cache",
+    7: "server",
+    9: "card",
+}
+KINDS = {0x00: "new", 0x10: "change", 0x20: "remove"}
+DEVICE_STATES = {0: "RUNNING", 1: "IDLE", 2: "SUSPENDED"}
+
+
+class SampleSpec(Structure):
+    _fields_ = [("format", c_int), ("rate", c_uint32), ("channels", c_uint8)]
+
+
+class ChannelMap(Structure):
+    _fields_ = [("channels", c_uint8), ("map", c_int * CHANNELS_MAX)]
+
+
+class CVolume(Structure):
+    _fields_ = [("channels", c_uint8), ("values", c_uint32 * CHANNELS_MAX)]
+
+
+class DeviceInfo(Structure):
+    """Leading fields shared by pa_sink_info and pa_source_info."""
+
+    _fields_ = [
+        ("name", c_char_p),
+        ("index", c_uint32),
+        ("description", c_char_p),
+        ("sample_spec", SampleSpec),
+        ("channel_map", ChannelMap),
+        ("owner_module", c_uint32),
+        ("volume", CVolume),
+        ("mute", c_int),
+        ("monitor_index", c_uint32),  # monitor_source / monitor_of_sink
+        ("monitor_name", c_char_p),
+        ("latency", c_uint64),
+        ("driver", c_char_p),
+        ("flags", c_int),
+        ("proplist", c_void_p),
+        ("configured_latency", c_uint64),
+        ("base_volume", c_uint32),
+        ("state", c_int),
+    ]
+
+
+class ServerInfo(Structure):
+    _fields_ = [
+        ("user_name", c_char_p),
+        ("host_name", c_char_p),
+        ("server_version", c_char_p),
+        ("server_name", c_char_p),
+        ("sample_spec", SampleSpec),
+        ("default_sink_name", c_char_p),
+        ("default_source_name", c_char_p),
+        ("cookie", c_uint32),
+        ("channel_map", ChannelMap),
+    ]
+
+
+CONTEXT_NOTIFY_CB = CFUNCTYPE(None, c_void_p, c_void_p)
+CONTEXT_SUCCESS_CB = CFUNCTYPE(None, c_void_p, c_int, c_void_p)
+SUBSCRIBE_CB = CFUNCTYPE(None, c_void_p, c_int, c_uint32, c_void_p)
+DEVICE_INFO_CB = CFUNCTYPE(None, c_void_p, POINTER(DeviceInfo), c_int, c_void_p)
+SERVER_INFO_CB = CFUNCTYPE(None, c_void_p, POINTER(ServerInfo), c_void_p)
+
+SIGNATURES = {
+    "pa_threaded_mainloop_new": (c_void_p, []),
+    "pa_threaded_mainloop_free": (None, [c_void_p]),
+    "pa_threaded_mainloop_start": (c_int, [c_void_p]),
+    "pa_threaded_mainloop_stop": (None, [c_void_p]),
+    "pa_threaded_mainloop_lock": (None, [c_void_p]),
+    "pa_threaded_mainloop_unlock": (None, [c_void_p]),
+    "pa_threaded_mainloop_get_api": (c_void_p, [c_void_p]),
+    "pa_context_new": (c_void_p, [c_void_p, c_char_p]),
+    "pa_context_unref": (None, [c_void_p]),
+    "pa_context_connect": (c_int, [c_void_p, c_char_p, c_int, c_void_p]),
+    "pa_context_disconnect": (None, [c_void_p]),
+    "pa_context_get_state": (c_int, [c_void_p]),
+    "pa_context_errno": (c_int, [c_void_p]),
+    "pa_context_set_state_callback": (None, [c_void_p, CONTEXT_NOTIFY_CB, c_void_p]),
+    "pa_context_set_subscribe_callback": (None, [c_void_p, SUBSCRIBE_CB, c_void_p]),
+    "pa_context_subscribe": (
+        c_void_p,
+        [c_void_p, c_uint32, CONTEXT_SUCCESS_CB, c_void_p],
+    ),
+    "pa_context_get_server_info": (c_void_p, [c_void_p, SERVER_INFO_CB, c_void_p]),
+    "pa_context_get_sink_info_list": (c_void_p, [c_void_p, DEVICE_INFO_CB, c_void_p]),
+    "pa_context_get_source_info_list": (
+        c_void_p,
+        [c_void_p, DEVICE_INFO_CB, c_void_p],
+    ),
+    "pa_context_get_sink_info_by_index": (
+        c_void_p,
+        [c_void_p, c_uint32, DEVICE_INFO_CB, c_void_p],
+    ),
+    "pa_context_get_source_info_by_index": (
+        c_void_p,
+        [c_void_p, c_uint32, DEVICE_INFO_CB, c_void_p],
+    ),
+    "pa_operation_unref": (None, [c_void_p]),
+    "pa_strerror": (c_char_p, [c_int]),
+    "pa_channel_position_to_string": (c_char_p, [c_int]),
+    "pa_sw_volume_to_dB": (c_double, [c_uint32]),
+}
+
+
+def load_library() -> ctypes.CDLL:
+    """Load libpulse and declare the functions used by the backend."""
+    lib = ctypes.CDLL(LIBPULSE)
+    for name, (restype, argtypes) in SIGNATURES.items():
+        function = getattr(lib, name)
+        function.restype = restype
+        function.argtypes = argtypes
+    return lib
+
+
+def resolve(future: asyncio.Future, result) -> None:
+    """Complete a future unless it has already finished or been cancelled."""
+    if future.done():
+        return
+    if isinstance(result, BaseException):
+        future.set_exception(result)
+    else:
+        future.set_result(result)
+
+
+class PulseBackend:
+    """Audio backend speaking the native PulseAudio protocol through libpulse.
+
+    One connection (also served by PipeWire's pipewire-pulse) carries both
+    the event subscription and all queries, so no processes are spawned.
+    libpulse runs its threaded mainloop; its callbacks copy the data they
+    need and hand it over to the asyncio loop.
+    """
+
+    def __init__(self):
+        self._lib = load_library()
+        self._loop = asyncio.get_running_loop()
+        self._ready: asyncio.Future = self._loop.create_future()
+        self._closed: asyncio.Future = self._loop.create_future()
+        self._callbacks: set = set()  # ctypes callbacks in use by libpulse
+
+        self._mainloop = self._lib.pa_threaded_mainloop_new()
+        self._context = self._lib.pa_context_new(
+            self._lib.pa_threaded_mainloop_get_api(self._mainloop), CLIENT_NAME
+        )
+        self._state_callback = CONTEXT_NOTIFY_CB(self._on_state)
+        self._subscribe_callback: Optional[SUBSCRIBE_CB] = None
+        self._started = False
+
+    @classmethod
+    async def connect(cls) -> "PulseBackend":
+        """Connect to the sound server.
+
+        Raises:
+            OSError: libpulse is not available
+            ConnectionError: the sound server could not be reached
+        """
+        backend = cls()
+        try:
+            await backend._connect()
+        except BaseException:
+            await backend.close()
+            raise
+        logger.info("Connected to the sound server through libpulse")
+        return backend
+
+    async def _connect(self) -> None:
+        lib = self._lib
+        lib.pa_context_set_state_callback(self._context, self._state_callback, None)
+        if lib.pa_context_connect(self._context, None, 0, None) < 0:
+            raise ConnectionError(self._error())
+        if lib.pa_threaded_mainloop_start(self._mainloop) < 0:
+            raise ConnectionError("Could not start the libpulse mainloop")
+        self._started = True
+
+        try:
+            await asyncio.wait_for(asyncio.shield(self._ready), CONNECT_TIMEOUT)
+        except TimeoutError as e:
+            raise ConnectionError("Timed out connecting to the sound server") from e
+
+    def _error(self) -> str:
+        errno = self._lib.pa_context_errno(self._context)
+        return self._lib.pa_strerror(errno).decode()
+
+    def _on_state(self, context, _userdata) -> None:
+        state = self._lib.pa_context_get_state(context)
+        if state == CONTEXT_READY:
+            self._loop.call_soon_threadsafe(resolve, self._ready, None)
+        elif state in (CONTEXT_FAILED, CONTEXT_TERMINATED):
+            error = ConnectionError(f"Sound server connection lost: {self._error()}")
+            self._loop.call_soon_threadsafe(resolve, self._ready, error)
+            self._loop.call_soon_threadsafe(resolve, self._closed, error)
+
+    def _start_operation(self, start: Callable[[], Optional[int]]) -> None:
+        """Start a libpulse operation while holding the mainloop lock."""
+        self._lib.pa_threaded_mainloop_lock(self._mainloop)
+        try:
+            operation = start()
+            if not operation:
+                raise ConnectionError(self._error())
+            self._lib.pa_operation_unref(operation)
+        finally:
+            self._lib.pa_threaded_mainloop_unlock(self._mainloop)
+
+    async def _query_devices(
+        self, start: Callable[[DEVICE_INFO_CB], Optional[int]], missing_ok: bool
+    ) -> List[dict]:
+        future = self._loop.create_future()
+        devices: List[dict] = []
+
+        def on_info(_context, info, eol, _userdata) -> None:
+            if not eol:
+                devices.append(self._describe(info.contents))
+                return
+            result = (
+                devices if eol > 0 or missing_ok else ConnectionError(self._error())
+            )
+            self._loop.call_soon_threadsafe(resolve, future, result)
+            self._loop.call_soon_threadsafe(self._callbacks.discard, callback)
+
+        callback = DEVICE_INFO_CB(on_info)
+        self._callbacks.add(callback)
+        self._start_operation(lambda: start(callback))
+        return await asyncio.wait_for(future, QUERY_TIMEOUT)
+
+    def _describe(self, info: DeviceInfo) -> dict:
+        """Describe a device the way `pactl --format=json list` does."""
+        lib = self._lib
+        channels = [
+            lib.pa_channel_position_to_string(info.channel_map.map[i]).decode()
+            for i in range(info.channel_map.channels)
+        ]
+        volume = {
+            channel: {
+                "value": value,
+                "value_percent": f"{(value * 100 + VOLUME_NORM // 2) // VOLUME_NORM}%",
+                "db": f"{lib.pa_sw_volume_to_dB(value):.2f} dB",
+            }
+            for channel, value in zip(
+                channels, info.volume.values[: info.volume.channels]
+            )
+        }
+        return {
+            "index": info.index,
+            "state": DEVICE_STATES.get(info.state, "UNKNOWN"),
+            "name": (info.name or b"").decode(),
+            "description": (info.description or b"").decode(),
+            "channel_map": channels,
+            "mute": bool(info.mute),
+            "volume": volume,
+        }
+
+    async def get_defaults(self) -> Dict[str, str]:
+        future = self._loop.create_future()
+
+        def on_info(_context, info, _userdata) -> None:
+            server = info.contents
+            defaults = {
+                "sink": (server.default_sink_name or b"").decode(),
+                "source": (server.default_source_name or b"").decode(),
+            }
+            self._loop.call_soon_threadsafe(resolve, future, defaults)
+            self._loop.call_soon_threadsafe(self._callbacks.discard, callback)
+
+        callback = SERVER_INFO_CB(on_info)
+        self._callbacks.add(callback)
+        self._start_operation(
+            lambda: self._lib.pa_context_get_server_info(self._context, callback, None)
+        )
+        return await asyncio.wait_for(future, QUERY_TIMEOUT)
+
+    async def list_devices(
+        self, device_type: str, indexes: Optional[Set[int]] = None
+    ) -> List[dict]:
+        lib = self._lib
+        if indexes is None:
+            get_list = getattr(lib, f"pa_context_get_{device_type}_info_list")
+            return await self._query_devices(
+                lambda callback: get_list(self._context, callback, None),
+                missing_ok=False,
+            )
+
+        get_by_index = getattr(lib, f"pa_context_get_{device_type}_info_by_index")
+        results = await asyncio.gather(
+            *(
+                self._query_devices(
+                    lambda callback, index=index: get_by_index(
+                        self._context, index, callback, None
+                    ),
+                    missing_ok=True,
+                )
+                for index in indexes
+            )
+        )
+        return [device for devices in results for device in devices]
+
+    async def subscribe(self, on_event: Callable[[AudioEvent], None]) -> None:
+        def on_subscription_event(_context, event_type, index, _userdata) -> None:
+            facility = FACILITIES.get(event_type & FACILITY_MASK)
+            kind = KINDS.get(event_type & KIND_MASK)
+            if facility is not None and kind is not None:
+                event = AudioEvent(kind, facility, index)
+                self._loop.call_soon_threadsafe(on_event, event)
+
+        self._subscribe_callback = SUBSCRIBE_CB(on_subscription_event)
+        self._lib.pa_threaded_mainloop_lock(self._mainloop)
+        try:
+            self._lib.pa_context_set_subscribe_callback(
+                self._context, self._subscribe_callback, None
+            )
+        finally:
+            self._lib.pa_threaded_mainloop_unlock(self._mainloop)
+
+        self._start_operation(
+            lambda: self._lib.pa_context_subscribe(
+                self._context, SUBSCRIPTION_MASK, None, None
+            )
+        )
+        await asyncio.shield(self._closed)
+
+    async def close(self) -> None:
+        lib = self._lib
+        if self._context is None:
+            return
+
+        if self._started:
+            lib.pa_threaded_mainloop_lock(self._mainloop)
+            lib.pa_context_disconnect(self._context)
+            lib.pa_threaded_mainloop_unlock(self._mainloop)
+            lib.pa_threaded_mainloop_stop(self._mainloop)
+        lib.pa_context_unref(self._context)
+        lib.pa_threaded_mainloop_free(self._mainloop)
+        self._context = None
+        self._callbacks.clear()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Command-line client of the sysmonitor state server.
+
+Uses only the standard library, so it runs without the nix shell:
+
+    query.py topics
+    query.py get [topic]
+    query.py subscribe [topic]
+
+`get` and `topics` print indented JSON. `subscribe` prints one JSON line per
+change and reconnects whenever sysmonitor restarts. eww does not use it: its
+`deflisten` reads sysmonitor-eww.sock with socat, which keeps a second
+Python interpreter from staying resident.
+"""
+
+import json
+import os
+import socket
+import sys
+import time
+
+SOCKET_PATH = os.path.join(os.environ.get("XDG_RUNTIME_DIR", "/tmp"), "sysmonitor.sock")
+MIN_RETRY_DELAY = 0.5  # seconds
+MAX_RETRY_DELAY = 10  # seconds
+
+
+def connect(command: list[str]) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(SOCKET_PATH)
+        sock.sendall(" ".join(command).encode() + b"\n")
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def query(command: list[str]) -> None:
+    with connect(command) as sock, sock.makefile("rb") as answers:
+        print(json.dumps(json.loads(answers.readline()), indent=2, ensure_ascii=False))
+
+
+def subscribe(command: list[str]) -> None:
+    delay = MIN_RETRY_DELAY
+    while True:
+        started = time.monotonic()
+        try:
+            with connect(command) as sock:
+                while data := sock.recv(65536):
+                    sys.stdout.buffer.write(data)
+                    sys.stdout.buffer.flush()
+        except OSError:
+            pass
+        if time.monotonic() - started > MAX_RETRY_DELAY:
+            delay = MIN_RETRY_DELAY
+        time.sleep(delay)
+        delay = min(delay * 2, MAX_RETRY_DELAY)
+
+
+def main() -> None:
+    command = sys.argv[1:] or ["get"]
+    if command[0] == "subscribe":
+        subscribe(command)
+        return
+    try:
+        query(command)
+    except (OSError, ValueError) as e:
+        sys.exit(f"sysmonitor is not answering on {SOCKET_PATH}: {e}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
@@ -0,0 +1,186 @@
+"""Unix socket serving the monitors' state as JSON.
+
+Clients send one command per line and get JSON lines back:
+
+    topics             list of known topics
+    get                every snapshot, as {topic: snapshot}
+    get <topic>        the snapshot of one topic
+    subscribe <topic>  the snapshot now and after every change of it
+    subscribe          {"topic": ..., "state": ...} for every topic, then
+                       one such line per change
+
+The "eww" topic holds the eww variables. Errors are answered with
+{"error": ...}.
+
+A second socket, sysmonitor-eww.sock, streams the "eww" topic to every
+client without waiting for a command, so eww's `deflisten` can read it
+with socat instead of a resident Python client:
+
+    socat -u UNIX-CONNECT:$XDG_RUNTIME_DIR/sysmonitor-eww.sock -
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from state import STATE, StateStore
+
+logger = logging.getLogger("query_server")
+
+SOCKET_PATH = Path(os.environ.get("XDG_RUNTIME_DIR", "/tmp")) / "sysmonitor.sock"
+LOCK_PATH = SOCKET_PATH.with_suffix(".lock")
+EWW_SOCKET_PATH = SOCKET_PATH.with_name("sysmonitor-eww.sock")
+EWW_TOPIC = "eww"
+MAX_BACKLOG = 64 * 1024  # bytes a subscriber may fall behind before it is dropped
+ALL_TOPICS = "*"
+
+
+def lock_instance(path: Path = LOCK_PATH) -> Optional[int]:
+    """Take the single-instance lock and return its descriptor.
+
+    Returns None when another instance holds it. The kernel releases the
+    lock when its holder exits, however it exits, so it cannot go stale.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def encode(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode() + b"\n"
+
+
+class QueryServer:
+    """Answers state queries and streams changes to subscribers.
+
+    Everything is served from the in-memory StateStore and written without
+    waiting for clients, so slow or numerous clients never hold up the
+    monitors. A subscriber that stops reading is disconnected. Only start
+    the server while holding the instance lock: it replaces the socket.
+    """
+
+    def __init__(
+        self,
+        store: StateStore = STATE,
+        path: Path = SOCKET_PATH,
+        eww_path: Path = EWW_SOCKET_PATH,
+    ):
+        self.store = store
+        self.path = path
+        self.eww_path = eww_path
+        self.connections = 0
+        self._subscribers: Dict[asyncio.StreamWriter, str] = {}
+        self._server: Optional[asyncio.Server] = None
+        self._eww_server: Optional[asyncio.Server] = None
+        self._stop_listening: Optional[Callable[[], None]] = None
+
+    async def start(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(self._serve, self.path)
+        self.eww_path.unlink(missing_ok=True)
+        self._eww_server = await asyncio.start_unix_server(
+            self._stream_eww, self.eww_path
+        )
+        self._stop_listening = self.store.listen(self._on_change)
+        logger.info("Serving state queries on %s", self.path)
+
+    async def close(self) -> None:
+        if self._stop_listening is not None:
+            self._stop_listening()
+        for server in (self._server, self._eww_server):
+            if server is not None:
+                server.close()
+        self._server = self._eww_server = None
+        for writer in list(self._subscribers):
+            writer.close()
+        self._subscribers.clear()
+        self.path.unlink(missing_ok=True)
+        self.eww_path.unlink(missing_ok=True)
+
+    def _write(self, writer: asyncio.StreamWriter, line: bytes) -> None:
+        if writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+            logger.warning("Dropping a subscriber that stopped reading")
+            self._subscribers.pop(writer, None)
+            writer.close()
+            return
+        writer.write(line)
+
+    def _on_change(self, topic: str, snapshot: Any) -> None:
+        # Encode once per change, not once per subscriber
+        bare: Optional[bytes] = None
+        wrapped: Optional[bytes] = None
+        for writer, subscription in list(self._subscribers.items()):
+            if subscription == topic:
+                bare = bare or encode(snapshot)
+                self._write(writer, bare)
+            elif subscription == ALL_TOPICS:
+                wrapped = wrapped or encode({"topic": topic, "state": snapshot})
+                self._write(writer, wrapped)
+
+    def _answer(self, writer: asyncio.StreamWriter, words: list[str]) -> None:
+        command, args = words[0], words[1:]
+        if command == "topics":
+            writer.write(encode(self.store.topics()))
+        elif command == "get" and not args:
+            writer.write(
+                encode({topic: self.store.get(topic) for topic in self.store.topics()})
+            )
+        elif command == "get":
+            try:
+                writer.write(encode(self.store.get(args[0])))
+            except KeyError:
+                writer.write(encode({"error": f"unknown topic {args[0]}"}))
+        elif command == "subscribe" and not args:
+            for topic in self.store.topics():
+                writer.write(encode({"topic": topic, "state": self.store.get(topic)}))
+            self._subscribers[writer] = ALL_TOPICS
+        elif command == "subscribe":
+            self._subscribe(writer, args[0])
+        else:
+            writer.write(encode({"error": f"unknown command {command}"}))
+
+    def _subscribe(self, writer: asyncio.StreamWriter, topic: str) -> None:
+        try:
+            writer.write(encode(self.store.get(topic)))
+        except KeyError:
+            pass  # nothing published yet, the first change will follow
+        self._subscribers[writer] = topic
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.connections += 1
+        try:
+            while line := await reader.readline():
+                if words := line.decode(errors="replace").split():
+                    self._answer(writer, words)
+        except (ConnectionError, ValueError):
+            pass  # disconnected, or a line longer than the stream limit
+        finally:
+            self._subscribers.pop(writer, None)
+            writer.close()
+
+    async def _stream_eww(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.connections += 1
+        self._subscribe(writer, EWW_TOPIC)
+        try:
+            # Whatever these clients send is ignored, and `socat -u` may close
+            # its sending side right away, so only a failed write ends the stream
+            while await reader.read(4096):
+                pass
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+        finally:
+            self._subscribers.pop(writer, None)
+            writer.close()
@@ -0,0 +1,319 @@
+"""Shared timer for the periodic monitors.
+
+Every periodic wait in the daemon goes through one timerfd armed on
+CLOCK_REALTIME with an absolute deadline, so all of them together cost one
+wakeup per distinct instant instead of one per monitor:
+
+    async for now in SCHEDULER.every(60, align=True, slack=0.5, name="clock"):
+        ...
+
+Each timer may fire up to `slack` seconds late. The scheduler sleeps until
+the earliest moment that still respects every slack window and then fires
+all timers that are due by then, so timers with similar deadlines share a
+wakeup. Aligned timers fire on multiples of their period in local time
+(minute, hour, midnight), which makes periods that divide each other land
+on the same wakeups.
+
+The timer is armed with TFD_TIMER_CANCEL_ON_SET: when the wall clock is set
+or the machine resumes from suspend, the kernel cancels it and every
+deadline is recomputed from the new time: aligned timers move to the next
+boundary, and relative sleeps keep the time they had left, measured on
+CLOCK_BOOTTIME, which counts suspend but is never set.
+"""
+
+import asyncio
+import ctypes
+import errno
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Set
+
+logger = logging.getLogger("scheduler")
+
+CLOCK_REALTIME = 0
+TFD_NONBLOCK = 0o4000
+TFD_CLOEXEC = 0o2000000
+TFD_TIMER_ABSTIME = 1
+TFD_TIMER_CANCEL_ON_SET = 2
+
+DEFAULT_SLACK_FRACTION = 0.1  # of the period, when no slack is given
+SECONDS_PER_HOUR = 3600
+
+
+class Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+class Itimerspec(ctypes.Structure):
+    _fields_ = [("it_interval", Timespec), ("it_value", Timespec)]
+
+
+class WallClockTimer:
+    """A timerfd expiring at absolute CLOCK_REALTIME deadlines.
+
+    Raises:
+        OSError: the timer could not be created
+    """
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.timerfd_create(CLOCK_REALTIME, TFD_NONBLOCK | TFD_CLOEXEC)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+
+    def arm(self, deadline: Optional[float]) -> None:
+        """Expire at `deadline` (seconds since the epoch), or now if it passed.
+
+        None disarms the timer.
+        """
+        spec = Itimerspec()
+        if deadline is not None:
+            seconds = int(deadline)
+            nanoseconds = max(int((deadline - seconds) * 1e9), 1)  # 0 would disarm
+            spec.it_value = Timespec(seconds, nanoseconds)
+        flags = TFD_TIMER_ABSTIME | TFD_TIMER_CANCEL_ON_SET
+        if self._libc.timerfd_settime(self.fd, flags, ctypes.byref(spec), None) < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+
+    def read(self) -> Optional[bool]:
+        """Acknowledge the timer.
+
+        Returns True if it expired, False if the wall clock was changed and
+        None if it did neither.
+        """
+        try:
+            os.read(self.fd, 8)
+        except BlockingIOError:
+            return None
+        except OSError as e:
+            if e.errno == errno.ECANCELED:
+                return False
+            raise
+        return True
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def next_boundary(now: float, period: float) -> float:
+    """First multiple of `period` in local time strictly after `now`."""
+    offset = time.localtime(now).tm_gmtoff
+    return ((now + offset) // period + 1) * period - offset
+
+
+@dataclass(eq=False)
+class Timer:
+    name: str
+    period: float  # seconds, 0 for a one-shot timer
+    slack: float  # seconds the timer may fire late
+    align: bool
+    deadline: float  # seconds since the epoch
+    fired: asyncio.Event
+    interruptible: bool = False  # a one-shot timer firing when the clock changes
+    interrupted: bool = False
+    boot_deadline: Optional[float] = None  # CLOCK_BOOTTIME, for relative sleeps
+
+    def reschedule(self, now: float) -> None:
+        if self.align:
+            self.deadline = next_boundary(now, self.period)
+        else:
+            self.deadline += self.period
+            if self.deadline <= now:
+                # Skip the periods missed while suspended rather than catching up
+                self.deadline = now + self.period
+
+
+@dataclass
+class SchedulerStats:
+    """Counters describing how well wakeups are shared."""
+
+    timers: int = 0  # timers currently registered
+    wakeups: int = 0  # expirations of the shared timer
+    fired: int = 0  # timer deadlines served by those wakeups
+    clock_changes: int = 0  # wall clock changes and resumes from suspend
+    wakeups_per_hour: float = 0
+    fired_per_hour: float = 0  # wakeups there would be without coalescing
+
+
+class Scheduler:
+    """Coalesces the deadlines of all periodic monitors onto one timerfd.
+
+    Must be used from within the running event loop.
+    """
+
+    def __init__(self):
+        self._timers: Set[Timer] = set()
+        self._timer: Optional[WallClockTimer] = None
+        self._armed_for: Optional[float] = None
+        self._stats = SchedulerStats()
+        self._started_at = time.monotonic()
+
+    async def every(
+        self,
+        period: float,
+        align: bool = False,
+        slack: Optional[float] = None,
+        name: str = "timer",
+    ) -> AsyncIterator[float]:
+        """Yield the wall-clock time every `period` seconds, starting now.
+
+        Args:
+            period (float): seconds between iterations
+            align (bool): fire on multiples of the period in local time
+            slack (Optional[float]): seconds an iteration may come late,
+                by default a tenth of the period
+            name (str): name of the timer in the logs
+        """
+        timer = self._add(name, period, align, slack, time.time() + period)
+        try:
+            yield time.time()
+            while True:
+                await timer.fired.wait()
+                timer.fired.clear()
+                yield time.time()
+        finally:
+            self._remove(timer)
+
+    async def sleep(
+        self, seconds: float, slack: Optional[float] = None, name: str = "sleep"
+    ) -> None:
+        """Sleep for `seconds`, allowing the wakeup to come `slack` seconds late."""
+        if slack is None:
+            slack = seconds * DEFAULT_SLACK_FRACTION
+        timer = self._add(name, 0, False, slack, time.time() + seconds)
+        timer.boot_deadline = time.clock_gettime(time.CLOCK_BOOTTIME) + seconds
+        try:
+            await timer.fired.wait()
+        finally:
+            self._remove(timer)
+
+    async def sleep_until(
+        self, deadline: float, slack: float = 0, name: str = "sleep"
+    ) -> bool:
+        """Sleep until the wall clock reaches `deadline` (seconds since the epoch).
+
+        Time spent suspended counts. Returns False if the sleep ended early
+        because the wall clock was set or the machine resumed from suspend,
+        so the caller can re-read the time.
+        """
+        timer = self._add(name, 0, False, slack, deadline)
+        timer.interruptible = True
+        try:
+            await timer.fired.wait()
+        finally:
+            self._remove(timer)
+        return not timer.interrupted
+
+    def _add(
+        self,
+        name: str,
+        period: float,
+        align: bool,
+        slack: Optional[float],
+        deadline: float,
+    ) -> Timer:
+        if slack is None:
+            slack = period * DEFAULT_SLACK_FRACTION
+        if align:
+            deadline = next_boundary(time.time(), period)
+        timer = Timer(name, period, slack, align, deadline, asyncio.Event())
+        self._timers.add(timer)
+        self._rearm()
+        return timer
+
+    def _remove(self, timer: Timer) -> None:
+        self._timers.discard(timer)
+        self._rearm()
+
+    def _ensure_timer(self) -> WallClockTimer:
+        if self._timer is None:
+            self._timer = WallClockTimer()
+            asyncio.get_running_loop().add_reader(self._timer.fd, self._on_timer)
+        return self._timer
+
+    def _rearm(self) -> None:
+        if not self._timers:
+            if self._timer is not None and self._armed_for is not None:
+                self._timer.arm(None)
+                self._armed_for = None
+            return
+
+        # The latest moment at which no timer has overrun its slack
+        wake_at = min(t.deadline + t.slack for t in self._timers)
+        if wake_at != self._armed_for:
+            self._ensure_timer().arm(wake_at)
+            self._armed_for = wake_at
+
+    def _on_timer(self) -> None:
+        expired = self._timer.read()
+        if expired is None:
+            return
+
+        now = time.time()
+        self._armed_for = None
+        if not expired:
+            self._stats.clock_changes += 1
+            logger.info(
+                "Wall clock changed, recomputing %d deadlines", len(self._timers)
+            )
+            boottime = time.clock_gettime(time.CLOCK_BOOTTIME)
+            for timer in list(self._timers):
+                if timer.boot_deadline is not None:
+                    timer.deadline = now + max(timer.boot_deadline - boottime, 0)
+                elif timer.interruptible:
+                    timer.interrupted = True
+                    timer.fired.set()
+                    self._timers.discard(timer)
+                elif timer.align:
+                    timer.deadline = next_boundary(now, timer.period)
+                elif timer.period:
+                    timer.deadline = min(timer.deadline, now + timer.period)
+            self._rearm()
+            return
+
+        self._stats.wakeups += 1
+        for timer in list(self._timers):
+            if timer.deadline <= now:
+                self._stats.fired += 1
+                timer.fired.set()
+                if timer.period:
+                    timer.reschedule(now)
+                else:
+                    self._timers.discard(timer)
+        self._rearm()
+
+    def stats(self) -> SchedulerStats:
+        """Return a snapshot of the counters, with hourly rates."""
+        hours = max(time.monotonic() - self._started_at, 1) / SECONDS_PER_HOUR
+        return SchedulerStats(
+            timers=len(self._timers),
+            wakeups=self._stats.wakeups,
+            fired=self._stats.fired,
+            clock_changes=self._stats.clock_changes,
+            wakeups_per_hour=round(self._stats.wakeups / hours, 1),
+            fired_per_hour=round(self._stats.fired / hours, 1),
+        )
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        logger.info(
+            "%.1f wakeups/h serving %.1f deadlines/h for %d timers, %d clock changes",
+            stats.wakeups_per_hour,
+            stats.fired_per_hour,
+            stats.timers,
+            stats.clock_changes,
+        )
+
+    def close(self) -> None:
+        if self._timer is not None:
+            asyncio.get_running_loop().remove_reader(self._timer.fd)
+            self._timer.close()
+            self._timer = None
+            self._armed_for = None
+
+
+SCHEDULER = Scheduler()
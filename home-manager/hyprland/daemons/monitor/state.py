@@ -0,0 +1,61 @@
+from typing import Any, Callable, Dict, List, Set
+
+Listener = Callable[[str, Any], None]
+
+
+class StateStore:
+    """Latest JSON-serialisable snapshot of every monitor, by topic.
+
+    Monitors `set` their snapshot whenever it changes and listeners are told
+    right away. Topics registered with `provide` are computed on request
+    instead, for counters that change too often to push.
+    """
+
+    def __init__(self):
+        self.snapshots: Dict[str, Any] = {}
+        self._providers: Dict[str, Callable[[], Any]] = {}
+        self._listeners: Set[Listener] = set()
+
+    def set(self, topic: str, snapshot: Any) -> None:
+        """Replace the snapshot of a topic."""
+        self.snapshots[topic] = snapshot
+        for listener in list(self._listeners):
+            listener(topic, snapshot)
+
+    def update(self, topic: str, changes: Dict[str, Any]) -> None:
+        """Merge changed keys into a dictionary snapshot."""
+        self.set(topic, {**self.snapshots.get(topic, {}), **changes})
+
+    def provide(self, topic: str, provider: Callable[[], Any]) -> Callable[[], None]:
+        """Compute the snapshot of a topic by calling `provider` when asked.
+
+        Returns a function withdrawing the provider, unless it was replaced.
+        """
+        self._providers[topic] = provider
+
+        def withdraw() -> None:
+            if self._providers.get(topic) is provider:
+                del self._providers[topic]
+
+        return withdraw
+
+    def get(self, topic: str) -> Any:
+        """Return the snapshot of a topic.
+
+        Raises:
+            KeyError: nothing has been published on the topic
+        """
+        if topic in self._providers:
+            return self._providers[topic]()
+        return self.snapshots[topic]
+
+    def topics(self) -> List[str]:
+        return sorted({*self.snapshots, *self._providers})
+
+    def listen(self, listener: Listener) -> Callable[[], None]:
+        """Call `listener(topic, snapshot)` on every change; return a remover."""
+        self._listeners.add(listener)
+        return lambda: self._listeners.discard(listener)
+
+
+STATE = StateStore()
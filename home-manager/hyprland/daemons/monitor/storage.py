@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from scheduler import SCHEDULER
+from utils import publish_state, update_eww
+
+logger = logging.getLogger("storage_monitor")
+
+PROC_ROOT = Path("/proc")
+SYS_ROOT = Path("/sys")
+UNITS = ["", "K", "M", "G", "T", "P"]
+SECTOR_SIZE = 512  # bytes, /proc/diskstats always counts 512-byte sectors
+VIRTUAL_DISKS = ("loop", "ram", "zram", "dm-", "md")
+DISKSTATS_BUFFER = 16384  # bytes, grown when the file does not fit
+
+
+@dataclass
+class StoragePolicy:
+    """What the storage monitor watches and when it republishes."""
+
+    mounts: Tuple[str, ...] = ("/",)
+    disks: Optional[Tuple[str, ...]] = None  # None: every fixed physical disk
+    interval: float = 10  # seconds between samples, aligned to the clock
+    free_threshold: float = 1  # percentage points of free space
+    throughput_threshold: float = 256 * 1024  # bytes/s
+
+
+STORAGE_POLICY = StoragePolicy()
+
+
+@dataclass
+class Throughput:
+    read: float  # bytes/s
+    write: float  # bytes/s
+
+
+def format_size(size: float) -> str:
+    """Format a size in bytes the way `df -h` does, e.g. 9.5G or 234G."""
+    unit = 0
+    while size >= 1024 and unit < len(UNITS) - 1:
+        size /= 1024
+        unit += 1
+    if unit and size < 10:
+        return f"{math.ceil(size * 10) / 10:.1f}{UNITS[unit]}"
+    return f"{math.ceil(size)}{UNITS[unit]}"
+
+
+def get_usage(mount_point: str) -> dict[str, int]:
+    """Size, used and available bytes of a filesystem."""
+    stats = os.statvfs(mount_point)
+    return {
+        "total": stats.f_blocks * stats.f_frsize,
+        "used": (stats.f_blocks - stats.f_bfree) * stats.f_frsize,
+        "available": stats.f_bavail * stats.f_frsize,
+    }
+
+
+def percent_free(usage: dict[str, int]) -> int:
+    """Free space in percent, rounded like `df` rounds the used percentage."""
+    used, available = usage["used"], usage["available"]
+    return 100 - (math.ceil(used * 100 / (used + available)) if used else 0)
+
+
+def get_storage_report(usage: dict[str, int]) -> str:
+    """Describe the free space of a filesystem like the old storage.sh did."""
+    available, total = format_size(usage["available"]), format_size(usage["total"])
+    return f"{percent_free(usage)}% free, {available} / {total}"
+
+
+def format_throughput(throughput: Throughput) -> str:
+    return f"R {format_size(throughput.read)}/s, W {format_size(throughput.write)}/s"
+
+
+def removable(disk: Path) -> bool:
+    """Whether the kernel marks a block device as removable, e.g. a USB stick."""
+    try:
+        return (disk / "removable").read_bytes().strip() == b"1"
+    except OSError:
+        return False
+
+
+def physical_disks(sys_root: Path = SYS_ROOT) -> Tuple[str, ...]:
+    """Fixed whole disks listed in /sys/block.
+
+    Loop, RAM and mapper devices are skipped by name, removable media such
+    as USB sticks by their `removable` attribute.
+    """
+    return tuple(
+        sorted(
+            entry.name
+            for entry in (sys_root / "block").iterdir()
+            if not entry.name.startswith(VIRTUAL_DISKS) and not removable(entry)
+        )
+    )
+
+
+def parse_diskstats(data: bytes, disks: Tuple[str, ...]) -> Tuple[int, int]:
+    """Sum the sectors read and written by the given disks."""
+    read = written = 0
+    for line in data.splitlines():
+        fields = line.split()
+        if len(fields) >= 10 and fields[2].decode() in disks:
+            read += int(fields[5])
+            written += int(fields[9])
+    return read, written
+
+
+class DiskstatsReader:
+    """Turns /proc/diskstats counters into throughput.
+
+    The file stays open and is re-read with pread, so a sample costs one
+    syscall instead of an open/read/close. A file filling the whole buffer
+    may have been cut short, so it is read again with a buffer twice as big.
+    """
+
+    def __init__(self, disks: Tuple[str, ...], proc_root: Path = PROC_ROOT):
+        self.disks = disks
+        self._fd = os.open(proc_root / "diskstats", os.O_RDONLY | os.O_CLOEXEC)
+        self._buffer = DISKSTATS_BUFFER
+        self._last: Optional[Tuple[float, int, int]] = None
+
+    def _read_all(self) -> bytes:
+        while len(data := os.pread(self._fd, self._buffer, 0)) >= self._buffer:
+            self._buffer *= 2
+        return data
+
+    def read(self, timestamp: Optional[float] = None) -> Optional[Throughput]:
+        """Sample the counters; None on the first sample."""
+        now = timestamp if timestamp is not None else time.monotonic()
+        read, written = parse_diskstats(self._read_all(), self.disks)
+        last, self._last = self._last, (now, read, written)
+        if last is None or now <= last[0]:
+            return None
+
+        elapsed = now - last[0]
+        return Throughput(
+            read=max(read - last[1], 0) * SECTOR_SIZE / elapsed,
+            write=max(written - last[2], 0) * SECTOR_SIZE / elapsed,
+        )
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def moved(published: Optional[float], value: float, threshold: float) -> bool:
+    return published is None or abs(value - published) >= threshold
+
+
+async def storage_monitor(
+    policy: StoragePolicy = STORAGE_POLICY,
+    proc_root: Path = PROC_ROOT,
+    sys_root: Path = SYS_ROOT,
+) -> None:
+    """Monitor free space and disk throughput.
+
+    Space comes from statvfs on `policy.mounts`, throughput from
+    /proc/diskstats. Both are sampled every `policy.interval` and always
+    kept in the state snapshot, but an eww variable is only republished
+    once its value moves by at least the policy's threshold.
+    """
+    logger.info("Monitoring storage...")
+    disks = policy.disks if policy.disks is not None else physical_disks(sys_root)
+    diskstats = DiskstatsReader(disks, proc_root)
+    published_free: Dict[str, int] = {}
+    published_throughput: Optional[Throughput] = None
+
+    samples = SCHEDULER.every(policy.interval, align=True, name="storage")
+    try:
+        async for _ in samples:
+            usage = {mount: get_usage(mount) for mount in policy.mounts}
+            throughput = diskstats.read()
+
+            if any(
+                moved(published_free.get(mount), percent_free(u), policy.free_threshold)
+                for mount, u in usage.items()
+            ):
+                if len(usage) == 1:
+                    report = get_storage_report(next(iter(usage.values())))
+                else:
+                    report = ", ".join(
+                        f"{mount} {percent_free(u)}%" for mount, u in usage.items()
+                    )
+                update_eww({"storage-info": report})
+                published_free = {m: percent_free(u) for m, u in usage.items()}
+
+            if throughput is not None and (
+                published_throughput is None
+                or moved(
+                    published_throughput.read,
+                    throughput.read,
+                    policy.throughput_threshold,
+                )
+                or moved(
+                    published_throughput.write,
+                    throughput.write,
+                    policy.throughput_threshold,
+                )
+            ):
+                update_eww({"disk-io": format_throughput(throughput)})
+                published_throughput = throughput
+
+            publish_state(
+                "storage",
+                {
+                    "mounts": usage,
+                    "disks": list(disks),
+                    "read_per_second": throughput.read if throughput else None,
+                    "write_per_second": throughput.write if throughput else None,
+                },
+            )
+
+    finally:
+        await samples.aclose()
+        diskstats.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(storage_monitor())
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from metrics import CURRENT_MONITOR, RESTARTS
+from utils import update_eww
+
+logger = logging.getLogger("supervisor")
+
+
+@dataclass
+class RestartPolicy:
+    """How the supervisor restarts monitors, times in seconds."""
+
+    initial_delay: float = 1
+    max_delay: float = 60
+    multiplier: float = 2
+    jitter: float = 0.2  # delays vary randomly by up to this fraction
+    healthy_period: float = 120  # a run this long resets the backoff
+    storm_window: float = 300
+    storm_restarts: int = 6  # restarts within storm_window that open the circuit
+    park_time: float = 900  # how long an open circuit keeps a monitor parked
+
+    def delay(self, attempt: int) -> float:
+        """Backoff before the `attempt`-th consecutive restart, with jitter."""
+        delay = min(
+            self.initial_delay * self.multiplier ** (attempt - 1), self.max_delay
+        )
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+@dataclass
+class RestartStats:
+    """Restart history of one monitor."""
+
+    state: str = "starting"  # running, backoff or parked
+    starts: int = 0
+    clean_exits: int = 0
+    failures: int = 0
+    trips: int = 0  # times the circuit breaker parked the monitor
+    consecutive_restarts: int = 0
+    last_error: Optional[str] = None
+    last_exit: Optional[float] = None  # wall-clock timestamp
+
+
+@dataclass
+class MonitorSpec:
+    """A monitor coroutine and the eww variables it publishes."""
+
+    name: str
+    run: Callable[[], Awaitable[None]]
+    eww_variables: List[str] = field(default_factory=list)
+
+
+class Supervisor:
+    """Keeps monitors running without letting a broken one spin.
+
+    A monitor that returns or raises is restarted after an exponential,
+    jittered backoff. When it restarts `storm_restarts` times within
+    `storm_window`, the circuit opens: the monitor is parked for `park_time`
+    and its eww variables show that it is unavailable. After parking it gets
+    one trial run; failing that trial parks it again right away. A run that
+    lasts `healthy_period` resets the backoff and the restart history.
+    """
+
+    def __init__(self, policy: Optional[RestartPolicy] = None):
+        self.policy = policy if policy is not None else RestartPolicy()
+        self.stats: Dict[str, RestartStats] = {}
+
+    async def supervise(self, spec: MonitorSpec) -> None:
+        """Run a monitor forever; only returns by being cancelled."""
+        policy = self.policy
+        stats = self.stats.setdefault(spec.name, RestartStats())
+        restarts: Deque[float] = deque()
+        trial = False
+        CURRENT_MONITOR.set(spec.name)
+
+        while True:
+            started = time.monotonic()
+            stats.starts += 1
+            stats.state = "running"
+            try:
+                await spec.run()
+                stats.clean_exits += 1
+                outcome = "exited"
+                RESTARTS.inc(monitor=spec.name, outcome="exited")
+            except Exception as e:  # pylint: disable=broad-except
+                stats.failures += 1
+                stats.last_error = f"{type(e).__name__}: {e}"
+                outcome = f"failed ({stats.last_error})"
+                RESTARTS.inc(monitor=spec.name, outcome="failed")
+
+            now = time.monotonic()
+            stats.last_exit = time.time()
+            if now - started >= policy.healthy_period:
+                restarts.clear()
+                stats.consecutive_restarts = 0
+                trial = False
+
+            restarts.append(now)
+            while now - restarts[0] > policy.storm_window:
+                restarts.popleft()
+            stats.consecutive_restarts += 1
+
+            if trial or len(restarts) >= policy.storm_restarts:
+                stats.trips += 1
+                stats.state = "parked"
+                logger.error(
+                    "%s %s after %s restarts in %.0f s; parking it for %.0f s",
+                    spec.name,
+                    outcome,
+                    len(restarts),
+                    now - restarts[0],
+                    policy.park_time,
+                )
+                update_eww(
+                    {name: f"⚠ {spec.name} unavailable" for name in spec.eww_variables}
+                )
+                await asyncio.sleep(policy.park_time)
+                restarts.clear()
+                stats.consecutive_restarts = 0
+                trial = True
+                continue
+
+            delay = policy.delay(stats.consecutive_restarts)
+            stats.state = "backoff"
+            logger.warning(
+                "%s %s; restarting in %.1f s (restart %s)",
+                spec.name,
+                outcome,
+                delay,
+                stats.consecutive_restarts,
+            )
+            await asyncio.sleep(delay)
+
+    def log_stats(self) -> None:
+        for name, stats in self.stats.items():
+            logger.info(
+                "%s: %s, %s starts, %s failures, %s clean exits, %s trips%s",
+                name,
+                stats.state,
+                stats.starts,
+                stats.failures,
+                stats.clean_exits,
+                stats.trips,
+                f", last error: {stats.last_error}" if stats.last_error else "",
+            )
@@ -1,21 +1,35 @@
 #!/usr/bin/env python3
 
-import atexit
-import concurrent.futures
+import asyncio
 import logging
 import os
 import signal
 import sys
-import time
-from typing import Never
+from dataclasses import asdict
 
 from audio import audio_monitor
+from blue_light import blue_light_monitor
+from clock import clock_monitor
+from metrics import MetricsServer
+from notifications import NOTIFIER
 from power import power_monitor
+from processes import CHILDREN
+from publisher import PUBLISHER
+from query_server import LOCK_PATH, QueryServer, lock_instance
+from scheduler import SCHEDULER
+from state import STATE
+from storage import storage_monitor
+from supervisor import MonitorSpec, Supervisor
 from vpn import vpn_monitor
 
-LOCK_FILE = "/tmp/sysmonitor.lock"
-MAX_RETRIES = 3
-RETRY_DELAY = 3  # seconds
+MONITORS = [
+    MonitorSpec("audio", audio_monitor, ["sink-settings", "source-settings"]),
+    MonitorSpec("power", power_monitor, ["battery-info"]),
+    MonitorSpec("vpn", vpn_monitor, ["vpn-status"]),
+    MonitorSpec("clock", clock_monitor, ["current-time"]),
+    MonitorSpec("storage", storage_monitor, ["storage-info", "disk-io"]),
+    MonitorSpec("blue-light", blue_light_monitor),
+]
 
 
 def setup_logging() -> None:
@@ -37,78 +51,64 @@ setup_logging()
 logger = logging.getLogger("sysmonitor")
 
 
-def create_lock_file() -> None:
-    """Create a lock file to prevent multiple instances of the script."""
-    if os.path.exists(LOCK_FILE):
-        logger.error("Another instance is already running.")
+def log_stats(supervisor: Supervisor) -> None:
+    supervisor.log_stats()
+    SCHEDULER.log_stats()
+    CHILDREN.log_stats()
+
+
+async def run_monitors() -> None:
+    """Run all monitors on one event loop until SIGTERM or SIGINT arrives."""
+    loop = asyncio.get_running_loop()
+    supervisor = Supervisor()
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    loop.add_signal_handler(signal.SIGUSR1, log_stats, supervisor)
+
+    STATE.provide(
+        "supervisor", lambda: {n: asdict(s) for n, s in supervisor.stats.items()}
+    )
+    STATE.provide("publisher", lambda: asdict(PUBLISHER.stats()))
+    STATE.provide("scheduler", lambda: asdict(SCHEDULER.stats()))
+    STATE.provide("children", lambda: asdict(CHILDREN.stats()))
+    server = QueryServer()
+    await server.start()
+    metrics_server = MetricsServer()
+    await metrics_server.start()
+
+    tasks = [
+        asyncio.create_task(supervisor.supervise(spec), name=spec.name)
+        for spec in MONITORS
+    ]
+
+    await stop.wait()
+    logger.info("Shutdown requested, cancelling monitors...")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    log_stats(supervisor)
+
+    await PUBLISHER.flush()
+    SCHEDULER.close()
+    await server.close()
+    await metrics_server.close()
+    await NOTIFIER.drain()
+    await CHILDREN.shutdown()
+
+
+def main() -> None:
+    # Holding the descriptor holds the lock, so keep it open until exit
+    lock_fd = lock_instance()
+    if lock_fd is None:
+        logger.error("Another instance is already running (%s is locked).", LOCK_PATH)
         sys.exit()
-    logger.info("Creating lock file.")
-    open(LOCK_FILE, "w").close()  # pylint: disable=unspecified-encoding
-
-
-def remove_lock_file() -> None:
-    """Remove the lock file."""
-    if os.path.exists(LOCK_FILE):
-        logger.info("Cleaning up lock file.")
-        os.remove(LOCK_FILE)
-
-
-def signal_handler(signum, frame) -> Never:  # pylint: disable=unused-argument
-    logger.info("Signal %s received, cleaning up...", signum)
-    remove_lock_file()
-    sys.exit(0)
-
-
-def monitor_wrapper(monitor_func, name):
-    """Wrapper for monitor functions that retries on failure."""
-    retry_count = 0
-    while True:
-        try:
-            monitor_func()
-        except KeyboardInterrupt:
-            break
-        except Exception as e:  # pylint: disable=broad-except
-            retry_count += 1
-            if retry_count > MAX_RETRIES:
-                logger.warning("%s failed after %s retries: %s", name, MAX_RETRIES, e)
-                raise
-            print(
-                f"{name} failed, retrying in {RETRY_DELAY} seconds... ({retry_count}/{MAX_RETRIES})"
-            )
-            time.sleep(RETRY_DELAY)
-
-
-def main() -> Never:
-    create_lock_file()
-    atexit.register(remove_lock_file)
-
-    signal.signal(signal.SIGTERM, signal_handler)
-    signal.signal(signal.SIGINT, signal_handler)
-
-    monitors = {"audio": audio_monitor, "power": power_monitor, "vpn": vpn_monitor}
-
-    while True:
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(monitor_wrapper, func, name): name
-                for name, func in monitors.items()
-            }
-
-            for future in concurrent.futures.as_completed(futures):
-                monitor_name = futures[future]
-                try:
-                    future.result()
-                except Exception as e:  # pylint: disable=broad-except
-                    logger.warning(
-                        "Monitor %s emitted exception: %s; restarting it now",
-                        monitor_name,
-                        e,
-                    )
-                    # Resubmit the failed monitor
-                    new_future = executor.submit(
-                        monitor_wrapper, monitors[monitor_name], monitor_name
-                    )
-                    futures[new_future] = monitor_name
+
+    try:
+        asyncio.run(run_monitors())
+    finally:
+        os.close(lock_fd)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+import asyncio
+import copy
+import json
+from pathlib import Path
+
+import audio
+import pytest
+from audio_backends import AudioEvent
+from debounce import QUIET_PERIOD, Debouncer
+from fake_audio import FakeAudioBackend, ScriptStep
+
+PAYLOADS = Path(__file__).resolve().parent.parent / "bench" / "payloads"
+SINKS = json.loads((PAYLOADS / "pactl-sinks.json").read_bytes())
+SOURCES = json.loads((PAYLOADS / "pactl-sources.json").read_bytes())
+DEFAULTS = {"sink": SINKS[0]["name"], "source": SOURCES[0]["name"]}
+HEADPHONES = SINKS[1]
+
+GAP = QUIET_PERIOD * 2  # seconds between bursts, enough to end each one
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Eww updates and notifications sent by the monitor, and its debouncer."""
+    sent = {"eww": [], "notifications": [], "debouncers": []}
+
+    def debouncer():
+        sent["debouncers"].append(Debouncer())
+        return sent["debouncers"][-1]
+
+    monkeypatch.setattr(audio, "Debouncer", debouncer)
+    monkeypatch.setattr(
+        audio, "update_eww", lambda update, since=None: sent["eww"].append(update)
+    )
+    monkeypatch.setattr(
+        audio,
+        "send_notification",
+        lambda *args, **_: sent["notifications"].append(args[2:4]),
+    )
+    monkeypatch.setattr(audio, "publish_state", lambda *_: None)
+    return sent
+
+
+def with_volume(device: dict, percent: int, mute: bool = False) -> dict:
+    device = copy.deepcopy(device)
+    device["mute"] = mute
+    for channel in device["volume"].values():
+        channel["value_percent"] = f"{percent}%"
+    return device
+
+
+def burst(events, delay: float = GAP) -> list:
+    """Steps delivering `events` back to back, `delay` after the previous burst."""
+    return [ScriptStep(delay if i == 0 else 0, *step) for i, step in enumerate(events)]
+
+
+def run(script) -> FakeAudioBackend:
+    backend = FakeAudioBackend({"sink": SINKS, "source": SOURCES}, DEFAULTS, script)
+    asyncio.run(audio.audio_monitor(backend))
+    return backend
+
+
+def test_initial_state(published):
+    backend = run([])
+
+    assert backend.queries == {"defaults": 1, "sink": 1, "source": 1}
+    (update,) = published["eww"]
+    assert SINKS[0]["description"][:27] in update["sink-settings"]
+    assert published["notifications"] == []
+
+
+def test_bursts_are_coalesced(published):
+    sink, source = SINKS[0], SOURCES[0]
+    script = [
+        # volume changes on the default sink and source
+        *burst(
+            [(AudioEvent("change", "sink", sink["index"]), with_volume(sink, 20))] * 5
+        ),
+        *burst(
+            [(AudioEvent("change", "source", source["index"]), with_volume(source, 80))]
+            * 5
+        ),
+        # streams starting and stopping, which do not concern the devices
+        *burst([(AudioEvent("new", "sink-input", 200 + i),) for i in range(5)]),
+        # headphones connecting and becoming the default sink
+        *burst(
+            [(AudioEvent("new", "sink", HEADPHONES["index"]), HEADPHONES)]
+            + [(AudioEvent("change", "sink", HEADPHONES["index"]), HEADPHONES)] * 3
+            + [
+                (
+                    AudioEvent("change", "server", -1),
+                    None,
+                    {**DEFAULTS, "sink": HEADPHONES["name"]},
+                )
+            ]
+        ),
+        # the headphones muted
+        *burst(
+            [
+                (
+                    AudioEvent("change", "sink", HEADPHONES["index"]),
+                    with_volume(HEADPHONES, 50, mute=True),
+                )
+            ]
+            * 5
+        ),
+    ]
+    backend = run(script)
+
+    (debouncer,) = published["debouncers"]
+    assert debouncer.stats.events == 25
+    assert debouncer.stats.bursts == 5
+    assert debouncer.stats.largest_burst == 5
+    # the initial load, then one query per device type and burst that touched it
+    assert backend.queries == {"defaults": 2, "sink": 4, "source": 2}
+    # the initial state and every burst but the one about streams
+    assert len(published["eww"]) == 5
+    assert "MUTE" in published["eww"][-1]["sink-settings"]
+    assert published["notifications"] == [
+        ("Audio sink device changed", HEADPHONES["description"])
+    ]
+
+
+def test_removed_default_sink(published):
+    # the default sink disappears first and the server names a new one after
+    script = [
+        ScriptStep(GAP, AudioEvent("remove", "sink", SINKS[0]["index"])),
+        ScriptStep(
+            0,
+            AudioEvent("change", "server", -1),
+            defaults={**DEFAULTS, "sink": HEADPHONES["name"]},
+        ),
+    ]
+    backend = run(script)
+
+    assert backend.queries == {"defaults": 2, "sink": 1, "source": 1}
+    assert published["notifications"] == [
+        ("Audio sink device changed", HEADPHONES["description"])
+    ]
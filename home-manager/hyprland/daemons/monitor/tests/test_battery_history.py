@@ -0,0 +1,141 @@
+from datetime import datetime
+
+import power
+import pytest
+from battery import BatteryState, BatteryStatus
+from battery_history import MIN_SPACING, BatteryHistory
+from state import STATE
+
+START = datetime(2026, 3, 1, 22, 0).timestamp()  # local time
+ENERGY_FULL = 60_000_000  # µWh
+
+
+def status(energy_now: int, state: BatteryState = BatteryState.DISCHARGING):
+    return BatteryStatus(state, 50, 5_000_000, energy_now, ENERGY_FULL)
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = BatteryHistory(tmp_path / "history.bin", capacity=8)
+    yield history
+    history.close()
+
+
+def fill(history: BatteryHistory, readings) -> None:
+    """Append (minutes after START, energy_now, state) readings."""
+    for minutes, energy_now, state in readings:
+        history.append(status(energy_now, state), START + minutes * 60)
+
+
+DISCHARGING = BatteryState.DISCHARGING
+CHARGING = BatteryState.CHARGING
+
+
+def test_wraparound_keeps_the_newest_samples(history):
+    fill(history, [(i, 50_000_000 - i * 1000, DISCHARGING) for i in range(11)])
+
+    samples = list(history.samples())
+    assert len(samples) == history.capacity
+    assert [s.timestamp for s in samples] == [START + i * 60 for i in range(3, 11)]
+    assert history.last().energy_now == 50_000_000 - 10 * 1000
+
+
+def test_history_survives_reopening(tmp_path):
+    history = BatteryHistory(tmp_path / "history.bin", capacity=8)
+    fill(history, [(i, 50_000_000 - i * 1000, DISCHARGING) for i in range(11)])
+    history.close()
+
+    reopened = BatteryHistory(tmp_path / "history.bin", capacity=8)
+    try:
+        assert [s.timestamp for s in reopened.samples()] == [
+            START + i * 60 for i in range(3, 11)
+        ]
+    finally:
+        reopened.close()
+
+
+def test_close_readings_are_not_stored(history):
+    history.append(status(50_000_000), START)
+    history.append(status(49_999_000), START + MIN_SPACING / 2)
+    history.append(status(49_998_000, CHARGING), START + MIN_SPACING / 2 + 1)
+
+    assert [s.energy_now for s in history.samples()] == [50_000_000, 49_998_000]
+
+
+def test_energy_used_between_bounds(history):
+    fill(
+        history,
+        [
+            (0, 50_000_000, DISCHARGING),
+            (1, 49_000_000, DISCHARGING),
+            (2, 48_500_000, DISCHARGING),
+            (3, 49_500_000, CHARGING),  # charging does not count as use
+            (4, 49_000_000, DISCHARGING),
+        ],
+    )
+
+    assert history.energy_used(START) == 2_000_000
+    # the first sample at or after `since` is the starting point
+    assert history.energy_used(START + 60) == 1_000_000
+    # samples after `until` are left out
+    assert history.energy_used(START, until=START + 2 * 60) == 1_500_000
+    assert history.energy_used(START + 10 * 60) == 0
+
+
+def test_session_starts_when_the_charger_is_unplugged(history):
+    fill(
+        history,
+        [
+            (0, 50_000_000, DISCHARGING),
+            (1, 49_000_000, DISCHARGING),
+            (2, 49_500_000, CHARGING),
+            (3, 49_400_000, DISCHARGING),
+            (4, 48_400_000, DISCHARGING),
+        ],
+    )
+
+    assert history.session_start() == START + 3 * 60
+    assert history.session_energy_used() == 1_000_000
+
+
+def test_no_session_while_charging(history):
+    fill(history, [(0, 49_000_000, DISCHARGING), (1, 49_500_000, CHARGING)])
+
+    assert history.session_start() is None
+    assert history.session_energy_used() == 0
+
+
+def test_energy_is_bucketed_by_local_day(history):
+    # 22:00 on March 1st to 02:00 on March 2nd
+    fill(
+        history,
+        [
+            (0, 50_000_000, DISCHARGING),
+            (60, 48_000_000, DISCHARGING),
+            (119, 47_000_000, DISCHARGING),
+            (121, 46_000_000, DISCHARGING),
+            (240, 45_500_000, DISCHARGING),
+        ],
+    )
+
+    days = history.daily_energy_used()
+    assert {day.isoformat(): used for day, used in days.items()} == {
+        "2026-03-01": 3_000_000,
+        "2026-03-02": 1_500_000,
+    }
+
+
+def test_energy_report_is_provided_on_request(history):
+    fill(history, [(0, 50_000_000, DISCHARGING), (1, 49_000_000, DISCHARGING)])
+    withdraw = power.provide_state(
+        "battery-energy", lambda: power.energy_report(history)
+    )
+    try:
+        assert STATE.get("battery-energy") == {
+            "session_started": START,
+            "session_energy_used": 1_000_000,
+            "daily_energy_used": {"2026-03-01": 1_000_000},
+        }
+    finally:
+        withdraw()
+    assert "battery-energy" not in STATE.topics()
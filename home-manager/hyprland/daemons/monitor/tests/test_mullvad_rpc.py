@@ -0,0 +1,128 @@
+import asyncio
+
+import fake_mullvad
+import mullvad_rpc
+import protobuf_wire as wire
+import pytest
+import vpn
+from fake_mullvad import CONNECTED, DISCONNECTED, FakeManagementService, Transition
+from mullvad_rpc import (
+    ManagementClient,
+    decode_daemon_event,
+    decode_tunnel_state,
+    encode_daemon_event,
+    encode_tunnel_state,
+)
+from vpn import (
+    CliBackend,
+    ConnectingStatus,
+    DisconnectedDetails,
+    DisconnectedStatus,
+    DisconnectingStatus,
+    ErrorCause,
+    ErrorDetails,
+    ErrorStatus,
+    open_backend,
+    vpn_monitor,
+)
+
+STATES = [
+    DISCONNECTED,
+    DisconnectedStatus(
+        state="disconnected",
+        details=DisconnectedDetails(location=fake_mullvad.GOTHENBURG, locked_down=True),
+    ),
+    ConnectingStatus(state="connecting"),
+    CONNECTED,
+    DisconnectingStatus(state="disconnecting"),
+    ErrorStatus(
+        state="error",
+        details=ErrorDetails(cause=ErrorCause(reason="is_offline"), block_failure=None),
+    ),
+]
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 2**32, 2**63])
+def test_varint_round_trip(value):
+    data = wire.write_varint(value)
+    assert wire.read_varint(data, 0) == (value, len(data))
+
+
+def test_message_round_trip():
+    data = wire.encode(
+        [(1, "Gothenburg"), (2, 57.70887), (3, True), (4, None), (5, b"\x01\x02")]
+    )
+    fields = wire.decode(data)
+    assert wire.string(fields, 1) == "Gothenburg"
+    assert wire.double(fields, 2) == 57.70887
+    assert wire.integer(fields, 3) == 1
+    assert 4 not in fields
+    assert wire.last(fields, 5) == b"\x01\x02"
+
+
+def test_truncated_message_is_rejected():
+    with pytest.raises(ValueError):
+        wire.decode(wire.encode([(1, "Gothenburg")])[:-3])
+
+
+@pytest.mark.parametrize("status", STATES, ids=lambda s: s.state)
+def test_tunnel_state_round_trip(status):
+    assert decode_tunnel_state(encode_tunnel_state(status)) == status
+    assert decode_daemon_event(encode_daemon_event(status)) == status
+
+
+def test_other_daemon_events_are_skipped():
+    assert decode_daemon_event(fake_mullvad.SETTINGS_EVENT) is None
+
+
+@pytest.fixture
+def published(monkeypatch):
+    sent = {"eww": [], "notifications": []}
+    monkeypatch.setattr(vpn, "RECONCILE_DELAY", 0.05)
+    monkeypatch.setattr(
+        vpn, "update_eww", lambda update, since=None: sent["eww"].append(update)
+    )
+    monkeypatch.setattr(
+        vpn,
+        "send_notification",
+        lambda *args, **_: sent["notifications"].append(args[3]),
+    )
+    monkeypatch.setattr(vpn, "publish_state", lambda *_: None)
+    return sent
+
+
+def test_tracker_against_fake_daemon(tmp_path, published):
+    transitions = [
+        Transition(0.1, None),  # a settings event, skipped
+        Transition(0.1, DISCONNECTED),
+        Transition(0.01, CONNECTED),  # recovers before the check
+        Transition(0.2, DISCONNECTED),  # stays down
+        Transition(0.3, None),
+    ]
+
+    async def scenario():
+        socket = str(tmp_path / "mullvad-vpn")
+        async with FakeManagementService(
+            socket, transitions, initial=CONNECTED
+        ) as service:
+            backend = await ManagementClient.connect(socket)
+            monitor = asyncio.create_task(vpn_monitor(backend))
+            await asyncio.sleep(1)
+            monitor.cancel()
+            await asyncio.gather(monitor, return_exceptions=True)
+            return service
+
+    service = asyncio.run(scenario())
+    assert service.subscriptions == 1
+    assert service.queries >= 2  # the initial state and the reconciliation
+    states = [update["vpn-status"].split(":")[0] for update in published["eww"]]
+    assert states == ["Connected", "Disconnected"]
+    assert published["notifications"] == ["New state: disconnected"]
+
+
+def test_missing_socket_falls_back_to_cli(tmp_path, monkeypatch):
+    monkeypatch.setattr(mullvad_rpc, "MANAGEMENT_SOCKET", str(tmp_path / "missing"))
+    monkeypatch.setattr(mullvad_rpc, "CONNECT_TIMEOUT", 0.2)
+
+    backend = asyncio.run(open_backend("grpc"))
+    assert isinstance(backend, CliBackend)
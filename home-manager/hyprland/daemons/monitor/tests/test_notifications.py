@@ -0,0 +1,69 @@
+import asyncio
+import shutil
+
+import notifications
+import pytest
+from fake_notifyd import FakeNotificationService
+from notifications import Notifier
+
+
+@pytest.fixture
+def service():
+    if shutil.which("dbus-daemon") is None:
+        pytest.skip("dbus-daemon is not installed")
+    with FakeNotificationService() as service:
+        yield service
+
+
+def send(notifier: Notifier, *notifications) -> None:
+    """Send (title, tag) notifications in order and wait for their delivery."""
+
+    async def main():
+        for title, tag in notifications:
+            notifier.notify("normal", 5000, title, "body", tag)
+        await notifier.drain()
+
+    asyncio.run(main())
+
+
+def test_tagged_notifications_replace_each_other(service):
+    notifier = Notifier(service.address)
+    send(
+        notifier,
+        ("Connected", "vpn"),
+        ("Sink changed", "audio-sink"),
+        ("Disconnected", "vpn"),
+        ("Battery low", None),
+        ("Connected", "vpn"),
+    )
+
+    received = [(n.summary, n.id, n.replaces_id) for n in service.notifications]
+    vpn, sink, battery = received[0][1], received[1][1], received[3][1]
+    assert len({vpn, sink, battery}) == 3
+    assert received == [
+        ("Connected", vpn, 0),
+        ("Sink changed", sink, 0),
+        ("Disconnected", vpn, vpn),
+        ("Battery low", battery, 0),
+        ("Connected", vpn, vpn),
+    ]
+    assert notifier._replaces == {"vpn": vpn, "audio-sink": sink}
+    assert service.notifications[0].app_name == notifications.APP_NAME
+    assert service.notifications[0].hints["urgency"] == ("y", 1)
+
+
+def test_notify_send_without_a_bus(monkeypatch, tmp_path):
+    commands = []
+
+    async def run_command(cmd, timeout=None):
+        commands.append(cmd)
+        return ""
+
+    monkeypatch.setattr(notifications, "run_command", run_command)
+    notifier = Notifier(f"unix:path={tmp_path / 'missing-bus'}")
+    send(notifier, ("Battery low", "power"))
+
+    assert commands == [
+        ["notify-send", "-u", "normal", "-t", "5000", "Battery low", "body"]
+    ]
+    assert notifier._replaces == {}
@@ -0,0 +1,110 @@
+import asyncio
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import processes
+import pytest
+from processes import ChildRegistry, group_members
+
+# Counts SIGRTMIN and prints the count when terminated. Unlike SIGUSR1, the
+# signal is queued rather than merged when it arrives twice, and sigwaitinfo
+# takes each one separately, which a Python signal handler would not.
+COUNTER = """
+import signal
+signals = {signal.SIGRTMIN, signal.SIGTERM}
+signal.pthread_sigmask(signal.SIG_BLOCK, signals)
+print("ready", flush=True)
+received = 0
+while signal.sigwaitinfo(signals).si_signo != signal.SIGTERM:
+    received += 1
+print(received, flush=True)
+"""
+
+
+def test_leader_is_signalled_once():
+    async def main():
+        children = ChildRegistry()
+        process = await children.spawn(
+            [sys.executable, "-c", COUNTER], stdout=subprocess.PIPE
+        )
+        assert await process.stdout.readline() == b"ready\n"
+        children._signal(process, signal.SIGRTMIN)
+        await asyncio.sleep(0.1)
+        await children.terminate(process)
+        return await process.stdout.read(), children.stats()
+
+    output, stats = asyncio.run(main())
+    assert output == b"1\n"
+    assert stats.running == 0
+    assert stats.killed == 0
+
+
+def test_terminate_stops_the_group():
+    async def main():
+        children = ChildRegistry()
+        process = await children.spawn(
+            ["sh", "-c", "sleep 30 & echo $!; wait"], stdout=subprocess.PIPE
+        )
+        sleeper = int(await process.stdout.readline())
+        await children.terminate(process)
+        await asyncio.sleep(0.1)
+        return process.pid, sleeper, children.stats()
+
+    pgid, sleeper, stats = asyncio.run(main())
+    assert sleeper not in group_members(pgid)
+    assert stats.leaked == 0
+
+
+def test_leftover_group_is_killed():
+    async def main():
+        children = ChildRegistry()
+        process = await children.spawn(
+            ["sh", "-c", "sleep 30 & echo $!"], stdout=subprocess.PIPE
+        )
+        sleeper = int(await process.stdout.readline())
+        await process.wait()
+        await asyncio.sleep(0.1)
+        return process.pid, sleeper, children.stats()
+
+    pgid, sleeper, stats = asyncio.run(main())
+    assert group_members(pgid) == []
+    assert stats.leaked == 1
+    assert stats.running == 0
+
+
+# Starts a listener that should die with it, prints its PID and dies
+DAEMON = """
+import asyncio, os, subprocess, sys
+sys.path.insert(0, {monitor_dir!r})
+from processes import CHILDREN
+
+async def main():
+    process = await CHILDREN.spawn(
+        ["sleep", "30"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    print(process.pid, flush=True)
+    os._exit(0)
+
+asyncio.run(main())
+"""
+
+
+def test_children_die_with_the_daemon():
+    daemon = DAEMON.format(monitor_dir=str(Path(processes.__file__).parent))
+    output = subprocess.run(
+        [sys.executable, "-c", daemon], check=True, capture_output=True
+    ).stdout
+    listener = int(output)
+    time.sleep(0.2)
+    assert listener not in group_members(listener)
+
+
+def test_missing_program():
+    async def main():
+        await ChildRegistry().spawn(["sysmonitor-no-such-program"])
+
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(main())
@@ -0,0 +1,94 @@
+import asyncio
+import subprocess
+
+import publisher
+import pytest
+from publisher import EwwPublisher
+from state import StateStore
+
+
+@pytest.fixture
+def eww(monkeypatch):
+    """`eww update` calls; each one fails while `failing` is set."""
+    calls = {"updates": [], "failing": False}
+
+    async def run_command(cmd, timeout=None):
+        calls["updates"].append(dict(arg.split("=", 1) for arg in cmd[2:]))
+        if calls["failing"]:
+            raise subprocess.CalledProcessError(1, cmd)
+        return ""
+
+    monkeypatch.setattr(publisher, "run_command", run_command)
+    monkeypatch.setattr(publisher, "RETRY_DELAY", 0.05)
+    return calls
+
+
+def updating(eww, client):
+    """Run `client(publisher)` against a publisher in "update" mode."""
+
+    async def main():
+        eww_publisher = EwwPublisher(window=0.01, output="update", store=StateStore())
+        await client(eww_publisher)
+        return eww_publisher.stats()
+
+    return asyncio.run(main())
+
+
+def test_updates_are_batched_and_deduplicated(eww):
+    async def client(eww_publisher):
+        eww_publisher.publish({"vpn-status": "Connected", "clock": "12:00"})
+        eww_publisher.publish({"vpn-status": "Connected"})
+        await asyncio.sleep(0.05)
+        eww_publisher.publish({"vpn-status": "Connected", "clock": "12:01"})
+        await asyncio.sleep(0.05)
+
+    stats = updating(eww, client)
+
+    assert eww["updates"] == [
+        {"vpn-status": "Connected", "clock": "12:00"},
+        {"clock": "12:01"},
+    ]
+    assert (stats.received, stats.suppressed, stats.calls) == (5, 2, 2)
+
+
+def test_failed_batch_is_sent_again(eww):
+    async def client(eww_publisher):
+        eww["failing"] = True
+        eww_publisher.publish({"vpn-status": "Connected", "clock": "12:00"})
+        await asyncio.sleep(0.03)
+        # published while the batch waits for its retry, so it wins
+        eww_publisher.publish({"clock": "12:01"})
+        eww["failing"] = False
+        await asyncio.sleep(0.15)
+        # eww has the values now: the same ones again change nothing
+        eww_publisher.publish({"vpn-status": "Connected", "clock": "12:01"})
+        await asyncio.sleep(0.05)
+
+    stats = updating(eww, client)
+
+    assert eww["updates"] == [
+        {"vpn-status": "Connected", "clock": "12:00"},
+        {"vpn-status": "Connected", "clock": "12:01"},
+    ]
+    assert (stats.failures, stats.calls, stats.suppressed) == (1, 1, 2)
+
+
+def test_old_value_is_resent_after_a_failed_batch(eww):
+    async def client(eww_publisher):
+        eww_publisher.publish({"vpn-status": "Connected"})
+        await asyncio.sleep(0.05)
+        eww["failing"] = True
+        eww_publisher.publish({"vpn-status": "Disconnected"})
+        await asyncio.sleep(0.03)
+        eww["failing"] = False
+        # eww may still show either value, so this one is not suppressed
+        eww_publisher.publish({"vpn-status": "Connected"})
+        await asyncio.sleep(0.15)
+
+    updating(eww, client)
+
+    assert eww["updates"] == [
+        {"vpn-status": "Connected"},
+        {"vpn-status": "Disconnected"},
+        {"vpn-status": "Connected"},
+    ]
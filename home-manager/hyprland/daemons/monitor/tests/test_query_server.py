@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+from query_server import QueryServer
+from state import StateStore
+
+
+def serve(tmp_path, client):
+    """Run `client(server, store)` against a server on fresh sockets."""
+
+    async def main():
+        store = StateStore()
+        server = QueryServer(store, tmp_path / "q.sock", tmp_path / "q-eww.sock")
+        await server.start()
+        try:
+            return await asyncio.wait_for(client(server, store), 5)
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+async def subscribe(server: QueryServer, command: str):
+    """Send a command; keep the returned writer, dropping it closes the socket."""
+    reader, writer = await asyncio.open_unix_connection(server.path)
+    writer.write(command.encode() + b"\n")
+    return reader, writer
+
+
+async def next_line(reader: asyncio.StreamReader):
+    return json.loads(await reader.readline())
+
+
+def test_subscribe_starts_with_the_snapshot(tmp_path):
+    async def client(server, store):
+        store.set("vpn", {"state": "connected"})
+        updates, _writer = await subscribe(server, "subscribe vpn")
+        first = await next_line(updates)
+        store.set("vpn", {"state": "disconnected"})
+        return first, await next_line(updates)
+
+    assert serve(tmp_path, client) == (
+        {"state": "connected"},
+        {"state": "disconnected"},
+    )
+
+
+def test_subscribe_starts_with_a_provided_topic(tmp_path):
+    async def client(server, store):
+        store.provide("children", lambda: {"running": 2})
+        updates, _writer = await subscribe(server, "subscribe children")
+        return await next_line(updates)
+
+    assert serve(tmp_path, client) == {"running": 2}
+
+
+def test_subscribe_before_anything_is_published(tmp_path):
+    async def client(server, store):
+        updates, _writer = await subscribe(server, "subscribe storage")
+        await asyncio.sleep(0.05)
+        store.set("storage", {"free": 40})
+        return await next_line(updates)
+
+    assert serve(tmp_path, client) == {"free": 40}
+
+
+def test_eww_socket_streams_without_a_command(tmp_path):
+    async def client(server, store):
+        store.update("eww", {"clock": "12:00"})
+        reader, writer = await asyncio.open_unix_connection(server.eww_path)
+        writer.write_eof()  # like `socat -u`, which never writes
+        first = await next_line(reader)
+        store.update("eww", {"vpn-status": "Connected"})
+        return first, await next_line(reader)
+
+    assert serve(tmp_path, client) == (
+        {"clock": "12:00"},
+        {"clock": "12:00", "vpn-status": "Connected"},
+    )
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+import scheduler
+from scheduler import Scheduler
+
+
+async def clock_change(monkeypatch, jump: float, start) -> tuple:
+    """Start a wait, move the wall clock by `jump` and report the ECANCELED."""
+    real_time = time.time
+    offset = 0.0
+    monkeypatch.setattr(scheduler.time, "time", lambda: real_time() + offset)
+
+    sched = Scheduler()
+    waiter = asyncio.create_task(start(sched))
+    await asyncio.sleep(0)
+    (timer,) = sched._timers
+
+    offset = jump
+    monkeypatch.setattr(sched._timer, "read", lambda: False)
+    sched._on_timer()
+    return sched, waiter, timer, real_time() + offset
+
+
+def test_clock_set_back_keeps_remaining_sleep(monkeypatch):
+    async def scenario():
+        sched, waiter, timer, now = await clock_change(
+            monkeypatch, -3600, lambda s: s.sleep(30, slack=0)
+        )
+        try:
+            assert timer.deadline - now == pytest.approx(30, abs=1)
+            assert sched.stats().clock_changes == 1
+        finally:
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            sched.close()
+
+    asyncio.run(scenario())
+
+
+def test_clock_set_forward_keeps_remaining_sleep(monkeypatch):
+    async def scenario():
+        sched, waiter, timer, now = await clock_change(
+            monkeypatch, 3600, lambda s: s.sleep(30, slack=0)
+        )
+        try:
+            assert timer.deadline - now == pytest.approx(30, abs=1)
+            assert not waiter.done()
+        finally:
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            sched.close()
+
+    asyncio.run(scenario())
+
+
+def test_clock_change_interrupts_sleep_until(monkeypatch):
+    async def scenario():
+        sched, waiter, _, _ = await clock_change(
+            monkeypatch, -3600, lambda s: s.sleep_until(time.time() + 30)
+        )
+        try:
+            assert await asyncio.wait_for(waiter, 1) is False
+        finally:
+            sched.close()
+
+    asyncio.run(scenario())
+
+
+def test_clock_change_realigns_periodic_timer(monkeypatch):
+    async def scenario():
+        async def every_minute(sched):
+            async for _ in sched.every(60, align=True, name="clock"):
+                pass
+
+        sched, waiter, timer, now = await clock_change(monkeypatch, -3600, every_minute)
+        try:
+            assert timer.deadline == scheduler.next_boundary(now, 60)
+        finally:
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            sched.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,125 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import storage
+from fake_proc import FakeProc
+from storage import DiskstatsReader, StoragePolicy, physical_disks
+
+MIB = 1024**2
+
+
+@pytest.fixture
+def proc():
+    with FakeProc() as fake:
+        yield fake
+
+
+def test_physical_disks_skip_virtual_devices(proc):
+    assert physical_disks(proc.sys_root) == ("nvme0n1", "sda")
+
+
+def test_physical_disks_skip_removable_media(proc):
+    # sdb, a USB stick, is a physical disk by name but marked removable
+    assert "sdb" in {entry.name for entry in (proc.sys_root / "block").iterdir()}
+    assert "sdb" not in physical_disks(proc.sys_root)
+
+    (proc.sys_root / "block" / "sdb" / "removable").write_text("0\n")
+    assert physical_disks(proc.sys_root) == ("nvme0n1", "sda", "sdb")
+
+
+def test_throughput_from_counter_deltas(proc):
+    reader = DiskstatsReader(("nvme0n1", "sda"), proc.proc_root)
+    try:
+        assert reader.read(timestamp=0) is None
+        proc.advance("nvme0n1", read_bytes=20 * MIB)
+        proc.advance("sda", written_bytes=10 * MIB)
+        throughput = reader.read(timestamp=10)
+        assert throughput.read == 2 * MIB
+        assert throughput.write == 1 * MIB
+    finally:
+        reader.close()
+
+
+def test_diskstats_larger_than_the_buffer(proc):
+    # Hosts with many loop devices and partitions have long diskstats files
+    loops = "".join(
+        f"   7 {n:7} loop{n} 58 0 2196 21 0 0 0 0 0 56 21 0 0 0 0 0 0\n"
+        for n in range(1, 1000)
+    )
+    proc.diskstats.write_text(loops + proc.diskstats.read_text())
+    assert proc.diskstats.stat().st_size > storage.DISKSTATS_BUFFER
+
+    reader = DiskstatsReader(("sda",), proc.proc_root)
+    try:
+        reader.read(timestamp=0)
+        proc.advance("sda", read_bytes=5 * MIB)
+        assert reader.read(timestamp=1).read == 5 * MIB
+    finally:
+        reader.close()
+
+
+class Ticks:
+    """Stand-in scheduler whose `every` yields when the test ticks it."""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def every(self, *_, **__):
+        while True:
+            yield await self.queue.get()
+
+
+def test_republishes_only_past_thresholds(proc, monkeypatch):
+    updates = []
+    states = []
+    clock = SimpleNamespace(now=0.0)
+    usage = {"total": 100 * MIB, "used": 50 * MIB, "available": 50 * MIB}
+    ticks = Ticks()
+
+    monkeypatch.setattr(storage, "SCHEDULER", ticks)
+    monkeypatch.setattr(storage, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    monkeypatch.setattr(storage, "get_usage", lambda _: dict(usage))
+    monkeypatch.setattr(storage, "update_eww", updates.append)
+    monkeypatch.setattr(storage, "publish_state", lambda _, state: states.append(state))
+
+    async def scenario():
+        monitor = asyncio.create_task(
+            storage.storage_monitor(StoragePolicy(), proc.proc_root, proc.sys_root)
+        )
+
+        async def tick(at: float) -> None:
+            clock.now = at
+            published = len(states)
+            ticks.queue.put_nowait(at)
+            while len(states) == published:
+                await asyncio.sleep(0)
+
+        try:
+            await tick(0)
+            assert updates == [{"storage-info": "50% free, 50M / 100M"}]
+
+            proc.advance("nvme0n1", read_bytes=10 * MIB)
+            await tick(10)
+            assert updates[-1] == {"disk-io": "R 1.0M/s, W 0/s"}
+
+            # 1.1 MiB/s is within 256 KiB/s of the published 1 MiB/s
+            updates.clear()
+            proc.advance("nvme0n1", read_bytes=11 * MIB)
+            await tick(20)
+            assert updates == []
+            assert states[-1]["read_per_second"] == pytest.approx(1.1 * MIB)
+
+            # Idle disks and 2 points less free space are both republished
+            usage.update(used=52 * MIB, available=48 * MIB)
+            await tick(30)
+            assert updates == [
+                {"storage-info": "48% free, 48M / 100M"},
+                {"disk-io": "R 0/s, W 0/s"},
+            ]
+            assert len(states) == 4
+        finally:
+            monitor.cancel()
+            await asyncio.gather(monitor, return_exceptions=True)
+
+    asyncio.run(scenario())
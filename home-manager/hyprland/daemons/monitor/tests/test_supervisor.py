@@ -0,0 +1,149 @@
+import asyncio
+import random
+from dataclasses import replace
+from types import SimpleNamespace
+
+import pytest
+import supervisor
+from supervisor import MonitorSpec, RestartPolicy, Supervisor
+
+POLICY = RestartPolicy(
+    initial_delay=1,
+    max_delay=8,
+    multiplier=2,
+    jitter=0,
+    healthy_period=120,
+    storm_window=300,
+    storm_restarts=100,
+    park_time=900,
+)
+
+
+class Stop(BaseException):
+    """Ends a supervised run; the supervisor only catches Exception."""
+
+
+class FakeClock:
+    """Time that only moves when a monitor runs or the supervisor sleeps."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(
+        supervisor,
+        "time",
+        SimpleNamespace(monotonic=clock.monotonic, time=clock.monotonic),
+    )
+    monkeypatch.setattr(supervisor, "asyncio", SimpleNamespace(sleep=clock.sleep))
+    return clock
+
+
+@pytest.fixture
+def eww(monkeypatch):
+    updates = []
+    monkeypatch.setattr(supervisor, "update_eww", updates.append)
+    return updates
+
+
+def scripted(clock: FakeClock, runs):
+    """A monitor whose runs last `seconds` and then fail, or return if None."""
+    script = iter(runs)
+
+    async def run():
+        try:
+            seconds, error = next(script)
+        except StopIteration:
+            raise Stop() from None
+        clock.now += seconds
+        if error is not None:
+            raise error
+
+    return run
+
+
+def supervise(policy: RestartPolicy, run) -> Supervisor:
+    sup = Supervisor(policy)
+    with pytest.raises(Stop):
+        asyncio.run(sup.supervise(MonitorSpec("power", run, ["battery-info"])))
+    return sup
+
+
+def test_backoff_grows_up_to_the_maximum(clock, eww):
+    sup = supervise(POLICY, scripted(clock, [(0, ValueError("boom"))] * 6))
+
+    assert clock.sleeps == [1, 2, 4, 8, 8, 8]
+    stats = sup.stats["power"]
+    assert (stats.starts, stats.failures, stats.trips) == (7, 6, 0)
+    assert stats.last_error == "ValueError: boom"
+    assert eww == []
+
+
+def test_clean_exits_back_off_too(clock, eww):
+    sup = supervise(POLICY, scripted(clock, [(0, None)] * 2))
+
+    assert clock.sleeps == [1, 2]
+    assert sup.stats["power"].clean_exits == 2
+
+
+def test_healthy_run_resets_the_backoff(clock, eww):
+    runs = [(0, OSError()), (0, OSError()), (120, OSError()), (0, OSError())]
+    supervise(POLICY, scripted(clock, runs))
+
+    assert clock.sleeps == [1, 2, 1, 2]
+
+
+def test_jitter_stays_within_bounds():
+    policy = RestartPolicy(initial_delay=1, max_delay=60, jitter=0.2)
+    random.seed(0)
+    delays = [policy.delay(attempt) for attempt in range(1, 10) for _ in range(50)]
+
+    nominal = [
+        min(2 ** (attempt - 1), 60) for attempt in range(1, 10) for _ in range(50)
+    ]
+    assert all(0.8 * n <= d <= 1.2 * n for d, n in zip(delays, nominal))
+    assert len(set(delays)) == len(delays)
+
+
+def test_restart_storm_parks_the_monitor(clock, eww):
+    policy = replace(POLICY, storm_restarts=3)
+    runs = [
+        (0, OSError()),
+        (0, OSError()),
+        (0, OSError()),  # third restart within the window opens the circuit
+        (5, OSError()),  # the trial run fails: parked again right away
+        (120, None),  # a healthy trial closes the circuit
+        (0, OSError()),
+    ]
+    sup = supervise(policy, scripted(clock, runs))
+
+    assert clock.sleeps == [1, 2, 900, 900, 1, 2]
+    assert sup.stats["power"].trips == 2
+    assert eww == [{"battery-info": "⚠ power unavailable"}] * 2
+
+
+def test_restarts_outside_the_window_do_not_count(clock, eww):
+    # the backoff alone spreads the restarts beyond the 300 s window
+    policy = replace(POLICY, storm_restarts=3, initial_delay=200, max_delay=400)
+    supervise(policy, scripted(clock, [(0, OSError())] * 4))
+
+    assert clock.sleeps == [200, 400, 400, 400]
+    assert eww == []
+
+
+def test_supervisors_do_not_share_a_policy():
+    first, second = Supervisor(), Supervisor()
+    first.policy.park_time = 1
+
+    assert second.policy.park_time == RestartPolicy().park_time
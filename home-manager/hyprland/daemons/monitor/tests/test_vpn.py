@@ -0,0 +1,113 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+import vpn
+from vpn import StatusTracker, parse_mullvad_status
+
+PAYLOADS = Path(__file__).resolve().parent.parent / "bench" / "payloads"
+LINES = (PAYLOADS / "mullvad-status.jsonl").read_bytes().splitlines()
+CONNECTED = parse_mullvad_status(LINES[2])
+DISCONNECTED = parse_mullvad_status(LINES[6])
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Eww updates and notifications sent by the tracker."""
+    sent = {"eww": [], "notifications": []}
+    monkeypatch.setattr(vpn, "RECONCILE_DELAY", 0.01)
+    monkeypatch.setattr(
+        vpn, "update_eww", lambda update, since=None: sent["eww"].append(update)
+    )
+    monkeypatch.setattr(
+        vpn,
+        "send_notification",
+        lambda *args, **_: sent["notifications"].append(args[3]),
+    )
+    monkeypatch.setattr(vpn, "publish_state", lambda *_: None)
+    return sent
+
+
+def tracker_reporting(*statuses) -> StatusTracker:
+    """A tracker whose status queries answer `statuses` in turn."""
+    answers = iter(statuses)
+
+    async def get_status():
+        return next(answers)
+
+    return StatusTracker(get_status)
+
+
+def test_payloads_are_the_expected_states():
+    assert CONNECTED.state == "connected"
+    assert DISCONNECTED.state == "disconnected"
+
+
+def test_transient_disconnect_is_not_published(published):
+    async def scenario():
+        tracker = tracker_reporting(CONNECTED)
+        tracker.on_event(CONNECTED)
+        tracker.on_event(DISCONNECTED)
+        assert len(published["eww"]) == 1  # nothing before the check
+        await asyncio.sleep(0.05)
+        assert tracker.status == CONNECTED
+        await tracker.close()
+
+    asyncio.run(scenario())
+    assert len(published["eww"]) == 1
+    assert published["notifications"] == []
+
+
+def test_confirmed_disconnect_is_published_once(published):
+    async def scenario():
+        tracker = tracker_reporting(DISCONNECTED)
+        tracker.on_event(CONNECTED)
+        tracker.on_event(DISCONNECTED)
+        await asyncio.sleep(0.05)
+        assert tracker.status == DISCONNECTED
+        await tracker.close()
+
+    asyncio.run(scenario())
+    assert published["eww"][-1]["vpn-status"].startswith("Disconnected")
+    assert published["notifications"] == ["New state: disconnected"]
+
+
+def test_newer_event_supersedes_pending_disconnect(published):
+    async def scenario():
+        tracker = tracker_reporting()  # a query would raise StopIteration
+        tracker.on_event(CONNECTED)
+        tracker.on_event(DISCONNECTED)
+        tracker.on_event(CONNECTED)
+        await asyncio.sleep(0.05)
+        assert tracker.status == CONNECTED
+        await tracker.close()
+
+    asyncio.run(scenario())
+    assert published["notifications"] == []
+
+
+def test_failed_check_publishes_the_reported_disconnect(published):
+    async def failing():
+        raise OSError("daemon gone")
+
+    async def scenario():
+        tracker = StatusTracker(failing)
+        tracker.on_event(CONNECTED)
+        tracker.on_event(DISCONNECTED)
+        await asyncio.sleep(0.05)
+        assert tracker.status == DISCONNECTED
+        await tracker.close()
+
+    asyncio.run(scenario())
+    assert published["notifications"] == ["New state: disconnected"]
+
+
+def test_initial_disconnect_is_published_right_away(published):
+    async def scenario():
+        tracker = tracker_reporting()
+        tracker.on_event(DISCONNECTED)
+        assert tracker.status == DISCONNECTED
+        await tracker.close()
+
+    asyncio.run(scenario())
+    assert published["notifications"] == []
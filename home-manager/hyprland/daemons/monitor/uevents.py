@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import socket
+from dataclasses import dataclass, field
+from typing import Iterable, Optional, Protocol
+
+logger = logging.getLogger("uevents")
+
+NETLINK_KOBJECT_UEVENT = 15
+KERNEL_GROUP = 1  # multicast group of raw kernel uevents (udev uses group 2)
+RECEIVE_BUFFER = 16 * 1024
+
+
+@dataclass
+class Uevent:
+    """A kernel uevent, e.g. a `change` of a power_supply device."""
+
+    action: str
+    devpath: str
+    properties: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def subsystem(self) -> Optional[str]:
+        return self.properties.get("SUBSYSTEM")
+
+
+def parse_uevent(datagram: bytes) -> Optional[Uevent]:
+    """Parse a raw `action@devpath\\0KEY=VALUE\\0...` kernel uevent datagram."""
+    header, *fields = datagram.rstrip(b"\0").split(b"\0")
+    action, at, devpath = header.partition(b"@")
+    if not at:
+        return None  # not a kernel message (e.g. libudev)
+
+    properties = {}
+    for entry in fields:
+        key, _, value = entry.partition(b"=")
+        properties[key.decode(errors="replace")] = value.decode(errors="replace")
+
+    return Uevent(action.decode(), devpath.decode(errors="replace"), properties)
+
+
+class UeventSource(Protocol):
+    """Anything that yields kernel uevents."""
+
+    async def receive(self) -> Uevent: ...
+
+    def close(self) -> None: ...
+
+
+async def wait_for_subsystem(source: UeventSource, subsystem: str) -> Uevent:
+    """Wait for the next uevent of the given subsystem."""
+    while True:
+        event = await source.receive()
+        if event.subsystem == subsystem:
+            return event
+
+
+class NetlinkUeventSource:
+    """Kernel uevents read from a NETLINK_KOBJECT_UEVENT socket."""
+
+    def __init__(self):
+        self._socket = socket.socket(
+            socket.AF_NETLINK,
+            socket.SOCK_DGRAM | socket.SOCK_NONBLOCK | socket.SOCK_CLOEXEC,
+            NETLINK_KOBJECT_UEVENT,
+        )
+        try:
+            self._socket.bind((0, KERNEL_GROUP))
+        except OSError:
+            self._socket.close()
+            raise
+
+    async def receive(self) -> Uevent:
+        loop = asyncio.get_running_loop()
+        while True:
+            datagram = await loop.sock_recv(self._socket, RECEIVE_BUFFER)
+            event = parse_uevent(datagram)
+            if event is not None:
+                return event
+
+    def close(self) -> None:
+        self._socket.close()
+
+
+class FakeUeventSource:
+    """Uevents fed by hand or from a recorded stream of raw datagrams."""
+
+    def __init__(self, datagrams: Iterable[bytes] = ()):
+        self._queue: asyncio.Queue[Uevent] = asyncio.Queue()
+        for datagram in datagrams:
+            self.feed(datagram)
+
+    def feed(self, datagram: bytes) -> None:
+        """Queue a raw uevent datagram for delivery."""
+        event = parse_uevent(datagram)
+        if event is not None:
+            self._queue.put_nowait(event)
+
+    async def receive(self) -> Uevent:
+        return await self._queue.get()
+
+    def close(self) -> None:
+        pass
+
+
+def open_uevent_source() -> Optional[UeventSource]:
+    """Open the kernel uevent socket, or return None if it is unavailable."""
+    try:
+        return NetlinkUeventSource()
+    except OSError as e:
+        logger.warning("Kernel uevents unavailable, falling back to polling: %s", e)
+        return None
@@ -1,31 +1,58 @@
-import subprocess
+from typing import Any, Callable, Optional
 
+from notifications import NOTIFIER
+from publisher import PUBLISHER
+from state import STATE
 
-def send_notification(urgency: str, timeout: int, title: str, body: str) -> None:
-    """Send a notification using notify-send.
+
+def send_notification(
+    urgency: str, timeout: int, title: str, body: str, tag: Optional[str] = None
+) -> None:
+    """Send a desktop notification over D-Bus, falling back to notify-send.
 
     Args:
         urgency (str): urgency level of the notification
         timeout (int): time in milliseconds to show the notification
         title (str): title of the notification
         body (str): body of the notification
+        tag (Optional[str]): notifications sharing a tag replace each other in place
     """
-    subprocess.run(
-        ["notify-send", "-u", urgency, "-t", str(timeout), title, body], check=True
-    )
+    NOTIFIER.notify(urgency, timeout, title, body, tag)
+
 
+def update_eww(to_update: dict[str, str], since: Optional[float] = None) -> None:
+    """Update eww variables through the shared publisher.
 
-def update_eww(to_update: dict[str, str]) -> None:
-    """Update eww variables.
+    Unchanged values are dropped and changes arriving close together are sent
+    as one batch, either to the "eww" state topic or in a single `eww update`
+    call.
 
     Args:
         toUpdate (dict[str, str]): dictionary of [variable name]:[value] pairs to update
+        since (Optional[float]): monotonic time of the event behind the update,
+            to measure how long it takes to reach eww
+    """
+    PUBLISHER.publish(to_update, since)
+
+
+def publish_state(topic: str, snapshot: Any) -> None:
+    """Make a monitor's latest state available to state server clients.
+
+    Args:
+        topic (str): name clients query the state by, usually the monitor's
+        snapshot (Any): JSON-serialisable description of the state
+    """
+    STATE.set(topic, snapshot)
+
+
+def provide_state(topic: str, provider: Callable[[], Any]) -> Callable[[], None]:
+    """Make a state that is costly to keep current available, computed on request.
+
+    Args:
+        topic (str): name clients query the state by
+        provider (Callable[[], Any]): returns the JSON-serialisable state
+
+    Returns:
+        Callable[[], None]: withdraws the topic, e.g. when the monitor stops
     """
-    subprocess.run(
-        [
-            "eww",
-            "update",
-            *(f"{key}={value}" for key, value in to_update.items()),
-        ],
-        check=True,
-    )
+    return STATE.provide(topic, provider)
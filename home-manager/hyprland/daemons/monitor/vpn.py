@@ -1,12 +1,24 @@
-import json
+import asyncio
 import logging
 import subprocess
+import time
+from contextlib import aclosing
 from pathlib import Path
-from time import sleep
-from typing import Annotated, Literal, Optional, Union
-
+from typing import (
+    Annotated,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Literal,
+    Optional,
+    Protocol,
+    Union,
+)
+
+from decoders import Decoder
+from processes import CHILDREN, run_command_bytes
 from pydantic import BaseModel, Field, TypeAdapter
-from utils import send_notification, update_eww
+from utils import publish_state, send_notification, update_eww
 
 logger = logging.getLogger("vpn_monitor")
 
@@ -23,11 +35,16 @@ class Endpoint(BaseModel):
     daita: bool
 
 
-class Location(BaseModel):
+class LocationSummary(BaseModel):
+    """The part of a location that is displayed."""
+
     ipv4: Optional[str]
     ipv6: Optional[str]
     country: str
     city: str
+
+
+class Location(LocationSummary):
     latitude: float
     longitude: float
     mullvad_exit_ip: bool
@@ -37,13 +54,21 @@ class Location(BaseModel):
     obfuscator_hostname: Optional[str]
 
 
-class ConnectedDetails(BaseModel):
+class ConnectedDetailsSummary(BaseModel):
+    location: LocationSummary
+
+
+class ConnectedDetails(ConnectedDetailsSummary):
     endpoint: Endpoint
     location: Location
     feature_indicators: list[str]
 
 
-class DisconnectedDetails(BaseModel):
+class DisconnectedDetailsSummary(BaseModel):
+    location: Optional[LocationSummary]
+
+
+class DisconnectedDetails(DisconnectedDetailsSummary):
     location: Optional[Location]
     locked_down: bool
 
@@ -52,23 +77,38 @@ class ErrorCause(BaseModel):
     reason: str
 
 
-class ErrorDetails(BaseModel):
+class ErrorDetailsSummary(BaseModel):
     cause: ErrorCause
+
+
+class ErrorDetails(ErrorDetailsSummary):
     block_failure: Optional[str]
 
 
-class ConnectedStatus(BaseModel):
+class ConnectedSummary(BaseModel):
     state: Literal["connected"]
+    details: ConnectedDetailsSummary
+
+
+class ConnectedStatus(ConnectedSummary):
     details: ConnectedDetails
 
 
-class DisconnectedStatus(BaseModel):
+class DisconnectedSummary(BaseModel):
     state: Literal["disconnected"]
+    details: DisconnectedDetailsSummary
+
+
+class DisconnectedStatus(DisconnectedSummary):
     details: DisconnectedDetails
 
 
-class ErrorStatus(BaseModel):
+class ErrorSummary(BaseModel):
     state: Literal["error"]
+    details: ErrorDetailsSummary
+
+
+class ErrorStatus(ErrorSummary):
     details: ErrorDetails
 
 
@@ -91,98 +131,225 @@ MullvadStatus = Annotated[
     Field(discriminator="state"),
 ]
 
+# Only the fields read by format_status_for_eww. Every full status is an
+# instance of the matching summary class, so both decode to this type.
+MullvadStatusSummary = Annotated[
+    Union[
+        ConnectedSummary,
+        DisconnectedSummary,
+        ErrorSummary,
+        ConnectingStatus,
+        DisconnectingStatus,
+    ],
+    Field(discriminator="state"),
+]
+
+STATUSES: TypeAdapter[MullvadStatus] = TypeAdapter(MullvadStatus)
+STATUS_SUMMARIES: TypeAdapter[MullvadStatusSummary] = TypeAdapter(MullvadStatusSummary)
+PROJECT_STATUS = True  # decode only the status fields that are displayed
+STATUS_DECODER = Decoder(
+    STATUS_SUMMARIES if PROJECT_STATUS else STATUSES, "mullvad-status"
+)
+
 EWW_CONFIG = Path("~/Config-Files/hyprland/eww").expanduser()
+RECONCILE_DELAY = 1  # seconds before re-checking a reported disconnect
+VPN_BACKEND = "grpc"  # "grpc" (management interface) or "cli"
 
 
-def get_mullvad_status_manual() -> MullvadStatus:
-    process = subprocess.Popen(
-        ["mullvad", "status", "--json"],
-        stdout=subprocess.PIPE,
-        universal_newlines=True,
-        bufsize=1,  # prevent buffering
-    )
-    return parse_mullvad_status(process.stdout.readline().strip())  # type: ignore
+async def get_mullvad_status_manual() -> MullvadStatusSummary:
+    output = await run_command_bytes(["mullvad", "status", "--json"])
+    return parse_mullvad_status(output.partition(b"\n")[0].strip())
 
 
-def parse_mullvad_status(json_data: str) -> MullvadStatus:
-    data_dict = json.loads(json_data)
-    parse_status = TypeAdapter(MullvadStatus).validate_python
-    return parse_status(data_dict)
+def parse_mullvad_status(json_data: Union[bytes, str]) -> MullvadStatusSummary:
+    return STATUS_DECODER.decode(json_data)
 
 
-def format_status_for_eww(status: MullvadStatus) -> str:
+def format_status_for_eww(status: MullvadStatusSummary) -> str:
     match status:
-        case ConnectedStatus(
-            details=ConnectedDetails(
-                location=Location(city=city, country=country, ipv4=ipv4, ipv6=ipv6)
+        case ConnectedSummary(
+            details=ConnectedDetailsSummary(
+                location=LocationSummary(
+                    city=city, country=country, ipv4=ipv4, ipv6=ipv6
+                )
             )
         ):
             ip = ipv4 or ipv6 or "N/A"
             return f"Connected: {city}, {country} [{ip}]"
         case ConnectingStatus():
             return "Connecting..."
-        case DisconnectedStatus(
-            details=DisconnectedDetails(
-                location=Location(city=city, country=country, ipv4=ipv4, ipv6=ipv6)
+        case DisconnectedSummary(
+            details=DisconnectedDetailsSummary(
+                location=LocationSummary(
+                    city=city, country=country, ipv4=ipv4, ipv6=ipv6
+                )
             )
         ):
             ip = ipv4 or ipv6 or "N/A"
             return f"Disconnected: {city}, {country} [{ip}]"
-        case DisconnectedStatus():
+        case DisconnectedSummary():
             return "Disconnected"
         case DisconnectingStatus():
             return "Disconnecting..."
-        case ErrorStatus(details=ErrorDetails(cause=ErrorCause(reason="is_offline"))):
+        case ErrorSummary(
+            details=ErrorDetailsSummary(cause=ErrorCause(reason="is_offline"))
+        ):
             return "Offline"
         case _:
             return f"Unknown status: {status}"
 
 
-def vpn_monitor():
-    process = subprocess.Popen(
-        ["mullvad", "status", "--json", "listen"],
-        stdout=subprocess.PIPE,
-        universal_newlines=True,
-        bufsize=1,  # prevent buffering
-    )
+class VpnBackend(Protocol):
+    """Source of Mullvad tunnel states."""
+
+    async def get_status(self) -> MullvadStatusSummary:
+        """Query the current tunnel state."""
+
+    def events(self) -> AsyncIterator[MullvadStatusSummary]:
+        """Yield the current tunnel state, then every change of it."""
+
+    async def close(self) -> None:
+        """Release the connection to the daemon."""
+
+
+class CliBackend:
+    """Backend running the `mullvad` CLI and parsing its JSON output."""
+
+    async def get_status(self) -> MullvadStatusSummary:
+        return await get_mullvad_status_manual()
+
+    async def events(self) -> AsyncIterator[MullvadStatusSummary]:
+        process = await CHILDREN.spawn(
+            ["mullvad", "status", "--json", "listen"], stdout=subprocess.PIPE
+        )
+        try:
+            while line := await process.stdout.readline():  # type: ignore
+                try:
+                    status = parse_mullvad_status(line.strip())
+                except ValueError as e:
+                    logger.error("Error parsing the VPN status: %s", e)
+                    continue
+                yield status
+        finally:
+            await CHILDREN.terminate(process)
+
+    async def close(self) -> None:
+        pass
+
+
+async def open_backend(name: str = VPN_BACKEND) -> VpnBackend:
+    """Open the configured backend, falling back to the CLI if it is unavailable."""
+    if name == "grpc":
+        try:
+            # pylint: disable-next=import-outside-toplevel
+            from mullvad_rpc import ManagementClient
+
+            return await ManagementClient.connect()
+        except (ImportError, OSError, ConnectionError) as e:
+            logger.warning(
+                "Mullvad management interface unavailable (%s), using CLI", e
+            )
+    return CliBackend()
+
+
+class StatusTracker:
+    """Publishes VPN status changes and reconciles reported disconnects.
+
+    The daemon sometimes reports a disconnect that it immediately recovers
+    from without a further event. A disconnect is therefore not published
+    right away: it schedules a status query after RECONCILE_DELAY, and only
+    the queried status is published. Any newer event cancels the pending
+    check, so a reconnect blip neither notifies twice nor queues up checks,
+    and the event stream is never left unread.
+    """
+
+    def __init__(self, get_status: Callable[[], Awaitable[MullvadStatusSummary]]):
+        self.get_status = get_status
+        self.status: Optional[MullvadStatusSummary] = None
+        self._check: Optional[asyncio.Task] = None
+
+    def on_event(self, status: MullvadStatusSummary) -> None:
+        """Apply a status reported by the event stream."""
+        self.cancel_check()
+        since = time.monotonic()
+        if status.state == "disconnected" and self.status is not None:
+            self._check = asyncio.create_task(self._reconcile(status, since))
+        else:
+            self.apply(status, since)
+
+    def apply(
+        self, status: MullvadStatusSummary, since: Optional[float] = None
+    ) -> None:
+        """Publish a status unless it is identical to the current one.
+
+        Args:
+            status (MullvadStatusSummary): the status to publish
+            since (Optional[float]): monotonic time the status was received at
+        """
+        if status == self.status:
+            logger.debug("Status unchanged: %s", status.state)
+            return
+
+        logger.info("Status: %s", status.state)
+        text = format_status_for_eww(status)
+        update_eww({"vpn-status": text}, since)
+        publish_state("vpn", {**status.model_dump(), "text": text})
+        if self.status is not None and status.state != self.status.state:
+            send_notification(
+                "normal",
+                5_000,
+                "VPN status change",
+                f"New state: {status.state}",
+                tag="vpn",
+            )
+        self.status = status
+
+    async def _reconcile(self, reported: MullvadStatusSummary, since: float) -> None:
+        """Publish the queried status, or the reported one if the query fails."""
+        await asyncio.sleep(RECONCILE_DELAY)
+        try:
+            status = await self.get_status()
+        except (ValueError, OSError, subprocess.CalledProcessError) as e:
+            logger.error("Error checking the VPN status: %s", e)
+            status = reported
+        else:
+            logger.info("Status after reconciling: %s", status.state)
+
+        self._check = None
+        self.apply(status, since)
+
+    def cancel_check(self) -> None:
+        if self._check is not None:
+            self._check.cancel()
+            self._check = None
+
+    async def close(self) -> None:
+        check, self._check = self._check, None
+        if check is not None:
+            check.cancel()
+            await asyncio.gather(check, return_exceptions=True)
+
+
+async def vpn_monitor(backend: Optional[VpnBackend] = None):
+    if backend is None:
+        backend = await open_backend()
 
     logger.info("Monitoring Mullvad VPN status...")
-    prev_status: Optional[MullvadStatus] = None
+    tracker = StatusTracker(backend.get_status)
 
     try:
-        for line in iter(process.stdout.readline, ""):  # type: ignore
-            try:
-                status = parse_mullvad_status(line.strip())
-                logger.info("Status: %s", status.state)
-                update_eww({"vpn-status": format_status_for_eww(status)})
-
-                if status.state == "disconnected":
-                    logger.info("VPN in disconnected state. Retry in 1 second.")
-                    sleep(1)
-
-                    status = get_mullvad_status_manual()
-                    logger.info("Status after retrying manually: %s", status.state)
-                    update_eww({"vpn-status": format_status_for_eww(status)})
-
-                if prev_status is not None and status.state != prev_status.state:
-                    send_notification(
-                        "normal",
-                        5_000,
-                        "VPN status change",
-                        f"New state: {status.state}",
-                    )
-
-                prev_status = status
-
-            except subprocess.CalledProcessError as e:
-                logger.error("Error parsing JSON output or updating status: %s", e)
-
-    except KeyboardInterrupt:
+        async with aclosing(backend.events()) as statuses:
+            async for status in statuses:
+                tracker.on_event(status)
+
+    except asyncio.CancelledError:
         logger.info("Monitoring stopped.")
+        raise
 
     finally:
-        process.terminate()
+        await tracker.close()
+        await backend.close()
 
 
 if __name__ == "__main__":
-    vpn_monitor()
+    asyncio.run(vpn_monitor())
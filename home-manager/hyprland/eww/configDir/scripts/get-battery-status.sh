@@ -20,7 +20,9 @@ prepend_zero_if_single_digit() {
     fi
 }
 
-if [ "$status" = "Charging" ]; then
+if [ "$power_now" -eq 0 ]; then
+    echo "$status, $capacity%"
+elif [ "$status" = "Charging" ]; then
     remaining_time_hours=$((($energy_full - $energy_now) / power_now))
     remaining_time_minutes=$((($energy_full - $energy_now) % power_now * 60 / power_now))
     remaining_time_string=$(prepend_zero_if_single_digit "$remaining_time_hours"):$(prepend_zero_if_single_digit "$remaining_time_minutes")
@@ -20,6 +20,7 @@
     hyprsunset # Blue light filter
     pyprland # Plugins
     hyprcursor # Cursor theme utility
+    socat # Feeds the sysmonitor state to eww
   ];
 
   home.sessionVariables = {
@@ -78,7 +79,6 @@
         "sleep 1 && eww open info"
         "sleep 0.5 && pypr"
         "dbus-update-activation-environment --systemd HYPRLAND_INSTANCE_SIGNATURE"
-        "~/.config/hypr/daemons/blue-light-filter.py"
         "sleep 1 && cd ~/.config/hypr/daemons/monitor/ && nix-shell"
         "while true; do hyprnotify --no-sound; done"
         "hyprctl setcursor saturn 24"
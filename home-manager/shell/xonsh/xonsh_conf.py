@@ -62,7 +62,7 @@ def _s(args: list[str]):
 
 
 my_aliases = {
-    "battery-info": "upower -i /org/freedesktop/UPower/devices/battery_BAT0",
+    "battery-info": "python3 ~/.config/hypr/daemons/monitor/query.py get power",
     "cat": "bat",
     "man": "batman",
     "cdi": "zi",  # Interactive zoxide (fzf)